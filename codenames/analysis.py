@@ -0,0 +1,323 @@
+import argparse
+import itertools
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from results_store import QUALIFIED_CODEMASTER, QUALIFIED_GUESSER
+
+# a configuration is (codemaster, guesser, cm_kwargs json, g_kwargs json)
+Config = Tuple[str, str, str, str]
+
+
+def config_of(record: dict) -> Config:
+    """Return the configuration a results record belongs to"""
+    codemaster = record["codemaster"]
+    guesser = record["guesser"]
+    if record.get("codemaster_module"):
+        codemaster = f'{record["codemaster_module"]}.{codemaster}'
+    if record.get("guesser_module"):
+        guesser = f'{record["guesser_module"]}.{guesser}'
+    return (codemaster, guesser,
+            json.dumps(record.get("cm_kwargs", {}), sort_keys=True),
+            json.dumps(record.get("g_kwargs", {}), sort_keys=True))
+
+
+def config_label(config: Config) -> str:
+    """Short human readable name of a configuration"""
+    codemaster, guesser, cm_kwargs, g_kwargs = config
+    cm_kwargs = {k: v for k, v in json.loads(cm_kwargs).items() if v is not None}
+    g_kwargs = {k: v for k, v in json.loads(g_kwargs).items() if v is not None}
+    label = f"{codemaster} + {guesser}"
+    if cm_kwargs:
+        label += f" cm{cm_kwargs}"
+    if g_kwargs:
+        label += f" g{g_kwargs}"
+    return label
+
+
+class ResultsTable:
+    """Columnar view of game results, one NumPy array per field and one entry per game"""
+
+    def __init__(self, configs: List[Config], config_ids, seeds, total_turns, red, blue, civilian, assassin, time_s):
+        self.configs = configs
+        self.config_ids = np.asarray(config_ids, dtype=np.int64)
+        self.seeds = np.asarray(seeds, dtype=np.float64)
+        self.total_turns = np.asarray(total_turns, dtype=np.int64)
+        self.red = np.asarray(red, dtype=np.int64)
+        self.blue = np.asarray(blue, dtype=np.int64)
+        self.civilian = np.asarray(civilian, dtype=np.int64)
+        self.assassin = np.asarray(assassin, dtype=np.int64)
+        self.time_s = np.asarray(time_s, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.config_ids)
+
+    @property
+    def won(self) -> np.ndarray:
+        return self.red >= 8
+
+    @staticmethod
+    def from_records(records: Iterable[dict]) -> "ResultsTable":
+        """Build a table from results records, consuming them one at a time"""
+        config_ids: Dict[tuple, int] = {}
+        configs: List[Config] = []
+        rows = []
+        for record in records:
+            # kwargs values are already reduced to primitives, so a tuple of items is a cheap hashable key
+            key = (record["codemaster"], record["guesser"],
+                   record.get("codemaster_module"), record.get("guesser_module"),
+                   tuple(sorted(record.get("cm_kwargs", {}).items())),
+                   tuple(sorted(record.get("g_kwargs", {}).items())))
+            config_id = config_ids.get(key)
+            if config_id is None:
+                config_id = config_ids[key] = len(configs)
+                configs.append(config_of(record))
+            seed = record.get("seed")
+            time_s = record.get("time_s")
+            rows.append((config_id, seed if isinstance(seed, (int, float)) else np.nan,
+                         record["total_turns"], record["R"], record["B"], record["C"], record["A"],
+                         np.nan if time_s is None else time_s))
+        values = np.array(rows, dtype=np.float64).reshape(-1, 8)
+        return ResultsTable(configs, *values.T)
+
+    @staticmethod
+    def from_jsonl(paths: Iterable[str], chunk_lines: int = 65536) -> "ResultsTable":
+        """Stream one or more bot_results_new_style.txt files
+
+        Lines are decoded a chunk at a time with a single json.loads call per chunk.
+        A chunk that does not decode, e.g. one with the partial last line of an
+        interrupted run, is decoded line by line and its bad lines are skipped.
+        """
+        def records():
+            for path in paths:
+                with open(path, "r") as f:
+                    while True:
+                        lines = [line for line in itertools.islice(f, chunk_lines) if line.strip()]
+                        if not lines:
+                            break
+                        try:
+                            yield from json.loads("[" + ",".join(lines) + "]")
+                        except ValueError:
+                            yield from _decode_lines(path, lines)
+        return ResultsTable.from_records(records())
+
+    @staticmethod
+    def from_store(path: str) -> "ResultsTable":
+        """Read a results_store.ResultsStore database"""
+        connection = sqlite3.connect(path)
+        try:
+            rows = connection.execute(
+                f"SELECT {QUALIFIED_CODEMASTER}, {QUALIFIED_GUESSER}, cm_kwargs, g_kwargs, "
+                "seed, total_turns, R, B, C, A, time_s FROM results ORDER BY id"
+            ).fetchall()
+        finally:
+            connection.close()
+        config_index: Dict[Config, int] = {}
+        config_ids = [config_index.setdefault(row[:4], len(config_index)) for row in rows]
+        values = np.array([row[4:] for row in rows], dtype=np.float64).reshape(-1, 7)
+        return ResultsTable(list(config_index), config_ids, *values.T)
+
+    @staticmethod
+    def load(paths: Iterable[str]) -> "ResultsTable":
+        """Load results files, .sqlite/.db files are read as results stores"""
+        tables = []
+        jsonl_paths = []
+        for path in paths:
+            if path.endswith(".sqlite") or path.endswith(".db"):
+                tables.append(ResultsTable.from_store(path))
+            else:
+                jsonl_paths.append(path)
+        if jsonl_paths:
+            tables.append(ResultsTable.from_jsonl(jsonl_paths))
+        return ResultsTable.concatenate(tables)
+
+    @staticmethod
+    def concatenate(tables: List["ResultsTable"]) -> "ResultsTable":
+        config_index: Dict[Config, int] = {}
+        config_ids = []
+        for table in tables:
+            remap = np.array([config_index.setdefault(config, len(config_index)) for config in table.configs],
+                             dtype=np.int64)
+            config_ids.append(remap[table.config_ids] if len(table) else table.config_ids)
+
+        def cat(name):
+            return np.concatenate([getattr(table, name) for table in tables]) if tables else []
+
+        return ResultsTable(list(config_index), np.concatenate(config_ids) if tables else [],
+                            cat("seeds"), cat("total_turns"), cat("red"), cat("blue"),
+                            cat("civilian"), cat("assassin"), cat("time_s"))
+
+    def per_seed(self, config_id: int, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the seeds played by a configuration and the mean of values per seed"""
+        mask = (self.config_ids == config_id) & ~np.isnan(self.seeds)
+        seeds, inverse = np.unique(self.seeds[mask], return_inverse=True)
+        sums = np.bincount(inverse, weights=values[mask], minlength=len(seeds))
+        counts = np.bincount(inverse, minlength=len(seeds))
+        return seeds, sums / counts
+
+
+def _decode_lines(path: str, lines: List[str]) -> Iterable[dict]:
+    for line in lines:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            print(f"Skipping a line of {path} that is not JSON: {line.strip()[:80]}")
+
+
+def bootstrap_mean_ci(values: np.ndarray, n_bootstrap: int = 2000, confidence: float = 0.95,
+                      rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the mean of values
+
+    Game outcomes take few distinct values (turns are 1..25, wins are 0/1), so
+    resampling is done on the counts of each distinct value with a multinomial
+    draw, which costs O(n_bootstrap * distinct values) regardless of the number
+    of games. Continuous data falls back to resampling indices in blocks.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.nan, np.nan
+    rng = rng if rng is not None else np.random.default_rng()
+    alpha = (1 - confidence) / 2
+
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) <= 1024:
+        resampled_counts = rng.multinomial(len(values), counts / len(values), size=n_bootstrap)
+        means = resampled_counts @ distinct / len(values)
+    else:
+        means = np.empty(n_bootstrap)
+        block = max(1, 4_000_000 // len(values))
+        for start in range(0, n_bootstrap, block):
+            stop = min(start + block, n_bootstrap)
+            means[start:stop] = values[rng.integers(0, len(values), size=(stop - start, len(values)))].mean(axis=1)
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def summarize(table: ResultsTable, n_bootstrap: int = 2000, confidence: float = 0.95,
+              rng: Optional[np.random.Generator] = None) -> List[dict]:
+    """Aggregate win rate, mean turns and assassin rate per configuration"""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    n_configs = len(table.configs)
+    games = np.bincount(table.config_ids, minlength=n_configs)
+    wins = np.bincount(table.config_ids, weights=table.won, minlength=n_configs)
+    assassins = np.bincount(table.config_ids, weights=table.assassin > 0, minlength=n_configs)
+    turns = np.bincount(table.config_ids, weights=table.total_turns, minlength=n_configs)
+    timed = ~np.isnan(table.time_s)
+    time_sums = np.bincount(table.config_ids[timed], weights=table.time_s[timed], minlength=n_configs)
+    time_counts = np.bincount(table.config_ids[timed], minlength=n_configs)
+
+    # one stable sort groups the games of each configuration for the bootstrap
+    order = np.argsort(table.config_ids, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(games)))
+
+    summary = []
+    for config_id, config in enumerate(table.configs):
+        rows = order[bounds[config_id]:bounds[config_id + 1]]
+        summary.append({
+            "config": config_label(config),
+            "games": int(games[config_id]),
+            "win_rate": wins[config_id] / games[config_id],
+            "win_rate_ci": bootstrap_mean_ci(table.won[rows], n_bootstrap, confidence, rng),
+            "mean_turns": turns[config_id] / games[config_id],
+            "mean_turns_ci": bootstrap_mean_ci(table.total_turns[rows], n_bootstrap, confidence, rng),
+            "assassin_rate": assassins[config_id] / games[config_id],
+            "mean_time_s": time_sums[config_id] / time_counts[config_id] if time_counts[config_id] else np.nan,
+        })
+    return summary
+
+
+def paired_difference(table: ResultsTable, config_a: int, config_b: int, n_bootstrap: int = 2000,
+                      confidence: float = 0.95, rng: Optional[np.random.Generator] = None) -> dict:
+    """Compare two configurations on the seeds (boards) they both played
+
+    Differences are a - b; negative turn differences mean a finishes faster.
+    """
+    rng = rng if rng is not None else np.random.default_rng(0)
+    seeds_a, turns_a = table.per_seed(config_a, table.total_turns)
+    seeds_b, turns_b = table.per_seed(config_b, table.total_turns)
+    _, wins_a = table.per_seed(config_a, table.won)
+    _, wins_b = table.per_seed(config_b, table.won)
+    _, index_a, index_b = np.intersect1d(seeds_a, seeds_b, assume_unique=True, return_indices=True)
+
+    turn_diffs = turns_a[index_a] - turns_b[index_b]
+    win_diffs = wins_a[index_a] - wins_b[index_b]
+    return {
+        "a": config_label(table.configs[config_a]),
+        "b": config_label(table.configs[config_b]),
+        "paired_seeds": len(index_a),
+        "mean_turn_diff": float(turn_diffs.mean()) if len(turn_diffs) else np.nan,
+        "mean_turn_diff_ci": bootstrap_mean_ci(turn_diffs, n_bootstrap, confidence, rng),
+        "win_rate_diff": float(win_diffs.mean()) if len(win_diffs) else np.nan,
+        "win_rate_diff_ci": bootstrap_mean_ci(win_diffs, n_bootstrap, confidence, rng),
+        "a_better_seeds": int(np.sum(turn_diffs < 0)),
+        "b_better_seeds": int(np.sum(turn_diffs > 0)),
+    }
+
+
+def _without_nan(value):
+    """value with NaN replaced by None, JSON has no NaN"""
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _without_nan(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_without_nan(item) for item in value]
+    return value
+
+
+def _format_ci(ci):
+    return f"[{ci[0]:.3f}, {ci[1]:.3f}]"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare codemaster/guesser configurations from game results.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("results", nargs="+",
+                        help="bot_results_new_style.txt files and/or results store .sqlite files")
+    parser.add_argument("--bootstrap", type=int, default=2000, help="Number of bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument("--pairs", action="store_true",
+                        help="Also print paired per-seed differences between configurations sharing a guesser")
+    parser.add_argument("--json", help="Write the summary (and pairs) to this JSON file", default=None)
+    args = parser.parse_args()
+
+    table = ResultsTable.load(args.results)
+    summary = summarize(table, args.bootstrap, args.confidence)
+    summary_order = sorted(range(len(summary)), key=lambda i: (-summary[i]["win_rate"], summary[i]["mean_turns"]))
+
+    print(f"{len(table)} games, {len(table.configs)} configurations, {args.confidence:.0%} bootstrap intervals\n")
+    for i in summary_order:
+        row = summary[i]
+        print(row["config"])
+        print(f"    games={row['games']} win_rate={row['win_rate']:.3f} {_format_ci(row['win_rate_ci'])}"
+              f" mean_turns={row['mean_turns']:.2f} {_format_ci(row['mean_turns_ci'])}"
+              f" assassin_rate={row['assassin_rate']:.3f} mean_time_s={row['mean_time_s']:.2f}")
+
+    pairs = []
+    if args.pairs:
+        print("\npaired differences (a - b) over shared seeds\n")
+        for a in range(len(table.configs)):
+            for b in range(a + 1, len(table.configs)):
+                if table.configs[a][1] != table.configs[b][1]:
+                    continue
+                pair = paired_difference(table, a, b, args.bootstrap, args.confidence)
+                if pair["paired_seeds"] == 0:
+                    continue
+                pairs.append(pair)
+                print(f"{pair['a']}\n  vs {pair['b']}")
+                print(f"    seeds={pair['paired_seeds']}"
+                      f" turn_diff={pair['mean_turn_diff']:.2f} {_format_ci(pair['mean_turn_diff_ci'])}"
+                      f" win_rate_diff={pair['win_rate_diff']:.3f} {_format_ci(pair['win_rate_diff_ci'])}"
+                      f" a_better={pair['a_better_seeds']} b_better={pair['b_better_seeds']}")
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(_without_nan({"summary": summary, "pairs": pairs}), f, indent=2, allow_nan=False)
+
+
+if __name__ == "__main__":
+    main()
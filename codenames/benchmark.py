@@ -0,0 +1,309 @@
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from gensim.models import KeyedVectors
+from nltk.corpus import wordnet
+
+from game import Game
+from players.codemaster import HumanCodemaster
+from players.guesser import HumanGuesser
+
+
+class SkipBenchmark(Exception):
+    """Raised when a benchmark case cannot run in this environment"""
+
+
+def _wordnet_kwargs(fixtures):
+    if fixtures["brown_ic"] is None:
+        raise SkipBenchmark("the nltk wordnet and wordnet_ic corpora are not installed")
+    return {"brown_ic": fixtures["brown_ic"]}
+
+
+# (name, module, class name, kwargs builder) of the benchmarked players
+# kwargs builders receive the synthetic fixtures: {"glove": dict, "w2v": KeyedVectors, "brown_ic": ...}
+CODEMASTERS = [
+    ("VectorCodemaster", "players.vector_codemaster", "VectorCodemaster",
+     lambda f: {"vectors": [f["w2v"], f["glove"]], "distance_threshold": 0.7, "max_red_words_per_clue": 3}),
+] + [
+    (f"codemaster_{family}_{threshold}", f"players.codemaster_{family}_{threshold}", "AICodemaster", kwargs)
+    for family, kwargs in (("glove", lambda f: {"glove_vecs": f["glove"]}),
+                           ("w2v", lambda f: {"word_vectors": f["w2v"]}),
+                           ("w2vglove", lambda f: {"glove_vecs": f["glove"], "word_vectors": f["w2v"]}))
+    for threshold in ("03", "05", "07")
+] + [
+    ("codemaster_wn_lin", "players.codemaster_wn_lin", "AICodemaster", _wordnet_kwargs),
+]
+
+GUESSERS = [
+    ("VectorGuesser", "players.vector_guesser", "VectorGuesser", lambda f: {"vectors": [f["w2v"], f["glove"]]}),
+    ("guesser_glove", "players.guesser_glove", "AIGuesser", lambda f: {"glove_vecs": f["glove"]}),
+    ("guesser_w2v", "players.guesser_w2v", "AIGuesser", lambda f: {"word_vectors": f["w2v"]}),
+    ("guesser_w2vglove", "players.guesser_w2vglove", "AIGuesser",
+     lambda f: {"glove_vecs": f["glove"], "word_vectors": f["w2v"]}),
+] + [
+    (f"guesser_wn_{measure}", f"players.guesser_wn_{measure}", "AIGuesser", _wordnet_kwargs)
+    for measure in ("jcn", "lch", "lin", "path", "res", "wup")
+]
+
+# (codemaster name, guesser name) pairs played end to end
+GAMES = [
+    ("VectorCodemaster", "VectorGuesser"),
+    ("codemaster_glove_07", "guesser_glove"),
+    ("codemaster_w2vglove_07", "guesser_w2vglove"),
+]
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where the current one is not available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def game_words() -> List[str]:
+    """Every word a vector player can look up: the lowercased wordpool and the clue wordlist"""
+    with open("game_wordpool.txt") as f:
+        words = [line.strip().lower() for line in f if line.strip()]
+    with open("players/cm_wordlist.txt") as f:
+        words += [line.strip() for line in f if line.strip()]
+    return sorted(set(words))
+
+
+def load_player(module: str, classname: str):
+    return getattr(importlib.import_module(module), classname)
+
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    return {"runs": len(times), "min_s": min(times), "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times)}
+
+
+def timed(func: Callable, repeats: int = 1) -> Dict[str, float]:
+    """Call func repeats times and summarize the wall clock time of the calls"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+class Benchmark:
+    """Measures embedding loading, player latency and game throughput on synthetic embeddings"""
+
+    def __init__(self, seeds: List[int], repeats: int, dims=(50, 300)):
+        self.seeds = seeds
+        self.repeats = repeats
+        self.glove_dim, self.w2v_dim = dims
+        self.results: Dict[str, dict] = {}
+        self.fixtures = {}
+        self.boards = {}
+        self.tmp_dir = tempfile.mkdtemp(prefix="codenames-benchmark-")
+
+    def run_case(self, name: str, func: Callable) -> None:
+        """Run one benchmark case, recording (and not raising) its failure"""
+        print(f"{name} ...", end=" ", flush=True)
+        # players print their reasoning, which would drown the report
+        saved_stdout = sys.stdout
+        sys.stdout = devnull = open(os.devnull, "w")
+        try:
+            self.results[name] = func()
+        except SkipBenchmark as e:
+            self.results[name] = {"skipped": str(e)}
+        except Exception as e:
+            self.results[name] = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            # a Game(do_print=False) swaps sys.stdout as well and closes it in __del__, a game that failed
+            # is only collected with the traceback, so restore ours once nothing can swap it any more
+            gc.collect()
+            sys.stdout = saved_stdout
+            devnull.close()
+        result = self.results[name]
+        if "skipped" in result:
+            print(f"skipped ({result['skipped']})")
+        elif "error" in result:
+            print(f"failed ({result['error'].split(':')[0]})")
+        else:
+            print(f"{result['median_s'] * 1000:.2f} ms" if "median_s" in result else "done")
+
+    def load_fixtures(self) -> None:
+        """Write synthetic embedding files and time loading them through the Game loaders"""
+        rng = np.random.default_rng(0)
+        words = game_words()
+
+        glove_path = os.path.join(self.tmp_dir, "glove.synthetic.txt")
+        with open(glove_path, "w", encoding="utf-8") as f:
+            for word, vector in zip(words, rng.standard_normal((len(words), self.glove_dim))):
+                f.write(word + " " + " ".join(f"{x:.5f}" for x in vector) + "\n")
+
+        w2v_path = os.path.join(self.tmp_dir, "w2v.synthetic.bin")
+        w2v = KeyedVectors(self.w2v_dim)
+        w2v.add_vectors(words, rng.standard_normal((len(words), self.w2v_dim)).astype(np.float32))
+        w2v.save_word2vec_format(w2v_path, binary=True)
+
+        for name, loader, path in (("glove", Game.load_glove_vecs, glove_path), ("w2v", Game.load_w2v, w2v_path)):
+            rss_before = rss_bytes()
+            start = time.perf_counter()
+            self.fixtures[name] = loader(path)
+            elapsed = time.perf_counter() - start
+            self.results[f"load/{name}"] = dict(summarize([elapsed]), words=len(words),
+                                                rss_delta_bytes=rss_bytes() - rss_before)
+            print(f"load/{name} ... {elapsed * 1000:.2f} ms")
+
+        try:
+            wordnet.ensure_loaded()
+            self.fixtures["brown_ic"] = Game.load_wordnet("ic-brown.dat")
+        except LookupError:
+            # the wordnet players are skipped without the nltk corpora
+            self.fixtures["brown_ic"] = None
+
+        for seed in self.seeds:
+            game = Game(HumanCodemaster, HumanGuesser, seed=seed, do_print=False, do_log=False)
+            self.boards[seed] = (list(game.get_words_on_board()), list(game.get_key_grid()))
+            del game
+
+    def bench_codemaster(self, name: str, module: str, classname: str, kwargs) -> None:
+        def construct():
+            return load_player(module, classname)(**kwargs(self.fixtures))
+
+        self.run_case(f"codemaster/{name}/__init__", lambda: timed(construct, self.repeats))
+        set_times, clue_times = [], []
+
+        def play_seeds():
+            codemaster = construct()
+            for seed in self.seeds:
+                words, key_grid = self.boards[seed]
+                set_times.append(timed(lambda: codemaster.set_game_state(list(words), key_grid))["min_s"])
+                clue_times.append(timed(codemaster.get_clue)["min_s"])
+            return summarize(clue_times)
+
+        self.run_case(f"codemaster/{name}/get_clue", play_seeds)
+        if set_times:
+            self.results[f"codemaster/{name}/set_game_state"] = summarize(set_times)
+
+    def bench_guesser(self, name: str, module: str, classname: str, kwargs) -> None:
+        with open("players/cm_wordlist.txt") as f:
+            clues = [line.strip() for line in f if line.strip()]
+
+        def answer_seeds():
+            guesser = load_player(module, classname)(**kwargs(self.fixtures))
+            times = []
+            for seed in self.seeds:
+                words, _ = self.boards[seed]
+                clue = random.Random(seed).choice(clues)
+                for _ in range(self.repeats):
+                    guesser.set_board(list(words))
+                    guesser.set_clue(clue, 1)
+                    times.append(timed(guesser.get_answer)["min_s"])
+            return summarize(times)
+
+        self.run_case(f"guesser/{name}/get_answer", answer_seeds)
+
+    def bench_game(self, codemaster_name: str, guesser_name: str) -> None:
+        cm_module, cm_classname, cm_kwargs = next(c[1:] for c in CODEMASTERS if c[0] == codemaster_name)
+        g_module, g_classname, g_kwargs = next(g[1:] for g in GUESSERS if g[0] == guesser_name)
+
+        def play():
+            cm_class = load_player(cm_module, cm_classname)
+            g_class = load_player(g_module, g_classname)
+            start = time.perf_counter()
+            for seed in self.seeds:
+                Game(cm_class, g_class, seed=seed, do_print=False, do_log=False,
+                     cm_kwargs=cm_kwargs(self.fixtures), g_kwargs=g_kwargs(self.fixtures)).run()
+            elapsed = time.perf_counter() - start
+            return dict(summarize([elapsed / len(self.seeds)]), runs=len(self.seeds),
+                        games_per_s=len(self.seeds) / elapsed)
+
+        self.run_case(f"game/{codemaster_name}+{guesser_name}", play)
+
+    def run(self, only: str = None) -> dict:
+        try:
+            self.load_fixtures()
+        finally:
+            # the fixtures are loaded into memory, the synthetic embedding files are not needed any more
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        for name, *player in CODEMASTERS:
+            if only is None or only in f"codemaster/{name}":
+                self.bench_codemaster(name, *player)
+        for name, *player in GUESSERS:
+            if only is None or only in f"guesser/{name}":
+                self.bench_guesser(name, *player)
+        for codemaster_name, guesser_name in GAMES:
+            if only is None or only in f"game/{codemaster_name}+{guesser_name}":
+                self.bench_game(codemaster_name, guesser_name)
+        return {"meta": self.meta(), "results": self.results}
+
+    def meta(self) -> dict:
+        try:
+            commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = None
+        return {"timestamp": time.time(), "commit": commit, "python": platform.python_version(),
+                "numpy": np.__version__, "platform": platform.platform(), "seeds": self.seeds,
+                "repeats": self.repeats, "glove_dim": self.glove_dim, "w2v_dim": self.w2v_dim}
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """Return the cases whose median time grew by more than tolerance (1.2 = 20% slower)"""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name, {})
+        if "median_s" not in result or "median_s" not in before or before["median_s"] <= 0:
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        flag = "REGRESSION" if ratio > tolerance else ""
+        print(f"{name}: {before['median_s'] * 1000:.2f} ms -> {result['median_s'] * 1000:.2f} ms"
+              f" ({ratio:.2f}x) {flag}")
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark embedding loading, players and games on synthetic embeddings.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--output", help="JSON file the results are written to", default="benchmark_results.json")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[100, 150, 200], help="Board seeds")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions of the cheaper measurements")
+    parser.add_argument("--only", help="Only run cases whose name contains this string", default=None)
+    parser.add_argument("--compare", help="Baseline JSON file to compare against", default=None)
+    parser.add_argument("--tolerance", type=float, default=1.2,
+                        help="Slowdown ratio of the median time reported as a regression")
+    args = parser.parse_args()
+
+    report = Benchmark(args.seeds, args.repeats).run(args.only)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\ncomparing against {args.compare}\n")
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import sys
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from players.clue_vocabulary import get_game_vocabulary
+
+# key grid entries as small integers, KEY_NAMES[code] is the name used by the players
+KEY_NAMES = ("Red", "Blue", "Civilian", "Assassin")
+RED, BLUE, CIVILIAN, ASSASSIN = range(4)
+KEY_CODES = {name: code for code, name in enumerate(KEY_NAMES)}
+# what a revealed word is replaced with in the players' view of the board
+REVEALED_TOKENS = tuple(f"*{name}*" for name in KEY_NAMES)
+
+
+_wordpools: Dict[str, Tuple[str, ...]] = {}
+_wordpools_lock = threading.Lock()
+
+
+def get_wordpool(wordpool_file: str = "game_wordpool.txt") -> Tuple[str, ...]:
+    """Return the words of a wordpool file in file order, read once per process
+
+    Games shuffle a copy of it with their seed.
+    """
+    wordpool = _wordpools.get(wordpool_file)
+    if wordpool is None:
+        with _wordpools_lock:
+            wordpool = _wordpools.get(wordpool_file)
+            if wordpool is None:
+                with open(wordpool_file, "r") as f:
+                    words = f.read().splitlines()
+                assert len(words) == len(set(words)), f"{wordpool_file} should not have duplicates"
+                wordpool = _wordpools[wordpool_file] = tuple(sys.intern(word) for word in words)
+    return wordpool
+
+
+class Board:
+    """The words of a game as GameVocabulary ids with their key codes and revealed state
+
+    The engine works on the id, key code and revealed arrays, the ids index the
+    embedding matrices of the vector players. The string lists handed to the
+    players (words, with revealed words replaced by REVEALED_TOKENS, and
+    key_grid) are views kept up to date in place, so a player holding on to
+    them sees every reveal as it did before.
+    """
+
+    def __init__(self, words: Sequence[str], key_grid: Sequence[str], wordpool_file: str = "game_wordpool.txt"):
+        self.vocabulary = get_game_vocabulary(wordpool_file)
+        self.ids = self.vocabulary.ids_of(words)
+        assert (self.ids >= 0).all(), f"the words of a board should be in {wordpool_file}"
+        self.keys = np.array([KEY_CODES[key] for key in key_grid], dtype=np.int8)
+        self.revealed = np.zeros(len(words), dtype=bool)
+        # strings views for the players, the console, the websocket and the replays
+        self.words = list(words)
+        self.key_grid = list(key_grid)
+        self._positions = {word_id: position for position, word_id in enumerate(self.ids.tolist())}
+
+    def position_of(self, word: str) -> int:
+        """Position of an unrevealed word given by a player, raises ValueError if there is none"""
+        position = self._positions.get(self.vocabulary.id_of(word))
+        if position is None or self.revealed[position]:
+            raise ValueError(f"{word} is not an unrevealed word on the board")
+        return position
+
+    def reveal(self, position: int) -> int:
+        """Reveal the word at position, returns its key code"""
+        key = int(self.keys[position])
+        self.revealed[position] = True
+        self.words[position] = REVEALED_TOKENS[key]
+        return key
+
+    def words_if_revealed(self, position: int) -> List[str]:
+        """Copy of the words the players would see after revealing position"""
+        words = list(self.words)
+        words[position] = REVEALED_TOKENS[int(self.keys[position])]
+        return words
+
+    def revealed_count(self, key: int) -> int:
+        """Number of revealed words of a key code"""
+        return int(np.count_nonzero(self.revealed & (self.keys == key)))
@@ -0,0 +1,76 @@
+import collections
+import threading
+from contextlib import contextmanager
+
+
+class BotPool:
+    """Pre-constructed, reusable instances of one player class
+
+    Constructing a bot can take seconds (reading the clue wordlist, expanding
+    synsets, ...), so the online server keeps ready instances around instead of
+    constructing two per connection. acquire() hands out a ready instance,
+    release() resets it with player.reset() and puts it back. Whenever fewer
+    than min_idle instances are ready, new ones are constructed on a background
+    thread.
+    """
+
+    def __init__(self, player_class, kwargs=None, size: int = 2, min_idle: int = 1, max_idle: int = 8):
+        """
+        Args:
+            player_class: Codemaster or Guesser class to instantiate.
+            kwargs (dict, optional): kwargs passed to every instance, shared between them.
+            size (int, optional): Number of instances constructed up front.
+            min_idle (int, optional): Ready instances below which the pool refills in the background.
+            max_idle (int, optional): Released instances beyond this number are dropped.
+        """
+        self.player_class = player_class
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.idle = collections.deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        for _ in range(size):
+            self.idle.append(self._construct())
+
+    def _construct(self):
+        return self.player_class(**self.kwargs)
+
+    def acquire(self):
+        """Return a ready instance, constructing one only if the pool is empty"""
+        try:
+            player = self.idle.popleft()
+        except IndexError:
+            player = self._construct()
+        self._maybe_refill()
+        return player
+
+    def release(self, player) -> None:
+        """Reset an instance acquired from this pool and make it available again"""
+        player.reset()
+        if len(self.idle) < self.max_idle:
+            self.idle.append(player)
+
+    @contextmanager
+    def lease(self):
+        """Context manager acquiring an instance and releasing it afterwards"""
+        player = self.acquire()
+        try:
+            yield player
+        finally:
+            self.release(player)
+
+    def _maybe_refill(self) -> None:
+        with self._lock:
+            if self._refilling or len(self.idle) >= self.min_idle:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, daemon=True, name="bot-pool-refill").start()
+
+    def _refill(self) -> None:
+        try:
+            while len(self.idle) < self.min_idle:
+                self.idle.append(self._construct())
+        finally:
+            with self._lock:
+                self._refilling = False
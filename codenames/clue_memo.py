@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from fingerprints import kwargs_fingerprint, source_fingerprint
+
+
+def board_signature(words_on_board: List[str], key_grid: List[str]) -> Tuple[Tuple[str, str], ...]:
+    """The unrevealed words with their keys, in board order
+
+    The order is kept because it decides between clues of equal score.
+    """
+    return tuple((word.lower(), key) for word, key in zip(words_on_board, key_grid) if word[0] != '*')
+
+
+class ClueMemo:
+    """LRU memo of the clues of deterministic codemasters, shared by every game of a process
+
+    A codemaster whose class sets deterministic_clues = True gives the same clue
+    for the same unrevealed words, keys and kwargs, so tournaments replaying the
+    same seeds against many guessers reach the same decision points again. The
+    key covers the codemaster class and the source of its module, the
+    fingerprint of its kwargs and the board signature. With a path the memo is
+    loaded from and saved to a JSON file, most recently used entries last.
+    """
+
+    VERSION = 1
+
+    def __init__(self, max_entries: int = 100000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # (class, id of kwargs) -> (kwargs, prefix of the keys), the kwargs are kept so that their id is not reused
+        self._prefixes = {}
+        if path is not None:
+            self.load()
+
+    def key(self, codemaster, cm_kwargs: dict, words_on_board: List[str], key_grid: List[str]) -> Optional[str]:
+        """Key of a decision point, None if the codemaster is not deterministic"""
+        player_class = type(codemaster)
+        if not getattr(player_class, "deterministic_clues", False):
+            return None
+        cached = self._prefixes.get((player_class, id(cm_kwargs)))
+        if cached is None or cached[0] is not cm_kwargs:
+            prefix = json.dumps([player_class.__module__, player_class.__qualname__,
+                                 source_fingerprint(player_class), kwargs_fingerprint(cm_kwargs)])
+            cached = self._prefixes[(player_class, id(cm_kwargs))] = (cm_kwargs, prefix)
+        signature = json.dumps(board_signature(words_on_board, key_grid))
+        return hashlib.sha1(f"{cached[1]}{signature}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            clue = self.entries.get(key)
+            if clue is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return clue
+
+    def put(self, key: str, clue: str, clue_num: int) -> None:
+        with self._lock:
+            self.entries[key] = (clue, int(clue_num))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None, "evictions": self.evictions}
+
+    def load(self) -> None:
+        """Add the entries of the memo file, if there is one"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get("version") != self.VERSION:
+            return
+        for key, clue, clue_num in saved["entries"][-self.max_entries:]:
+            self.put(key, clue, clue_num)
+
+    def save(self) -> None:
+        """Write the memo file atomically"""
+        with self._lock:
+            entries = [[key, clue, clue_num] for key, (clue, clue_num) in self.entries.items()]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.VERSION, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
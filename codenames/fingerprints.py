@@ -0,0 +1,127 @@
+import hashlib
+import inspect
+import pickle
+import sys
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from restricted_vectors import game_vocabulary
+
+# id -> (object, fingerprint), the object is kept so that its id cannot be reused
+_fingerprints: Dict[int, tuple] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def _is_vectors(value) -> bool:
+    """Whether value is word vectors: a GloVe dict, gensim KeyedVectors, QuantizedVectors, ..."""
+    if hasattr(value, "index_to_key"):
+        return True
+    return isinstance(value, dict) and len(value) > 0 and isinstance(next(iter(value.values())), np.ndarray)
+
+
+def vectors_fingerprint(vectors) -> str:
+    """Hash of the vectors of the words a game looks up (the wordpool and the clue wordlist)
+
+    Full, restricted and reloaded copies of the same file have the same
+    fingerprint, quantized copies do not since their vectors differ.
+    """
+    digest = hashlib.sha1()
+    for word in game_vocabulary():
+        try:
+            vector = vectors[word]
+        except KeyError:
+            digest.update(b"-")
+            continue
+        digest.update(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def value_fingerprint(value) -> str:
+    """Hash of a kwarg value that is the same in every run for the same content
+
+    Scalars are hashed by value, word vectors by vectors_fingerprint, other
+    objects (e.g. a WordNet information content dict) by their pickle. The
+    hashes of objects are cached per object.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
+    if isinstance(value, (list, tuple)):
+        return hashlib.sha1("".join(value_fingerprint(item) for item in value).encode("ascii")).hexdigest()
+
+    cached = _fingerprints.get(id(value))
+    if cached is not None and cached[0] is value:
+        return cached[1]
+    if _is_vectors(value):
+        fingerprint = vectors_fingerprint(value)
+    else:
+        try:
+            fingerprint = hashlib.sha1(pickle.dumps(value, protocol=4)).hexdigest()
+        except Exception:
+            # only equal to itself, in this process
+            fingerprint = f"{type(value).__qualname__}@{id(value)}"
+    with _fingerprints_lock:
+        _fingerprints[id(value)] = (value, fingerprint)
+    return fingerprint
+
+
+def kwargs_fingerprints(kwargs: dict) -> Dict[str, str]:
+    """value_fingerprint of every kwarg, by name"""
+    return {name: value_fingerprint(value) for name, value in kwargs.items()}
+
+
+def combined_fingerprint(fingerprints: Dict[str, str]) -> str:
+    """Hash of named fingerprints, e.g. the kwargs_fingerprints of a player"""
+    digest = hashlib.sha1()
+    for name in sorted(fingerprints):
+        digest.update(name.encode("utf-8"))
+        digest.update(fingerprints[name].encode("ascii"))
+    return digest.hexdigest()
+
+
+def kwargs_fingerprint(kwargs: dict) -> str:
+    """Hash of the kwargs of a player, see value_fingerprint"""
+    return combined_fingerprint(kwargs_fingerprints(kwargs))
+
+
+def module_fingerprint(module_name: str) -> str:
+    """Hash of the source of a module"""
+    module = sys.modules.get(module_name)
+    try:
+        source = inspect.getsource(module)
+    except (TypeError, OSError):
+        source = module_name
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """Hash of the content of a data file, of its path if it cannot be read"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return hashlib.sha1(path.encode("utf-8")).hexdigest()
+
+
+def player_modules(module_name: str) -> List[str]:
+    """A module and the players.* modules it imports, directly or through each other, sorted
+
+    Imports are found in the module globals: imported modules and the
+    functions and classes imported from them.
+    """
+    found = {module_name}
+    to_visit = [module_name]
+    while to_visit:
+        module = sys.modules.get(to_visit.pop())
+        for value in vars(module).values() if module is not None else ():
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+            if isinstance(name, str) and name.startswith("players.") and name not in found:
+                found.add(name)
+                to_visit.append(name)
+    return sorted(found)
+
+
+def source_fingerprint(player_class) -> str:
+    """Hash of the source of the module defining a player class and of the players.* modules it imports"""
+    return combined_fingerprint({name: module_fingerprint(name) for name in player_modules(player_class.__module__)})
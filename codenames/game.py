@@ -10,6 +10,12 @@ import colorama
 import gensim.models.keyedvectors as word2vec
 import numpy as np
 from nltk.corpus import wordnet_ic
+import board
+from instrumentation import DISABLED, Instrumentation
+from quantization import load_glove_quantized, load_w2v_quantized
+from restricted_vectors import load_restricted
+from players.codemaster import AnytimeCodemaster
+from results_store import ResultsWriter
 
 class GameCondition(enum.Enum):
     """Enumeration that represents the different states of the game"""
@@ -27,7 +33,8 @@ class Game:
 
     def __init__(self, codemaster, guesser,
                  seed="time", do_print=True, do_log=True, game_name="default",
-                 cm_kwargs={}, g_kwargs={}):
+                 cm_kwargs={}, g_kwargs={}, results_store=None, results_dir="results", instrument=False, profiler=None, clue_deadline_s=None,
+                 clue_memo=None):
         """ Setup Game details
 
         Args:
@@ -50,6 +57,24 @@ class Game:
                 kwargs passed to Codemaster.
             g_kwargs (dict, optional): 
                 kwargs passed to Guesser.
+            results_store (:class:`ResultsStore`, optional):
+                Batched results sink used instead of the results/*.txt files.
+            results_dir (str, optional):
+                Folder the results/*.txt files are appended to. Defaults to "results".
+            instrument (bool, optional):
+                Whether to time the player calls and engine phases. The timings are
+                added to the results record and passed to the instrumentation hooks.
+                Defaults to False.
+            profiler (:class:`BotProfiler`, optional):
+                Profiler the methods of both players are attached to.
+            clue_deadline_s (float, optional):
+                Seconds the codemaster has for each clue. An AnytimeCodemaster gets
+                the deadline and returns its best clue so far when it passes, the
+                number of clues cut short or late is added to the results record.
+            clue_memo (:class:`ClueMemo`, optional):
+                Memo of the clues of deterministic codemasters, usually shared by the
+                games of a tournament. A clue found in it is given without calling
+                get_clue, clues cut short by the deadline are not stored.
         """
 
         self.game_start_time = time.time()
@@ -60,13 +85,28 @@ class Game:
             self._save_stdout = sys.stdout
             sys.stdout = open(os.devnull, 'w')
 
-        self.codemaster = codemaster(**cm_kwargs)
-        self.guesser = guesser(**g_kwargs)
+        self.instrumentation = Instrumentation() if instrument else DISABLED
+        with self.instrumentation.time("codemaster.__init__"):
+            self.codemaster = codemaster(**cm_kwargs)
+        with self.instrumentation.time("guesser.__init__"):
+            self.guesser = guesser(**g_kwargs)
 
         self.cm_kwargs = cm_kwargs
         self.g_kwargs = g_kwargs
         self.do_log = do_log
         self.game_name = game_name
+        self.results_store = results_store
+        self.results_dir = results_dir
+        self.clue_deadline_s = clue_deadline_s
+        self.deadline_hits = 0
+        self.clue_memo = clue_memo
+        if profiler is not None:
+            profiler.attach(self.codemaster, "codemaster")
+            profiler.attach(self.guesser, "guesser")
+        if self.instrumentation.enabled:
+            self.instrumentation.context = {"game_name": game_name,
+                                            "codemaster": type(self.codemaster).__name__,
+                                            "guesser": type(self.guesser).__name__}
 
         # set seed so that board/keygrid can be reloaded later
         if seed == 'time':
@@ -79,15 +119,17 @@ class Game:
         print("seed:", self.seed)
 
         # load board words
-        with open("game_wordpool.txt", "r") as f:
-            temp = f.read().splitlines()
-            assert len(temp) == len(set(temp)), "game_wordpool.txt should not have duplicates"
-            random.shuffle(temp)
-            self.words_on_board = temp[:25]
+        temp = list(board.get_wordpool("game_wordpool.txt"))
+        random.shuffle(temp)
 
         # set grid key for codemaster (spymaster)
-        self.key_grid = ["Red"] * 8 + ["Blue"] * 7 + ["Civilian"] * 9 + ["Assassin"]
-        random.shuffle(self.key_grid)
+        key_grid = ["Red"] * 8 + ["Blue"] * 7 + ["Civilian"] * 9 + ["Assassin"]
+        random.shuffle(key_grid)
+
+        # the engine works on the word ids and key codes of the board, the players on its string views
+        self.board = board.Board(temp[:25], key_grid)
+        self.words_on_board = self.board.words
+        self.key_grid = self.board.key_grid
 
     def __del__(self):
         """reset stdout if using the do_print==False option"""
@@ -96,10 +138,17 @@ class Game:
             sys.stdout = self._save_stdout
 
     @staticmethod
-    def load_glove_vecs(glove_file_path):
+    def load_glove_vecs(glove_file_path, quantize=None, vocabulary=None):
         """Load stanford nlp glove vectors
         Original source that matches the function: https://nlp.stanford.edu/data/glove.6B.zip
+        quantize: None, or "float16"/"int8" to keep the vectors quantized (see quantization.py)
+        vocabulary: None, or the words to keep in memory, others are read on demand (see restricted_vectors.py)
         """
+        if vocabulary is not None:
+            assert quantize is None, "restricted vectors are not quantized"
+            return load_restricted(glove_file_path, vocabulary, binary=False)
+        if quantize is not None:
+            return load_glove_quantized(glove_file_path, quantize)
         with open(glove_file_path, encoding="utf-8") as infile:
             glove_vecs = {}
             for line in infile:
@@ -113,10 +162,17 @@ class Game:
         return wordnet_ic.ic(wordnet_file)
 
     @staticmethod
-    def load_w2v(w2v_file_path):
+    def load_w2v(w2v_file_path, quantize=None, vocabulary=None):
         """Function to initalize gensim w2v object from Google News w2v Vectors
         Vectors Source: https://drive.google.com/file/d/0B7XkCwpI5KDYNlNUTTlSS21pQmM/edit
+        quantize: None, or "float16"/"int8" to keep the vectors quantized (see quantization.py)
+        vocabulary: None, or the words to keep in memory, others are read on demand (see restricted_vectors.py)
         """
+        if vocabulary is not None:
+            assert quantize is None, "restricted vectors are not quantized"
+            return load_restricted(w2v_file_path, vocabulary, binary=True)
+        if quantize is not None:
+            return load_w2v_quantized(w2v_file_path, quantize)
         return word2vec.KeyedVectors.load_word2vec_format(w2v_file_path, binary=True, unicode_errors='ignore')
 
     def _display_board_codemaster(self):
@@ -191,81 +247,111 @@ class Game:
         """Function that takes in an int index called guess to compare with the key grid
         CodeMaster will always win with Red and lose if Blue =/= 7 or Assassin == 1
         """
-        if self.key_grid[guess_index] == "Red":
-            self.words_on_board[guess_index] = "*Red*"
-            if self.words_on_board.count("*Red*") >= 8:
+        key = self.board.reveal(guess_index)
+        if key == board.RED:
+            if self.board.revealed_count(board.RED) >= 8:
                 return GameCondition.WIN
             return GameCondition.HIT_RED
 
-        elif self.key_grid[guess_index] == "Blue":
-            self.words_on_board[guess_index] = "*Blue*"
-            if self.words_on_board.count("*Blue*") >= 7:
+        elif key == board.BLUE:
+            if self.board.revealed_count(board.BLUE) >= 7:
                 return GameCondition.LOSS
             else:
                 return GameCondition.CONTINUE
 
-        elif self.key_grid[guess_index] == "Assassin":
-            self.words_on_board[guess_index] = "*Assassin*"
+        elif key == board.ASSASSIN:
             return GameCondition.LOSS
 
         else:
-            self.words_on_board[guess_index] = "*Civilian*"
             return GameCondition.CONTINUE
 
-    def write_results(self, num_of_turns):
+    def get_results(self, num_of_turns):
+        """Return the results record of the finished game"""
+        red_result = self.board.revealed_count(board.RED)
+        blue_result = self.board.revealed_count(board.BLUE)
+        civ_result = self.board.revealed_count(board.CIVILIAN)
+        assa_result = self.board.revealed_count(board.ASSASSIN)
+
+        codemaster, guesser = type(self.codemaster), type(self.guesser)
+        results = {"game_name": self.game_name,
+                   "total_turns": num_of_turns,
+                   "R": red_result, "B": blue_result, "C": civ_result, "A": assa_result,
+                   "codemaster": codemaster.__name__,
+                   "guesser": guesser.__name__,
+                   "codemaster_module": codemaster.__module__,
+                   "guesser_module": guesser.__module__,
+                   "seed": self.seed,
+                   "time_s": (self.game_end_time - self.game_start_time),
+                   "cm_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                 for k, v in self.cm_kwargs.items()},
+                   "g_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                for k, v in self.g_kwargs.items()},
+                   }
+
+        if self.clue_deadline_s is not None:
+            results["clue_deadline_s"] = self.clue_deadline_s
+            results["deadline_hits"] = self.deadline_hits
+
+        instrumentation = self.instrumentation.summary()
+        if instrumentation is not None:
+            results.update(instrumentation)
+        return results
+
+    def write_results(self, num_of_turns, results=None):
         """Logging function
+        adds the record to the results store if one was given, otherwise
         writes in both the original and a more detailed new style
+        to the results folder, safe when several games share the folder
+        results: the record of get_results, built here when None
         """
-        red_result = 0
-        blue_result = 0
-        civ_result = 0
-        assa_result = 0
+        if results is None:
+            results = self.get_results(num_of_turns)
 
-        for i in range(len(self.words_on_board)):
-            if self.words_on_board[i] == "*Red*":
-                red_result += 1
-            elif self.words_on_board[i] == "*Blue*":
-                blue_result += 1
-            elif self.words_on_board[i] == "*Civilian*":
-                civ_result += 1
-            elif self.words_on_board[i] == "*Assassin*":
-                assa_result += 1
-        total = red_result + blue_result + civ_result + assa_result
-
-        if not os.path.exists("results"):
-            os.mkdir("results")
-
-        with open("results/bot_results.txt", "a") as f:
-            f.write(
-                f'TOTAL:{num_of_turns} B:{blue_result} C:{civ_result} A:{assa_result}'
-                f' R:{red_result} CM:{type(self.codemaster).__name__} '
-                f'GUESSER:{type(self.guesser).__name__} SEED:{self.seed}\n'
-            )
-
-        with open("results/bot_results_new_style.txt", "a") as f:
-            results = {"game_name": self.game_name,
-                       "total_turns": num_of_turns,
-                       "R": red_result, "B": blue_result, "C": civ_result, "A": assa_result,
-                       "codemaster": type(self.codemaster).__name__,
-                       "guesser": type(self.guesser).__name__,
-                       "seed": self.seed,
-                       "time_s": (self.game_end_time - self.game_start_time),
-                       "cm_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                     for k, v in self.cm_kwargs.items()},
-                       "g_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                    for k, v in self.g_kwargs.items()},
-                       }
-            f.write(json.dumps(results))
-            f.write('\n')
+        if self.results_store is not None:
+            self.results_store.add(results)
+            return
+
+        ResultsWriter(self.results_dir).write(results)
 
     @staticmethod
-    def clear_results():
-        """Delete results folder"""
-        if os.path.exists("results") and os.path.isdir("results"):
-            shutil.rmtree("results")
+    def clear_results(results_dir="results"):
+        """Delete results folder
+        prefer giving each run its own folder (see results_store.create_run_dir)
+        over clearing a folder that other games may be writing to
+        """
+        if os.path.exists(results_dir) and os.path.isdir(results_dir):
+            shutil.rmtree(results_dir)
+
+    def _get_clue(self, words_in_play, key_grid):
+        """Clue of the codemaster for the current board, from the clue memo if it has it"""
+        memo_key = None
+        if self.clue_memo is not None:
+            memo_key = self.clue_memo.key(self.codemaster, self.cm_kwargs, words_in_play, key_grid)
+            if memo_key is not None:
+                memoized = self.clue_memo.get(memo_key)
+                if memoized is not None:
+                    self.instrumentation.count("clue_memo_hits")
+                    return memoized
+
+        deadline = None if self.clue_deadline_s is None else time.monotonic() + self.clue_deadline_s
+        if deadline is not None and isinstance(self.codemaster, AnytimeCodemaster):
+            clue, clue_num = self.codemaster.get_clue(deadline=deadline)
+        else:
+            clue, clue_num = self.codemaster.get_clue()
+        if deadline is not None and (getattr(self.codemaster, "deadline_hit", False)
+                                     or time.monotonic() > deadline):
+            self.deadline_hits += 1
+            self.instrumentation.count("deadline_hits")
+        elif memo_key is not None:
+            self.clue_memo.put(memo_key, clue, clue_num)
+        return clue, clue_num
 
     def run(self):
-        """Function that runs the codenames game between codemaster and guesser"""
+        """Function that runs the codenames game between codemaster and guesser
+        returns the results record of the game
+        """
+        self.results = None
+        timer = self.instrumentation.time
         game_condition = GameCondition.HIT_RED
         game_counter = 0
         while game_condition != GameCondition.LOSS and game_condition != GameCondition.WIN:
@@ -273,37 +359,48 @@ class Game:
             print('\n' * 2)
             words_in_play = self.get_words_on_board()
             current_key_grid = self.get_key_grid()
-            self.codemaster.set_game_state(words_in_play, current_key_grid)
-            self._display_key_grid()
-            self._display_board_codemaster()
+            with timer("codemaster.set_game_state"):
+                self.codemaster.set_game_state(words_in_play, current_key_grid)
+            with timer("engine.render"):
+                self._display_key_grid()
+                self._display_board_codemaster()
 
             # codemaster gives clue & number here
-            clue, clue_num = self.codemaster.get_clue()
+            with timer("codemaster.get_clue"):
+                clue, clue_num = self._get_clue(words_in_play, current_key_grid)
+            self.instrumentation.count("clues")
             game_counter += 1
             keep_guessing = True
             guess_num = 0
             clue_num = int(clue_num)
 
             print('\n' * 2)
-            self.guesser.set_clue(clue, clue_num)
+            with timer("guesser.set_clue"):
+                self.guesser.set_clue(clue, clue_num)
 
             game_condition = GameCondition.HIT_RED
             while guess_num <= clue_num and keep_guessing and game_condition == GameCondition.HIT_RED:
-                self.guesser.set_board(words_in_play)
-                guess_answer = self.guesser.get_answer()
+                with timer("guesser.set_board"):
+                    self.guesser.set_board(words_in_play)
+                with timer("guesser.get_answer"):
+                    guess_answer = self.guesser.get_answer()
 
                 # if no comparisons were made/found than retry input from codemaster
                 if guess_answer is None or guess_answer == "no comparisons":
+                    self.instrumentation.count("no_answers")
                     break
-                guess_answer_index = words_in_play.index(guess_answer.upper().strip())
+                self.instrumentation.count("guesses")
+                guess_answer_index = self.board.position_of(guess_answer)
                 game_condition = self._accept_guess(guess_answer_index)
 
                 if game_condition == GameCondition.HIT_RED:
                     print('\n' * 2)
-                    self._display_board_codemaster()
+                    with timer("engine.render"):
+                        self._display_board_codemaster()
                     guess_num += 1
                     print("Keep Guessing? the clue is ", clue, clue_num)
-                    keep_guessing = self.guesser.keep_guessing()
+                    with timer("guesser.keep_guessing"):
+                        keep_guessing = self.guesser.keep_guessing()
 
                 # if guesser selected a civilian or a blue-paired word
                 elif game_condition == GameCondition.CONTINUE:
@@ -312,16 +409,24 @@ class Game:
                 elif game_condition == GameCondition.LOSS:
                     self.game_end_time = time.time()
                     game_counter = 25
-                    self._display_board_codemaster()
+                    with timer("engine.render"):
+                        self._display_board_codemaster()
+                    self.results = self.get_results(game_counter)
                     if self.do_log:
-                        self.write_results(game_counter)
+                        with timer("engine.log"):
+                            self.write_results(game_counter, self.results)
                     print("You Lost")
                     print("Game Counter:", game_counter)
 
                 elif game_condition == GameCondition.WIN:
                     self.game_end_time = time.time()
-                    self._display_board_codemaster()
+                    with timer("engine.render"):
+                        self._display_board_codemaster()
+                    self.results = self.get_results(game_counter)
                     if self.do_log:
-                        self.write_results(game_counter)
+                        with timer("engine.log"):
+                            self.write_results(game_counter, self.results)
                     print("You Won")
                     print("Game Counter:", game_counter)
+
+        return self.results
@@ -2,6 +2,10 @@ import websockets, asyncio, sys
 from replay import ReplayHandler
 from player_config import get_codemaster, get_guesser
 from online_game import Game
+from results_store import create_run_dir
+from metrics import ACTIVE_SESSIONS, SESSIONS, SESSION_ERRORS, serve_metrics
+from profiling import BotProfiler
+from bot_pool import BotPool
 
 
 ##### Game configuration #####
@@ -14,6 +18,14 @@ CODEMASTER = "vector"
 # Name of Guesser player_config to use
 GUESSER = "human"
 
+# Number of bot instances constructed before the first connection
+# Bots are reset and reused between sessions instead of being constructed per connection
+POOL_SIZE = 2
+
+# Seconds the codemaster has for each clue, None for no limit
+# Anytime codemasters (e.g. the WordNet Lin codemaster) return their best clue so far when it passes
+CLUE_DEADLINE_S = 10
+
 ##### Replay configuration #####
 # Whether to replay a game or play a new game
 DO_REPLAY = False
@@ -26,8 +38,27 @@ REPLAY_ID = "<ID>"
 # Only used if DO_REPLAY is False
 RECORD_REPLAY = True
 
+##### Results configuration #####
+# Folder in which every server run gets its own results folder
+RESULTS_ROOT = "results"
+
+##### Metrics configuration #####
+# Address of the Prometheus text format endpoint (http://localhost:9100/metrics)
+# Set METRICS_PORT to None to disable it
+METRICS_HOST = "localhost"
+METRICS_PORT = 9100
+
+##### Profiling configuration #####
+# Profile the bot methods of every session: None, "sample" or "deterministic"
+# Profiles are written to PROFILE_DIR when the server is stopped
+PROFILE_MODE = None
+PROFILE_DIR = "profiles"
+
 ##### Don't change these #####
 CM_CLASS, G_CLASS, cm_kwargs, g_kwargs = None, None, {}, {}
+RESULTS_DIR = None
+PROFILER = None
+CM_POOL, G_POOL = None, None
 
 
 # Automatically called when DO_REPLAY is True
@@ -46,7 +77,7 @@ async def RunReplay(clientsocket):
 
 # Automatically called when DO_REPLAY is False
 async def RunGame(clientsocket):
-    global WORDPOOL_FILE, CODEMASTER, GUESSER, RECORD_REPLAY, CM_CLASS, G_CLASS, cm_kwargs, g_kwargs
+    global WORDPOOL_FILE, CODEMASTER, GUESSER, RECORD_REPLAY, CM_CLASS, G_CLASS, cm_kwargs, g_kwargs, RESULTS_DIR
 
     if CODEMASTER == "human":
         cm_kwargs = {"clientsocket": clientsocket}
@@ -55,42 +86,82 @@ async def RunGame(clientsocket):
 
     print("Starting game... (team red)")
 
-    Game.clear_results()
     seed = "time"
 
-    await Game(
-        CM_CLASS, G_CLASS, clientsocket, seed,
-        do_print=True,
-        game_name="Online Game",
-        cm_kwargs=cm_kwargs,
-        g_kwargs=g_kwargs,
-        do_record=RECORD_REPLAY,
-        wordpool_file=WORDPOOL_FILE
-    ).run()
+    codemaster = CM_POOL.acquire() if CM_POOL is not None else CM_CLASS
+    guesser = G_POOL.acquire() if G_POOL is not None else G_CLASS
+    try:
+        await Game(
+            codemaster, guesser, clientsocket, seed,
+            do_print=True,
+            game_name="Online Game",
+            cm_kwargs=cm_kwargs,
+            g_kwargs=g_kwargs,
+            do_record=RECORD_REPLAY,
+            wordpool_file=WORDPOOL_FILE,
+            results_dir=RESULTS_DIR,
+            profiler=PROFILER,
+            clue_deadline_s=CLUE_DEADLINE_S
+        ).run()
+    finally:
+        if CM_POOL is not None:
+            CM_POOL.release(codemaster)
+        if G_POOL is not None:
+            G_POOL.release(guesser)
 
 async def handler(websocket):
     global DO_REPLAY
-    print(await websocket.recv())
-    if DO_REPLAY:
-        await RunReplay(websocket)
-    else:
-        await RunGame(websocket)
+    SESSIONS.inc()
+    ACTIVE_SESSIONS.inc()
+    try:
+        print(await websocket.recv())
+        if DO_REPLAY:
+            await RunReplay(websocket)
+        else:
+            await RunGame(websocket)
+    except Exception:
+        SESSION_ERRORS.inc()
+        raise
+    finally:
+        ACTIVE_SESSIONS.dec()
 
 async def main():
-    print("Starting server...", end=" ", flush=True)
-    async with websockets.serve(handler, "localhost", 8001):
-        print("Server started.\nWaiting for connection...", end=" ")
-        await asyncio.Future()
+    metrics_server = None
+    if METRICS_PORT is not None:
+        metrics_server = await serve_metrics(METRICS_HOST, METRICS_PORT)
+        print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    try:
+        print("Starting server...", end=" ", flush=True)
+        async with websockets.serve(handler, "localhost", 8001):
+            print("Server started.\nWaiting for connection...", end=" ")
+            await asyncio.Future()
+    finally:
+        # also when the server is interrupted, asyncio.run cancels main
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
 
 if __name__ == "__main__":
     if not DO_REPLAY:
         print("Loading bots...", end=" ", flush=True)
         CM_CLASS, cm_kwargs = get_codemaster(CODEMASTER).load()
         G_CLASS, g_kwargs = get_guesser(GUESSER).load()
+        # human players are bound to their connection and cannot be pooled
+        if CODEMASTER != "human":
+            CM_POOL = BotPool(CM_CLASS, cm_kwargs, POOL_SIZE)
+        if GUESSER != "human":
+            G_POOL = BotPool(G_CLASS, g_kwargs, POOL_SIZE)
         print("Bots loaded.")
+        # sessions of this run share one results folder, earlier runs are left untouched
+        RESULTS_DIR = create_run_dir(RESULTS_ROOT, "online")
+        print(f"Writing results to {RESULTS_DIR}")
+        if PROFILE_MODE is not None:
+            PROFILER = BotProfiler(PROFILE_MODE, PROFILE_DIR)
 
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\n\n[Server Closed]\nCleaning up...")
+        if PROFILER is not None:
+            print("Profiles written to", ", ".join(PROFILER.write()))
         sys.exit()
@@ -0,0 +1,153 @@
+import bisect
+import sys
+import time
+from typing import Callable, Dict, List
+
+# upper bounds of the latency histogram buckets in seconds, the last bucket is unbounded
+LATENCY_BUCKETS_S = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+_hooks: List[Callable] = []
+
+
+def add_hook(hook: Callable) -> None:
+    """Call hook(phase, elapsed_s, context) after every measured call of every instrumented game
+
+    context is a dict with the game name and the codemaster/guesser classes,
+    e.g. to report slow bots while a tournament is running.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable) -> None:
+    _hooks.remove(hook)
+
+
+class PhaseStats:
+    """Count, total, maximum and histogram of the durations of one phase"""
+
+    __slots__ = ("count", "total_s", "max_s", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_S) + 1)
+
+    def add(self, elapsed_s: float) -> None:
+        self.count += 1
+        self.total_s += elapsed_s
+        if elapsed_s > self.max_s:
+            self.max_s = elapsed_s
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_S, elapsed_s)] += 1
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total_s": self.total_s, "max_s": self.max_s, "buckets": self.buckets}
+
+
+class _Timer:
+    __slots__ = ("instrumentation", "phase", "start")
+
+    def __init__(self, instrumentation, phase):
+        self.instrumentation = instrumentation
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    """Per-game timers and counters of the player methods and engine phases
+
+    Phases are named "<role>.<method>" for player calls (e.g. "codemaster.get_clue")
+    and "engine.<phase>" for the game itself (rendering, logging, ...).
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.phases: Dict[str, PhaseStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.context: dict = {}
+
+    def time(self, phase: str) -> _Timer:
+        """Context manager measuring one call of a phase"""
+        return _Timer(self, phase)
+
+    def record(self, phase: str, elapsed_s: float) -> None:
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.add(elapsed_s)
+        for hook in _hooks:
+            hook(phase, elapsed_s, self.context)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> dict:
+        """Timings and counters as stored in the results record"""
+        return {"timings": {phase: stats.to_dict() for phase, stats in self.phases.items()},
+                "counters": dict(self.counters)}
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _DisabledInstrumentation:
+    """Stand-in used when instrumentation is off, every call is a no-op"""
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def __init__(self):
+        self.context = {}
+
+    def time(self, phase: str) -> _NullTimer:
+        return self._timer
+
+    def record(self, phase: str, elapsed_s: float) -> None:
+        pass
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def summary(self) -> None:
+        return None
+
+
+DISABLED = _DisabledInstrumentation()
+
+
+def format_summary(summary: dict) -> str:
+    """Human readable table of an Instrumentation.summary(), slowest phases first"""
+    lines = [f"{'phase':<28}{'calls':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}"]
+    timings = sorted(summary["timings"].items(), key=lambda item: -item[1]["total_s"])
+    for phase, stats in timings:
+        mean_ms = 1000 * stats["total_s"] / stats["count"] if stats["count"] else 0.0
+        lines.append(f"{phase:<28}{stats['count']:>7}{stats['total_s']:>10.3f}{mean_ms:>10.2f}"
+                     f"{1000 * stats['max_s']:>10.2f}")
+    for name, value in sorted(summary["counters"].items()):
+        lines.append(f"{name}: {value}")
+    return "\n".join(lines)
+
+
+def slow_call_hook(threshold_s: float, file=None) -> Callable:
+    """Hook printing every player call that takes longer than threshold_s"""
+    def hook(phase, elapsed_s, context):
+        if elapsed_s >= threshold_s and not phase.startswith("engine."):
+            player = context.get(phase.split(".")[0], "?")
+            print(f"slow call: {player}.{phase.split('.', 1)[1]} took {elapsed_s:.2f}s "
+                  f"in game {context.get('game_name')}", file=file if file is not None else sys.stderr)
+    return hook
@@ -10,8 +10,14 @@ import colorama
 import gensim.models.keyedvectors as word2vec
 import numpy as np
 from nltk.corpus import wordnet_ic
+import board
+from instrumentation import DISABLED, Instrumentation
+from quantization import load_glove_quantized, load_w2v_quantized
+from restricted_vectors import load_restricted
+from results_store import ResultsWriter
 from replay import GuessAction, HintAction, ReplayHandler
-from players.online import OnlineCodemaster, OnlineGuesser, send
+from players.online import OnlineCodemaster, OnlineGuesser, OnlineHumanCodemaster, OnlineHumanGuesser, send
+from speculation import Speculator
 
 class GameCondition(enum.Enum):
     """Enumeration that represents the different states of the game"""
@@ -30,7 +36,8 @@ class Game:
     def __init__(self, codemaster, guesser, clientsocket,
                  seed="time", do_print=True, do_log=True, game_name="default",
                  cm_kwargs={}, g_kwargs={}, replay_folder="replays", do_record=False,
-                 wordpool_file="game_wordpool.txt", is_replaying=False):
+                 wordpool_file="game_wordpool.txt", is_replaying=False, results_store=None, results_dir="results",
+                 instrument=False, profiler=None, clue_deadline_s=None, speculate=True):
         """ Setup Game details
 
         Args:
@@ -63,6 +70,24 @@ class Game:
                 Whether the game is being replayed or not. Defaults to False.
                 This is used to determine the seed and the codemaster/guesser
                 classes.
+            results_store (:class:`ResultsStore`, optional):
+                Batched results sink used instead of the results/*.txt files.
+            results_dir (str, optional):
+                Folder the results/*.txt files are appended to. Defaults to "results".
+            instrument (bool, optional):
+                Whether to time the player calls and engine phases. The timings are
+                added to the results record and passed to the instrumentation hooks.
+                Defaults to False.
+            profiler (:class:`BotProfiler`, optional):
+                Profiler the methods of both players are attached to.
+            clue_deadline_s (float, optional):
+                Seconds the codemaster has for each clue. An AnytimeCodemaster gets
+                the deadline and returns its best clue so far when it passes, the
+                number of clues cut short or late is added to the results record.
+            speculate (bool, optional):
+                Whether the bots prepare the likely next states while a human
+                player is thinking (see Codemaster.speculate and Guesser.speculate).
+                Defaults to True.
         """
         game_wordpool = wordpool_file
 
@@ -74,8 +99,11 @@ class Game:
             self._save_stdout = sys.stdout
             sys.stdout = open(os.devnull, 'w')
 
-        self.codemaster = OnlineCodemaster(clientsocket, codemaster, cm_kwargs)
-        self.guesser = OnlineGuesser(clientsocket, self.codemaster.codemaster if is_replaying else guesser, is_replaying, g_kwargs)
+        self.instrumentation = Instrumentation() if instrument else DISABLED
+        with self.instrumentation.time("codemaster.__init__"):
+            self.codemaster = OnlineCodemaster(clientsocket, codemaster, cm_kwargs)
+        with self.instrumentation.time("guesser.__init__"):
+            self.guesser = OnlineGuesser(clientsocket, self.codemaster.codemaster if is_replaying else guesser, is_replaying, g_kwargs)
 
         self.clientsocket = clientsocket
 
@@ -83,6 +111,21 @@ class Game:
         self.g_kwargs = g_kwargs
         self.do_log = do_log
         self.game_name = game_name
+        self.results_store = results_store
+        self.results_dir = results_dir
+        self.clue_deadline_s = clue_deadline_s
+        self.deadline_hits = 0
+        # a bot facing a human prepares the next states on a background thread while the human thinks
+        self.speculator = Speculator() if speculate else None
+        self.codemaster_is_human = isinstance(self.codemaster.codemaster, OnlineHumanCodemaster)
+        self.guesser_is_human = isinstance(self.guesser.guesser, OnlineHumanGuesser)
+        if profiler is not None:
+            profiler.attach(self.codemaster.codemaster, "codemaster")
+            profiler.attach(self.guesser.guesser, "guesser")
+        if self.instrumentation.enabled:
+            self.instrumentation.context = {"game_name": game_name,
+                                            "codemaster": type(self.codemaster).__name__,
+                                            "guesser": type(self.guesser).__name__}
 
         # set seed so that board/keygrid can be reloaded later
         if is_replaying:
@@ -112,15 +155,17 @@ class Game:
             self.replayManager.save_replay()
 
         # load board words
-        with open(game_wordpool, "r") as f:
-            temp = f.read().splitlines()
-            assert len(temp) == len(set(temp)), f"{game_wordpool} should not have duplicates"
-            random.shuffle(temp)
-            self.words_on_board = temp[:25]
+        temp = list(board.get_wordpool(game_wordpool))
+        random.shuffle(temp)
 
         # set grid key for codemaster (spymaster)
-        self.key_grid = ["Red"] * 8 + ["Blue"] * 7 + ["Civilian"] * 9 + ["Assassin"]
-        random.shuffle(self.key_grid)
+        key_grid = ["Red"] * 8 + ["Blue"] * 7 + ["Civilian"] * 9 + ["Assassin"]
+        random.shuffle(key_grid)
+
+        # the engine works on the word ids and key codes of the board, the players on its string views
+        self.board = board.Board(temp[:25], key_grid, game_wordpool)
+        self.words_on_board = self.board.words
+        self.key_grid = self.board.key_grid
 
     def __del__(self):
         """reset stdout if using the do_print==False option"""
@@ -129,10 +174,17 @@ class Game:
             sys.stdout = self._save_stdout
 
     @staticmethod
-    def load_glove_vecs(glove_file_path):
+    def load_glove_vecs(glove_file_path, quantize=None, vocabulary=None):
         """Load stanford nlp glove vectors
         Original source that matches the function: https://nlp.stanford.edu/data/glove.6B.zip
+        quantize: None, or "float16"/"int8" to keep the vectors quantized (see quantization.py)
+        vocabulary: None, or the words to keep in memory, others are read on demand (see restricted_vectors.py)
         """
+        if vocabulary is not None:
+            assert quantize is None, "restricted vectors are not quantized"
+            return load_restricted(glove_file_path, vocabulary, binary=False)
+        if quantize is not None:
+            return load_glove_quantized(glove_file_path, quantize)
         with open(glove_file_path, encoding="utf-8") as infile:
             glove_vecs = {}
             for line in infile:
@@ -146,10 +198,17 @@ class Game:
         return wordnet_ic.ic(wordnet_file)
 
     @staticmethod
-    def load_w2v(w2v_file_path):
+    def load_w2v(w2v_file_path, quantize=None, vocabulary=None):
         """Function to initalize gensim w2v object from Google News w2v Vectors
         Vectors Source: https://drive.google.com/file/d/0B7XkCwpI5KDYNlNUTTlSS21pQmM/edit
+        quantize: None, or "float16"/"int8" to keep the vectors quantized (see quantization.py)
+        vocabulary: None, or the words to keep in memory, others are read on demand (see restricted_vectors.py)
         """
+        if vocabulary is not None:
+            assert quantize is None, "restricted vectors are not quantized"
+            return load_restricted(w2v_file_path, vocabulary, binary=True)
+        if quantize is not None:
+            return load_w2v_quantized(w2v_file_path, quantize)
         return word2vec.KeyedVectors.load_word2vec_format(w2v_file_path, binary=True, unicode_errors='ignore')
 
     def _display_board_codemaster(self):
@@ -220,85 +279,124 @@ class Game:
         """Return the codemaster's key"""
         return self.key_grid
 
+    def _speculate_next_turn(self):
+        """Let a bot codemaster prepare the boards that may follow the pending move of a human guesser"""
+        speculate = getattr(self.codemaster.codemaster, "speculate", None)
+        if self.speculator is None or speculate is None or self.codemaster_is_human or not self.guesser_is_human:
+            return
+        key_grid = list(self.key_grid)
+        # the board if the guesser stops, then a reveal of each word, red words first as the likeliest guesses
+        hidden = sorted(np.flatnonzero(~self.board.revealed), key=lambda p: self.board.keys[p] != board.RED)
+        boards = [list(self.words_on_board)] + [self.board.words_if_revealed(p) for p in hidden]
+        self.speculator.start([(speculate, (words, key_grid)) for words in boards])
+        self.instrumentation.count("speculations", len(boards))
+
+    def _speculate_next_clue(self, words_in_play):
+        """Let a bot guesser prepare for the clue a human codemaster is typing"""
+        speculate = getattr(self.guesser.guesser, "speculate", None)
+        if self.speculator is None or speculate is None or self.guesser_is_human or not self.codemaster_is_human:
+            return
+        self.speculator.start([(speculate, (list(words_in_play),))])
+        self.instrumentation.count("speculations")
+
+    async def _stop_speculating(self):
+        if self.speculator is not None:
+            await self.speculator.stop()
+
     def _accept_guess(self, guess_index):
         """Function that takes in an int index called guess to compare with the key grid
         CodeMaster will always win with Red and lose if Blue =/= 7 or Assassin == 1
         """
-        if self.key_grid[guess_index] == "Red":
-            self.words_on_board[guess_index] = "*Red*"
-            if self.words_on_board.count("*Red*") >= 8:
+        key = self.board.reveal(guess_index)
+        if key == board.RED:
+            if self.board.revealed_count(board.RED) >= 8:
                 return GameCondition.WIN
             return GameCondition.HIT_RED
 
-        elif self.key_grid[guess_index] == "Blue":
-            self.words_on_board[guess_index] = "*Blue*"
-            if self.words_on_board.count("*Blue*") >= 7:
+        elif key == board.BLUE:
+            if self.board.revealed_count(board.BLUE) >= 7:
                 return GameCondition.LOSS
             else:
                 return GameCondition.CONTINUE
 
-        elif self.key_grid[guess_index] == "Assassin":
-            self.words_on_board[guess_index] = "*Assassin*"
+        elif key == board.ASSASSIN:
             return GameCondition.LOSS
 
         else:
-            self.words_on_board[guess_index] = "*Civilian*"
             return GameCondition.CONTINUE
 
-    def write_results(self, num_of_turns):
+    def get_results(self, num_of_turns):
+        """Return the results record of the finished game"""
+        red_result = self.board.revealed_count(board.RED)
+        blue_result = self.board.revealed_count(board.BLUE)
+        civ_result = self.board.revealed_count(board.CIVILIAN)
+        assa_result = self.board.revealed_count(board.ASSASSIN)
+
+        # the bots wrapped by OnlineCodemaster and OnlineGuesser
+        codemaster, guesser = type(self.codemaster.codemaster), type(self.guesser.guesser)
+        results = {"game_name": self.game_name,
+                   "total_turns": num_of_turns,
+                   "R": red_result, "B": blue_result, "C": civ_result, "A": assa_result,
+                   "codemaster": codemaster.__name__,
+                   "guesser": guesser.__name__,
+                   "codemaster_module": codemaster.__module__,
+                   "guesser_module": guesser.__module__,
+                   "seed": self.seed,
+                   "time_s": (self.game_end_time - self.game_start_time),
+                   "cm_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                 for k, v in self.cm_kwargs.items()},
+                   "g_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
+                                for k, v in self.g_kwargs.items()},
+                   }
+
+        if self.clue_deadline_s is not None:
+            results["clue_deadline_s"] = self.clue_deadline_s
+            results["deadline_hits"] = self.deadline_hits
+
+        instrumentation = self.instrumentation.summary()
+        if instrumentation is not None:
+            results.update(instrumentation)
+        return results
+
+    def write_results(self, num_of_turns, results=None):
         """Logging function
+        adds the record to the results store if one was given, otherwise
         writes in both the original and a more detailed new style
+        to the results folder, safe when several games share the folder
+        results: the record of get_results, built here when None
         """
-        red_result = 0
-        blue_result = 0
-        civ_result = 0
-        assa_result = 0
+        if results is None:
+            results = self.get_results(num_of_turns)
 
-        for i in range(len(self.words_on_board)):
-            if self.words_on_board[i] == "*Red*":
-                red_result += 1
-            elif self.words_on_board[i] == "*Blue*":
-                blue_result += 1
-            elif self.words_on_board[i] == "*Civilian*":
-                civ_result += 1
-            elif self.words_on_board[i] == "*Assassin*":
-                assa_result += 1
-        total = red_result + blue_result + civ_result + assa_result
-
-        if not os.path.exists("results"):
-            os.mkdir("results")
-
-        with open("results/bot_results.txt", "a") as f:
-            f.write(
-                f'TOTAL:{num_of_turns} B:{blue_result} C:{civ_result} A:{assa_result}'
-                f' R:{red_result} CM:{type(self.codemaster).__name__} '
-                f'GUESSER:{type(self.guesser).__name__} SEED:{self.seed}\n'
-            )
-
-        with open("results/bot_results_new_style.txt", "a") as f:
-            results = {"game_name": self.game_name,
-                       "total_turns": num_of_turns,
-                       "R": red_result, "B": blue_result, "C": civ_result, "A": assa_result,
-                       "codemaster": type(self.codemaster).__name__,
-                       "guesser": type(self.guesser).__name__,
-                       "seed": self.seed,
-                       "time_s": (self.game_end_time - self.game_start_time),
-                       "cm_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                     for k, v in self.cm_kwargs.items()},
-                       "g_kwargs": {k: v if isinstance(v, float) or isinstance(v, int) or isinstance(v, str) else None
-                                    for k, v in self.g_kwargs.items()},
-                       }
-            f.write(json.dumps(results))
-            f.write('\n')
+        if self.results_store is not None:
+            self.results_store.add(results)
+            return
+
+        ResultsWriter(self.results_dir).write(results)
 
     @staticmethod
-    def clear_results():
-        """Delete results folder"""
-        if os.path.exists("results") and os.path.isdir("results"):
-            shutil.rmtree("results")
+    def clear_results(results_dir="results"):
+        """Delete results folder
+        prefer giving each run its own folder (see results_store.create_run_dir)
+        over clearing a folder that other games may be writing to
+        """
+        if os.path.exists(results_dir) and os.path.isdir(results_dir):
+            shutil.rmtree(results_dir)
 
     async def run(self):
-        """Function that runs the codenames game between codemaster and guesser"""
+        """Function that runs the codenames game between codemaster and guesser
+        returns the results record of the game
+        """
+        try:
+            return await self._play()
+        finally:
+            # also when the session fails, before the caller resets the bots and hands them to another session
+            if self.speculator is not None:
+                await self.speculator.close()
+
+    async def _play(self):
+        self.results = None
+        timer = self.instrumentation.time
         game_condition = GameCondition.HIT_RED
         game_counter = 0
         while game_condition != GameCondition.LOSS and game_condition != GameCondition.WIN:
@@ -306,50 +404,75 @@ class Game:
             print('\n' * 2)
             words_in_play = self.get_words_on_board()
             current_key_grid = self.get_key_grid()
-            await self.codemaster.set_game_state(words_in_play, current_key_grid)
-            self._display_key_grid()
-            self._display_board_codemaster()
+            with timer("codemaster.set_game_state"):
+                await self.codemaster.set_game_state(words_in_play, current_key_grid)
+            with timer("engine.render"):
+                self._display_key_grid()
+                self._display_board_codemaster()
 
             # codemaster gives clue & number here
-            clue, clue_num = await self.codemaster.get_clue()  # TODO: implement intentions
+            deadline = None if self.clue_deadline_s is None else time.monotonic() + self.clue_deadline_s
+            self._speculate_next_clue(words_in_play)
+            with timer("codemaster.get_clue"):
+                clue, clue_num = await self.codemaster.get_clue(deadline=deadline)  # TODO: implement intentions
+            await self._stop_speculating()
+            self.instrumentation.count("clues")
+            if deadline is not None and (self.codemaster.deadline_hit or time.monotonic() > deadline):
+                self.deadline_hits += 1
+                self.instrumentation.count("deadline_hits")
             if self.replayManager is not None:
-                self.replayManager.add_action(HintAction(clue, clue_num, "red"))
-                self.replayManager.save_replay()
+                with timer("engine.replay"):
+                    self.replayManager.add_action(HintAction(clue, clue_num, "red"))
+                    self.replayManager.save_replay()
             game_counter += 1
             keep_guessing = True
             guess_num = 0
             clue_num = int(clue_num)
 
             print('\n' * 2)
-            self.guesser.set_clue(clue, clue_num)
+            with timer("guesser.set_clue"):
+                self.guesser.set_clue(clue, clue_num)
 
             game_condition = GameCondition.HIT_RED
             while guess_num <= clue_num and keep_guessing and game_condition == GameCondition.HIT_RED:
-                await self.guesser.set_board(words_in_play)
-                guess_answer = await self.guesser.get_answer()
+                with timer("guesser.set_board"):
+                    await self.guesser.set_board(words_in_play)
+                self._speculate_next_turn()
+                with timer("guesser.get_answer"):
+                    guess_answer = await self.guesser.get_answer()
+                await self._stop_speculating()
                 action = GuessAction(guess_answer, "red")
 
                 # if no comparisons were made/found than retry input from codemaster
                 if guess_answer is None or guess_answer == "no comparisons":
+                    self.instrumentation.count("no_answers")
                     if self.replayManager is not None:
-                        self.replayManager.add_action(action)
-                        self.replayManager.save_replay()
+                        with timer("engine.replay"):
+                            self.replayManager.add_action(action)
+                            self.replayManager.save_replay()
                     break
-                guess_answer_index = words_in_play.index(guess_answer.upper().strip())
+                self.instrumentation.count("guesses")
+                guess_answer_index = self.board.position_of(guess_answer)
+                await self.guesser.send_guess_success(guess_answer_index)
                 game_condition = self._accept_guess(guess_answer_index)
 
                 if game_condition == GameCondition.HIT_RED:
                     print('\n' * 2)
-                    self._display_board_codemaster()
+                    with timer("engine.render"):
+                        self._display_board_codemaster()
                     guess_num += 1
                     print("Keep Guessing? the clue is ", clue, clue_num)
                     if (guess_num <= clue_num):
-                        keep_guessing = await self.guesser.keep_guessing()
+                        self._speculate_next_turn()
+                        with timer("guesser.keep_guessing"):
+                            keep_guessing = await self.guesser.keep_guessing()
+                        await self._stop_speculating()
                         if keep_guessing:
                             action.keep_guessing()
                     if self.replayManager is not None:
-                        self.replayManager.add_action(action)
-                        self.replayManager.save_replay()
+                        with timer("engine.replay"):
+                            self.replayManager.add_action(action)
+                            self.replayManager.save_replay()
 
                 # if guesser selected a civilian or a blue-paired word
                 elif game_condition == GameCondition.CONTINUE:
@@ -360,24 +483,34 @@ class Game:
                 elif game_condition == GameCondition.LOSS:
                     self.game_end_time = time.time()
                     game_counter = 25
-                    self._display_board_codemaster()
+                    with timer("engine.render"):
+                        self._display_board_codemaster()
                     if self.replayManager is not None:
-                        self.replayManager.add_action(action)
-                        self.replayManager.save_replay(True)
+                        with timer("engine.replay"):
+                            self.replayManager.add_action(action)
+                            self.replayManager.save_replay(True)
+                    self.results = self.get_results(game_counter)
                     if self.do_log:
-                        self.write_results(game_counter)
+                        with timer("engine.log"):
+                            self.write_results(game_counter, self.results)
                     print("You Lost")
                     print("Game Counter:", game_counter)
-                    await self.clientsocket.send(json.dumps({"game_over": "lost"}))
+                    await send(self.clientsocket, json.dumps({"game_over": "lost"}))
 
                 elif game_condition == GameCondition.WIN:
                     self.game_end_time = time.time()
-                    self._display_board_codemaster()
+                    with timer("engine.render"):
+                        self._display_board_codemaster()
                     if self.replayManager is not None:
-                        self.replayManager.add_action(action)
-                        self.replayManager.save_replay(True)
+                        with timer("engine.replay"):
+                            self.replayManager.add_action(action)
+                            self.replayManager.save_replay(True)
+                    self.results = self.get_results(game_counter)
                     if self.do_log:
-                        self.write_results(game_counter)
+                        with timer("engine.log"):
+                            self.write_results(game_counter, self.results)
                     print("You Won")
                     print("Game Counter:", game_counter)
                     await send(self.clientsocket, json.dumps({"game_over": "won"}))
+
+        return self.results
@@ -1,6 +1,7 @@
 import sys, importlib
 from typing import List, Literal, Tuple, Union, Callable
 from online_game import Game
+from restricted_vectors import game_vocabulary
 from players.codemaster import Codemaster
 from players.guesser import Guesser
 
@@ -126,8 +127,10 @@ PLAYERS = [
         classname="VectorCodemaster",
         kwargs=lambda: {
             "vectors": [
-                resource("w2v", Game.load_w2v, "players/GoogleNews-vectors-negative300.bin").get(),
-                resource("glove", Game.load_glove_vecs, "players/glove.6B.200d.txt").get()
+                resource("w2v", Game.load_w2v, "players/GoogleNews-vectors-negative300.bin",
+                         vocabulary=game_vocabulary()).get(),
+                resource("glove", Game.load_glove_vecs, "players/glove.6B.200d.txt",
+                         vocabulary=game_vocabulary()).get()
             ],
             "distance_threshold": 0.7,
             "same_clue_patience": 1,
@@ -154,8 +157,10 @@ PLAYERS = [
         classname="VectorGuesser",
         kwargs=lambda: {
             "vectors": [
-                resource("w2v", Game.load_w2v, "players/GoogleNews-vectors-negative300.bin").get(),
-                resource("glove", Game.load_glove_vecs, "players/glove.6B.100d.txt").get()
+                resource("w2v", Game.load_w2v, "players/GoogleNews-vectors-negative300.bin",
+                         vocabulary=game_vocabulary()).get(),
+                resource("glove", Game.load_glove_vecs, "players/glove.6B.100d.txt",
+                         vocabulary=game_vocabulary()).get()
             ]
         }
     ),
@@ -168,6 +173,16 @@ PLAYERS = [
         module="players.ada_guesser",
         classname="ADAGuesser",
         kwargs={}
+    ),
+
+    # Example ada embedding guesser that does not block the server's event loop
+    player_config(
+        role="guesser",
+        name="ada_async",
+        root=None,
+        module="players.async_ada_guesser",
+        classname="AsyncADAGuesser",
+        kwargs={}
     )
 ]
 
@@ -1,22 +1,76 @@
 import requests
 import numpy as np
 from players.guesser import Guesser
+from players.embedding_cache import get_embedding_cache
+
+OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+
+# maximum number of inputs the embeddings endpoint accepts in a single request
+MAX_BATCH_SIZE = 2048
+
+REVEALED_TOKENS = ["*Red*", "*Blue*", "*Civilian*", "*Assassin*"]
+
 
 class ADAGuesser(Guesser):
     """Guesser class that mimics a field operative in the Codenames game"""
 
-    def __init__(self):
-        """Handle pretrained vectors and declare instance vars"""
+    def __init__(self, api_key=None, model="text-embedding-ada-002", api_url=OPENAI_EMBEDDINGS_URL,
+                 cache_dir="players/embedding_cache", prefetch=True,
+                 wordpool_file="game_wordpool.txt", clue_wordlist_file="players/cm_wordlist.txt"):
+        """Handle pretrained vectors and declare instance vars
+
+        Args:
+            api_key (str, optional):
+                OpenAI API key, read from players/openai_api.key when omitted.
+            model (str, optional):
+                Embedding model name, also used to key the embedding cache.
+            api_url (str, optional):
+                Embeddings endpoint, can point at a local stub server for testing.
+            cache_dir (str, optional):
+                Folder for the persistent embedding cache.
+            prefetch (bool, optional):
+                Whether to embed the board wordpool and clue wordlist up front,
+                so that a game only needs requests for clues outside of them.
+        """
         self.board = None
         self.clue = None
         self.num_guesses = 0
-        self.model = "text-embedding-ada-002"
+        self.model = model
+        self.api_url = api_url
+        self.api_key = api_key if api_key is not None else self.read_api_key()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        self.cache = get_embedding_cache(self.model, cache_dir)
+
+        if prefetch:
+            self.prefetch(wordpool_file, clue_wordlist_file)
+
+    @staticmethod
+    def read_api_key():
+        """Read the OpenAI API key from players/openai_api.key"""
         try:
             with open("players/openai_api.key", "r") as f:
-                self.api_key = f.read().strip()
+                return f.read().strip()
         except FileNotFoundError:
             raise FileNotFoundError("You must create a file called openai_api.key with your OpenAI API key in it")
 
+    @staticmethod
+    def read_word_files(*word_files):
+        """Return the words of the given files, one word per line"""
+        words = []
+        for word_file in word_files:
+            with open(word_file, "r") as f:
+                words.extend(line.strip() for line in f if line.strip())
+        return words
+
+    def prefetch(self, *word_files):
+        """Embed every word of the given files that is not cached yet"""
+        self.get_embeddings(self.read_word_files(*word_files))
+        self.cache.save()
 
     def set_board(self, words_on_board):
         """Set function for the current game board"""
@@ -31,44 +85,49 @@ class ADAGuesser(Guesser):
         """Return True if guess attempts remaining otherwise False"""
         return self.num_guesses > 0
 
-    def get_embeddings(self, words):
-        """Get embeddings for a list of words using OpenAI API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": self.model,
-            "input": words
-        }
-        response = requests.post(
-            "https://api.openai.com/v1/embeddings",
-            json=data,
-            headers=headers
-        )
-        response.raise_for_status()
-        embeddings = [embedding["embedding"] for embedding in response.json()["data"]]
+    def request_embeddings(self, words):
+        """Request embeddings for a list of words from the OpenAI API, bypassing the cache"""
+        embeddings = []
+        for start in range(0, len(words), MAX_BATCH_SIZE):
+            data = {
+                "model": self.model,
+                "input": words[start:start + MAX_BATCH_SIZE]
+            }
+            response = self.session.post(self.api_url, json=data)
+            response.raise_for_status()
+            batch = sorted(response.json()["data"], key=lambda embedding: embedding["index"])
+            embeddings.extend(embedding["embedding"] for embedding in batch)
         return embeddings
 
+    def get_embeddings(self, words):
+        """Get embeddings for a list of words, requesting all uncached words in one batch"""
+        missing = self.cache.missing(words)
+        if missing:
+            self.cache.add(missing, self.request_embeddings(missing))
+        return self.cache.get_many(words)
+
     def get_answer(self):
         """Return the top guessed word based on the clue and current game board"""
         if not self.board or not self.clue:
             raise ValueError("Board and clue must be set before getting an answer")
 
-        # Get embeddings for the clue and words on the board
-        clue_embedding = self.get_embeddings([self.clue])[0]
-        board_embeddings = self.get_embeddings(self.board)
+        # Get embeddings for the clue and the unrevealed words on the board
+        in_play = self._words_in_play()
+        embeddings = self.get_embeddings([self.clue] + [self.board[i] for i in in_play])
+        return self._best_guess(in_play, embeddings)
+
+    def _words_in_play(self):
+        """Return the board indices of the words that have not been revealed yet"""
+        return [i for i, word in enumerate(self.board) if word not in REVEALED_TOKENS]
+
+    def _best_guess(self, in_play, embeddings):
+        """Pick the board word closest to the clue, embeddings[0] being the clue embedding"""
+        clue_embedding, board_embeddings = embeddings[0], embeddings[1:]
 
         # Calculate cosine similarity between clue and board words
-        clue_norm = np.linalg.norm(clue_embedding)
-        similarities = []
-        for word_embedding, word in zip(board_embeddings, self.board):
-            if (word in ["*Red*", "*Blue*", "*Civilian*", "*Assassin*"]):
-                similarities.append(-np.inf)
-                continue
-            word_norm = np.linalg.norm(word_embedding)
-            similarity = np.dot(clue_embedding, word_embedding) / (clue_norm * word_norm)
-            similarities.append(similarity)
+        similarities = np.full(len(self.board), -np.inf)
+        similarities[in_play] = board_embeddings @ clue_embedding / (
+            np.linalg.norm(board_embeddings, axis=1) * np.linalg.norm(clue_embedding))
 
         # Get the index of the highest similarity
         best_guess_index = np.argmax(similarities)
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import random
+from typing import Dict, List
+
+import aiohttp
+
+from players.ada_guesser import ADAGuesser, OPENAI_EMBEDDINGS_URL, MAX_BATCH_SIZE
+from players.embedding_cache import EmbeddingCache, get_embedding_cache
+
+# status codes that are worth retrying, everything else is raised immediately
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AsyncEmbeddingClient:
+    """asyncio client for the embeddings endpoint shared by every game of a process
+
+    - one pooled aiohttp session per event loop
+    - concurrent requests for the same word share a single in-flight request, which
+      runs in a task of its own so that cancelling the game that started it does
+      not cancel it for the others
+    - failed requests are retried with exponential backoff, each attempt has a timeout
+    - the cache files are written in an executor, off the event loop
+    """
+
+    def __init__(self, api_key: str, model: str, api_url: str, cache: EmbeddingCache,
+                 max_connections: int = 8, timeout_s: float = 10.0,
+                 max_retries: int = 4, backoff_s: float = 0.5):
+        self.api_key = api_key
+        self.model = model
+        self.api_url = api_url
+        self.cache = cache
+        self.max_connections = max_connections
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+
+        self.session = None
+        self._session_loop = None
+        self.num_requests = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # fetch tasks are referenced until they finish, the loop only keeps weak references
+        self._fetches = set()
+        self._prefetched = set()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session lazily, it has to be bound to the running loop"""
+        loop = asyncio.get_running_loop()
+        session = self.session
+        if session is None or session.closed or self._session_loop is not loop:
+            stale, stale_loop = session, self._session_loop
+            self._session_loop = loop
+            self.session = session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                }
+            )
+            if stale is not None and not stale.closed:
+                await self._close_stale_session(stale, stale_loop)
+        return session
+
+    @staticmethod
+    async def _close_stale_session(session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop):
+        """Close the session of a loop that is not the running one"""
+        if loop.is_running():
+            # the loop serves games in another thread, close the session there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            await session.close()
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def _post(self, words: List[str]) -> List[List[float]]:
+        """POST one batch of words, retrying transient failures"""
+        session = await self._get_session()
+        data = {"model": self.model, "input": words}
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.num_requests += 1
+                async with session.post(self.api_url, json=data) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status)
+                    response.raise_for_status()
+                    batch = sorted((await response.json())["data"], key=lambda embedding: embedding["index"])
+                    return [embedding["embedding"] for embedding in batch]
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, aiohttp.ClientResponseError) and e.status not in RETRY_STATUSES:
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                # exponential backoff with jitter so that retrying games do not move in lockstep
+                await asyncio.sleep(self.backoff_s * 2 ** attempt * (0.5 + random.random()))
+
+    async def _fetch(self, words: List[str], futures: List[asyncio.Future]):
+        """Request the given words and resolve their futures"""
+        try:
+            embeddings = []
+            for start in range(0, len(words), MAX_BATCH_SIZE):
+                embeddings.extend(await self._post(words[start:start + MAX_BATCH_SIZE]))
+            self.cache.add(words, embeddings, autosave=False)
+        except BaseException as e:
+            for future in futures:
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # the exception is re-raised to the awaiting guessers, mark it retrieved here
+                    future.exception()
+            raise
+        finally:
+            for word in words:
+                self._in_flight.pop(word, None)
+        for future in futures:
+            future.set_result(None)
+        if self.cache.save_due():
+            await self._save_cache()
+
+    def _fetch_done(self, fetch: asyncio.Future):
+        self._fetches.discard(fetch)
+        if not fetch.cancelled():
+            # the game that started the fetch may be gone, the others get the error from their futures
+            fetch.exception()
+
+    async def _save_cache(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.cache.save)
+
+    async def get_embeddings(self, words: List[str]):
+        """Get embeddings for a list of words, sharing requests with other games"""
+        waiting = []
+        new_words = []
+        new_futures = []
+        for word in self.cache.missing(words):
+            if word in self._in_flight:
+                waiting.append(self._in_flight[word])
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._in_flight[word] = future
+                new_words.append(word)
+                new_futures.append(future)
+
+        if new_words:
+            fetch = asyncio.ensure_future(self._fetch(new_words, new_futures))
+            self._fetches.add(fetch)
+            fetch.add_done_callback(self._fetch_done)
+            waiting.append(fetch)
+        if waiting:
+            # the futures are shared with other games, cancelling this one must not cancel them
+            await asyncio.gather(*(asyncio.shield(future) for future in waiting))
+        return self.cache.get_many(words)
+
+    async def prefetch(self, *word_files):
+        """Embed every word of the given files once per client"""
+        word_files = [f for f in word_files if f not in self._prefetched]
+        if not word_files:
+            return
+        self._prefetched.update(word_files)
+        try:
+            await self.get_embeddings(ADAGuesser.read_word_files(*word_files))
+        except BaseException:
+            self._prefetched.difference_update(word_files)
+            raise
+        await self._save_cache()
+
+
+_clients: Dict[tuple, AsyncEmbeddingClient] = {}
+
+
+def get_async_client(api_key: str, model: str, api_url: str, cache_dir: str, **kwargs) -> AsyncEmbeddingClient:
+    """Return the process wide client for an endpoint/model pair, cache folder and connection settings
+
+    Guessers with other settings (pool size, timeout, retry policy) get a client of their own.
+    """
+    key = (api_key, model, api_url, os.path.abspath(cache_dir), tuple(sorted(kwargs.items())))
+    if key not in _clients:
+        _clients[key] = AsyncEmbeddingClient(api_key, model, api_url, get_embedding_cache(model, cache_dir), **kwargs)
+    return _clients[key]
+
+
+class AsyncADAGuesser(ADAGuesser):
+    """ADAGuesser variant that does not block the event loop of the online server"""
+
+    def __init__(self, api_key=None, model="text-embedding-ada-002", api_url=OPENAI_EMBEDDINGS_URL,
+                 cache_dir="players/embedding_cache", prefetch=True,
+                 wordpool_file="game_wordpool.txt", clue_wordlist_file="players/cm_wordlist.txt",
+                 max_connections=8, timeout_s=10.0, max_retries=4, backoff_s=0.5):
+        """Same arguments as ADAGuesser, plus the connection pool size and retry policy
+
+        Prefetching happens asynchronously on the first call to get_answer.
+        """
+        super().__init__(api_key, model, api_url, cache_dir, prefetch=False)
+        self.prefetch_files = (wordpool_file, clue_wordlist_file) if prefetch else ()
+        self.client = get_async_client(self.api_key, self.model, self.api_url, cache_dir,
+                                       max_connections=max_connections, timeout_s=timeout_s,
+                                       max_retries=max_retries, backoff_s=backoff_s)
+
+    async def get_embeddings(self, words):
+        """Get embeddings for a list of words without blocking the event loop"""
+        return await self.client.get_embeddings(words)
+
+    async def get_answer(self):
+        """Return the top guessed word based on the clue and current game board"""
+        if not self.board or not self.clue:
+            raise ValueError("Board and clue must be set before getting an answer")
+
+        if self.prefetch_files:
+            await self.client.prefetch(*self.prefetch_files)
+
+        in_play = self._words_in_play()
+        embeddings = await self.get_embeddings([self.clue] + [self.board[i] for i in in_play])
+        return self._best_guess(in_play, embeddings)
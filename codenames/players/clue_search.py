@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# smallest number of clues worth giving to a worker of its own
+MIN_CLUES_PER_SHARD = 4096
+
+
+def _shard_bests(red_distances: np.ndarray, bad_distances: np.ndarray, allowed: Optional[np.ndarray],
+                 max_red_words: int, offset: int) -> List[Optional[tuple]]:
+    """(score, red word indices, clue index) of the best clue of one shard for every n, None when no clue is valid"""
+    n_red, n_clues = red_distances.shape
+    min_bad = bad_distances.min(axis=0) if len(bad_distances) else np.full(n_clues, np.inf)
+    # row n - 1 holds the distance of every clue to its n-th closest red word
+    nth_closest = np.sort(red_distances, axis=0)
+
+    bests = []
+    for n in range(1, max_red_words + 1):
+        if n > n_red:
+            bests.append(None)
+            continue
+        scores = np.maximum(nth_closest[n - 1], 0.0)
+        valid = scores < min_bad
+        if allowed is not None:
+            valid &= allowed
+        if not valid.any():
+            bests.append(None)
+            continue
+        best_score = scores[valid].min()
+        candidates = np.flatnonzero(valid & (scores == best_score))
+
+        def combination(clue_index):
+            # the first n red words, in board order, among the ones at most best_score away
+            close = np.flatnonzero(red_distances[:, clue_index] <= best_score)
+            return tuple(close[:n].tolist())
+
+        best_index = min(candidates, key=lambda i: (combination(i), i)) if len(candidates) > 1 else candidates[0]
+        bests.append((float(best_score), combination(best_index), int(best_index) + offset))
+    return bests
+
+
+_pools: Dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_clue_search_pool(workers: int) -> ThreadPoolExecutor:
+    """Return the process wide thread pool with this number of workers, shared by all the codemasters"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clue-search")
+    return pool
+
+
+def best_clues(red_words: Sequence[str], red_distances: np.ndarray, bad_distances: np.ndarray,
+               clues: Sequence[str], max_red_words: int, allowed: Optional[np.ndarray] = None,
+               workers: int = 1) -> Dict[int, Tuple[tuple, str, float]]:
+    """Best clue for every number n = 1..max_red_words of red words to link
+
+    A clue links n red words with the score max(0, largest distance to them) and
+    is only valid if that score is below its distance to every bad word. For a
+    given clue the best n red words are simply its n closest ones, so sorting the
+    red distances of every clue once gives the best clue of every n, instead of
+    enumerating every combination of red words for every clue.
+
+    Ties are broken like the enumeration of itertools.combinations(red_words, n)
+    over the clues in order did: by the first combination, then the first clue.
+
+    Args:
+        red_words: Red words on the board, in the order they are combined.
+        red_distances: (len(red_words), len(clues)) distances of the red words to the clues.
+        bad_distances: (number of bad words, len(clues)) distances of the other words to the clues.
+        clues: Candidate clues.
+        max_red_words: Largest number of red words a clue may link.
+        allowed (optional): Mask of the clues that may be given.
+        workers (optional): Threads scoring contiguous shards of the clues, NumPy releases the GIL
+            while sorting. Shards hold at least MIN_CLUES_PER_SHARD clues.
+
+    Returns:
+        {n: (red words linked, clue, score)}, ("", "", inf) when no clue is valid for n.
+    """
+    n_clues = len(clues)
+    red_distances = np.asarray(red_distances, dtype=np.float64).reshape(len(red_words), n_clues)
+    bad_distances = np.asarray(bad_distances, dtype=np.float64).reshape(-1, n_clues)
+
+    n_shards = max(1, min(workers, n_clues // MIN_CLUES_PER_SHARD))
+    if n_shards == 1:
+        shard_bests = [_shard_bests(red_distances, bad_distances, allowed, max_red_words, 0)]
+    else:
+        bounds = np.linspace(0, n_clues, n_shards + 1).astype(int)
+        pool = get_clue_search_pool(workers)
+        futures = [pool.submit(_shard_bests, red_distances[:, start:stop], bad_distances[:, start:stop],
+                               None if allowed is None else allowed[start:stop], max_red_words, start)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        shard_bests = [future.result() for future in futures]
+
+    bests = {}
+    for n in range(1, max_red_words + 1):
+        # the shards are in clue order, so comparing (score, combination, clue index) keeps the ties of one shard
+        found = [shard[n - 1] for shard in shard_bests if shard[n - 1] is not None]
+        if not found:
+            bests[n] = ("", "", np.inf)
+            continue
+        score, combination, clue_index = min(found)
+        bests[n] = (tuple(red_words[i] for i in combination), clues[clue_index], score)
+    return bests
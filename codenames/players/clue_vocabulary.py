@@ -0,0 +1,216 @@
+import sys
+import threading
+from types import MappingProxyType
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+
+
+def words_conflict(word: str, lemm: str, lancas: str, clue: str) -> bool:
+    """Whether clue is word, its lemma lemm or its stem lancas, or contains or is contained in one of them"""
+    return word == clue or lemm == clue or lancas == clue \
+        or clue.find(word) != -1 or word.find(clue) != -1 \
+        or clue.find(lemm) != -1 or lemm.find(clue) != -1 \
+        or clue.find(lancas) != -1 or lancas.find(clue) != -1
+
+
+class ClueVocabulary:
+    """Immutable clue wordlist shared by every codemaster of a process
+
+    Words are interned and numbered by their position in the wordlist. Tables
+    derived from the words (lemmas, stems, synsets, embedding matrices) are
+    computed on first use and then shared as well. Get the instance of a
+    wordlist with get_clue_vocabulary() instead of constructing one.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words: Tuple[str, ...] = tuple(sys.intern(word) for word in words)
+        self.ids = MappingProxyType({word: i for i, word in enumerate(self.words)})
+        self.word_set = frozenset(self.words)
+
+        self._lock = threading.Lock()
+        self._lemmas = None
+        self._stems = None
+        self._synsets = None
+        self._matrices: Dict[int, tuple] = {}
+        # board word -> table, see conflicting_words and not_in_word_mask
+        self._conflicts: Dict[str, frozenset] = {}
+        self._not_in_word_masks: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def from_file(path: str) -> "ClueVocabulary":
+        with open(path) as infile:
+            return ClueVocabulary(line.rstrip().lower() for line in infile if line.strip())
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_set
+
+    @property
+    def lemmas(self) -> Tuple[str, ...]:
+        """WordNet lemma of every word, by id"""
+        if self._lemmas is None:
+            from nltk.stem import WordNetLemmatizer
+            lemmatizer = WordNetLemmatizer()
+            self._lemmas = tuple(sys.intern(lemmatizer.lemmatize(word)) for word in self.words)
+        return self._lemmas
+
+    @property
+    def stems(self) -> Tuple[str, ...]:
+        """Lancaster stem of every word, by id"""
+        if self._stems is None:
+            from nltk.stem.lancaster import LancasterStemmer
+            stemmer = LancasterStemmer()
+            self._stems = tuple(sys.intern(stemmer.stem(word)) for word in self.words)
+        return self._stems
+
+    def conflicting_words(self, word: str) -> frozenset:
+        """Words equal to word, its lemma or its stem, or containing or contained in one of them
+
+        These are the clues a codemaster may not give while word is on the board,
+        cached per board word.
+        """
+        conflicts = self._conflicts.get(word)
+        if conflicts is None:
+            from nltk.stem import WordNetLemmatizer
+            from nltk.stem.lancaster import LancasterStemmer
+            lemm = WordNetLemmatizer().lemmatize(word)
+            lancas = LancasterStemmer().stem(word)
+            conflicts = self._conflicts[word] = frozenset(
+                clue for clue in self.words if words_conflict(word, lemm, lancas, clue))
+        return conflicts
+
+    def not_in_word_mask(self, word: str) -> np.ndarray:
+        """Mask of the words passing arr_not_in_word(clue, [word]) of the codemasters, by id
+
+        A clue passes it against the whole board if it is in the mask of every
+        board word, cached per board word.
+        """
+        mask = self._not_in_word_masks.get(word)
+        if mask is None:
+            mask = np.array([word != lemm and word != stem and word.find(clue) == -1 and clue.find(word) == -1
+                             for clue, lemm, stem in zip(self.words, self.lemmas, self.stems)], dtype=bool)
+            mask.setflags(write=False)
+            self._not_in_word_masks[word] = mask
+        return mask
+
+    def synsets(self) -> tuple:
+        """Every WordNet synset of every word, in wordlist order"""
+        if self._synsets is None:
+            from nltk.corpus import wordnet
+            with self._lock:
+                if self._synsets is None:
+                    self._synsets = tuple(synset for word in self.words for synset in wordnet.synsets(word))
+        return self._synsets
+
+    def embedding_matrix(self, vectors) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows of the vectors of every word, by id
+
+        Args:
+            vectors: Any keyed vectors accessed like vectors["<word>"], e.g. a GloVe
+                dict or gensim KeyedVectors. The result is cached per object.
+
+        Returns:
+            A (len(self), dim) float32 matrix and a boolean mask of the words that
+            have a vector, rows of missing words are zero.
+        """
+        key = id(vectors)
+        cached = self._matrices.get(key)
+        if cached is not None and cached[0] is vectors:
+            return cached[1], cached[2]
+
+        with self._lock:
+            rows = []
+            present = np.zeros(len(self.words), dtype=bool)
+            dim = None
+            for i, word in enumerate(self.words):
+                try:
+                    row = vectors[word]
+                except KeyError:
+                    rows.append(None)
+                    continue
+                present[i] = True
+                dim = len(row)
+                rows.append(row)
+            matrix = np.zeros((len(self.words), dim or 0), dtype=np.float32)
+            for i, row in enumerate(rows):
+                if row is not None:
+                    matrix[i] = row
+            matrix.setflags(write=False)
+            present.setflags(write=False)
+            # keep a reference to vectors so that its id cannot be reused by another object
+            self._matrices[key] = (vectors, matrix, present)
+        return matrix, present
+
+
+class GameVocabulary:
+    """Ids of the words a game can mention: the clue words, then the other words of the wordpool
+
+    Clue words keep their ClueVocabulary ids, and get_combined_embeddings
+    builds one row per word in this order, so the ids of the words on a board
+    and of the clues index embedding and distance matrices directly. Words are
+    lowercase, words outside of both lists (e.g. clues typed by a human) have
+    no id. Get the instance of a wordpool with get_game_vocabulary().
+    """
+
+    def __init__(self, clue_vocabulary: ClueVocabulary, wordpool: Iterable[str]):
+        self.clue_vocabulary = clue_vocabulary
+        wordpool = dict.fromkeys(sys.intern(word.lower()) for word in wordpool)
+        self.words: Tuple[str, ...] = clue_vocabulary.words + tuple(
+            word for word in wordpool if word not in clue_vocabulary)
+        self.ids = MappingProxyType({word: i for i, word in enumerate(self.words)})
+        # the clue words are the ids below it
+        self.clue_count = len(clue_vocabulary)
+        # the words by id, to look the words of an array of ids up at once
+        self.word_array = np.array(self.words, dtype=object)
+        self.word_array.setflags(write=False)
+
+    def __len__(self):
+        return len(self.words)
+
+    def id_of(self, word: str) -> int:
+        """Id of a word in any case (the players are given upper case board words), -1 if it has none"""
+        return self.ids.get(word.strip().lower(), -1)
+
+    def ids_of(self, words: Sequence[str]) -> np.ndarray:
+        """id_of every word"""
+        return np.fromiter(map(self.id_of, words), dtype=np.intp, count=len(words))
+
+
+_vocabularies: Dict[str, ClueVocabulary] = {}
+_vocabularies_lock = threading.Lock()
+
+
+def get_clue_vocabulary(path: str = "players/cm_wordlist.txt") -> ClueVocabulary:
+    """Return the process wide vocabulary of a clue wordlist, loading it once"""
+    vocabulary = _vocabularies.get(path)
+    if vocabulary is None:
+        with _vocabularies_lock:
+            vocabulary = _vocabularies.get(path)
+            if vocabulary is None:
+                vocabulary = _vocabularies[path] = ClueVocabulary.from_file(path)
+    return vocabulary
+
+
+_game_vocabularies: Dict[tuple, GameVocabulary] = {}
+
+
+def get_game_vocabulary(wordpool_file: str = "game_wordpool.txt",
+                        clue_wordlist_file: str = "players/cm_wordlist.txt") -> GameVocabulary:
+    """Return the process wide vocabulary of a wordpool and clue wordlist, loading it once"""
+    key = (wordpool_file, clue_wordlist_file)
+    vocabulary = _game_vocabularies.get(key)
+    if vocabulary is None:
+        clue_vocabulary = get_clue_vocabulary(clue_wordlist_file)
+        with _vocabularies_lock:
+            vocabulary = _game_vocabularies.get(key)
+            if vocabulary is None:
+                with open(wordpool_file) as infile:
+                    wordpool = [line.strip() for line in infile if line.strip()]
+                vocabulary = _game_vocabularies[key] = GameVocabulary(clue_vocabulary, wordpool)
+    return vocabulary
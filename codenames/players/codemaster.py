@@ -1,8 +1,13 @@
+import time
 from abc import ABC, abstractmethod
 
 class Codemaster(ABC):
     """codemaster abstract class that mimics the spymaster in the codenames game"""
 
+    # True if get_clue only depends on the unrevealed words, their keys and the
+    # constructor kwargs, so that its clues can be memoized (see clue_memo.py)
+    deterministic_clues = False
+
     def __init__(self):
         """Set up word list and handle pretrained vectors"""
         pass
@@ -17,6 +22,48 @@ class Codemaster(ABC):
         """Function that returns a clue word and number of estimated related words on the board"""
         pass
 
+    def reset(self):
+        """Prepare for a new game, called before an instance is reused
+
+        Players that keep state between turns must clear it here. The
+        resources passed to __init__ are kept.
+        """
+        pass
+
+    def speculate(self, words_on_board, key_grid, cancelled):
+        """Prepare the next turn for a likely board while the guesser is thinking
+
+        Called on a background thread with boards that may come next. Must not
+        change what the next set_game_state and get_clue return, only compute
+        what they can reuse if the board comes. Stop early once the
+        threading.Event cancelled is set.
+        """
+        pass
+
+
+class AnytimeCodemaster(Codemaster):
+    """Codemaster whose clue search can be stopped at a deadline
+
+    The engine calls get_clue(deadline=...) with a time.monotonic() time when a
+    per-turn deadline is set. The search walks its candidates in a promising-first
+    order, keeps the best clue found so far and returns it once the deadline has
+    passed, setting deadline_hit. Without a deadline the search runs to the end.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.deadline_hit = False
+
+    @abstractmethod
+    def get_clue(self, deadline=None):
+        """Return the best clue and number found before the deadline, None for no deadline"""
+        pass
+
+    @staticmethod
+    def deadline_passed(deadline):
+        """Whether the time.monotonic() deadline has passed, never for None"""
+        return deadline is not None and time.monotonic() >= deadline
+
 
 class HumanCodemaster(Codemaster):
 
@@ -1,35 +1,70 @@
-import scipy.spatial.distance
 from nltk.stem import WordNetLemmatizer
 from nltk.stem.lancaster import LancasterStemmer
 import numpy as np
-import itertools
 
+from players.clue_search import best_clues
+from players.clue_vocabulary import get_clue_vocabulary, get_game_vocabulary
+from players.combined_embeddings import get_combined_embeddings
+from players.distance_cache import get_distance_matrix
 from players.codemaster import Codemaster
 
 
 class AICodemaster(Codemaster):
 
+    deterministic_clues = True
+
     def __init__(self, brown_ic=None, glove_vecs=None, word_vectors=None):
         super().__init__()
         self.brown_ic = brown_ic
         self.glove_vecs = glove_vecs
         self.word_vectors = word_vectors
+        self.embeddings = get_combined_embeddings((self.word_vectors,))
+        self.distance_matrix = get_distance_matrix(self.embeddings)
         self.wordnet_lemmatizer = WordNetLemmatizer()
         self.lancaster_stemmer = LancasterStemmer()
-        self.cm_wordlist = []
-        with open('players/cm_wordlist.txt') as infile:
-            for line in infile:
-                self.cm_wordlist.append(line.rstrip())
+        # shared by every codemaster of the process, never modified
+        self.vocabulary = get_clue_vocabulary()
+        self.cm_wordlist = self.vocabulary.words
+        # the clue words are the first ids of the game vocabulary, which number the rows of self.embeddings
+        self.game_vocabulary = get_game_vocabulary()
+        self.clue_ids = np.arange(len(self.cm_wordlist))
 
         self.bad_word_dists = None
         self.red_word_dists = None
+        # board -> clue chosen ahead by speculate
+        self.speculated_clues = {}
 
     def set_game_state(self, words, maps):
         self.words = words
         self.maps = maps
 
+    def reset(self):
+        """Forget the distances cached for the previous game"""
+        self.bad_word_dists = None
+        self.red_word_dists = None
+        self.speculated_clues = {}
+
+    def speculate(self, words, maps, cancelled):
+        """Choose the clue of a likely next board ahead, get_clue returns it if the board comes"""
+        board = (tuple(words), tuple(maps))
+        if cancelled.is_set() or board in self.speculated_clues:
+            return
+        red_words = [word.lower() for word, card in zip(words, maps) if word[0] != '*' and card == "Red"]
+        bad_words = [word.lower() for word, card in zip(words, maps) if word[0] != '*' and card != "Red"]
+        red_word_dists = {word: self._clue_dists(word) for word in red_words}
+        bad_word_dists = {word: self._clue_dists(word) for word in bad_words}
+        self.speculated_clues[board] = self._choose_clue(red_words, bad_words, red_word_dists, bad_word_dists,
+                                                         verbose=False)
+
+    def _clue_dists(self, word):
+        """Distances of a board word to every clue word, by clue id"""
+        word_id = self.game_vocabulary.ids.get(word)
+        if word_id is None:
+            # a word of another wordpool
+            return self.distance_matrix.distances(word, self.cm_wordlist)
+        return self.distance_matrix.distances_of_ids(word_id, self.clue_ids)
+
     def get_clue(self):
-        cos_dist = scipy.spatial.distance.cosine
         red_words = []
         bad_words = []
 
@@ -43,23 +78,18 @@ class AICodemaster(Codemaster):
                 red_words.append(self.words[i].lower())
         print("RED:\t", red_words)
 
-        all_vectors = (self.word_vectors,)
-        bests = {}
+        clue = self.speculated_clues.get((tuple(self.words), tuple(self.maps)))
+        if clue is not None:
+            return clue
 
         if not self.bad_word_dists:
             self.bad_word_dists = {}
             for word in bad_words:
-                self.bad_word_dists[word] = {}
-                for val in self.cm_wordlist:
-                    b_dist = cos_dist(self.concatenate(val, all_vectors), self.concatenate(word, all_vectors))
-                    self.bad_word_dists[word][val] = b_dist
+                self.bad_word_dists[word] = self._clue_dists(word)
 
             self.red_word_dists = {}
             for word in red_words:
-                self.red_word_dists[word] = {}
-                for val in self.cm_wordlist:
-                    b_dist = cos_dist(self.concatenate(val, all_vectors), self.concatenate(word, all_vectors))
-                    self.red_word_dists[word][val] = b_dist
+                self.red_word_dists[word] = self._clue_dists(word)
 
         else:
             to_remove = set(self.bad_word_dists) - set(bad_words)
@@ -69,41 +99,18 @@ class AICodemaster(Codemaster):
             for word in to_remove:
                 del self.red_word_dists[word]
 
-        for clue_num in range(1, 3 + 1):
-            best_per_dist = np.inf
-            best_per = ''
-            best_red_word = ''
-            for red_word in list(itertools.combinations(red_words, clue_num)):
-                best_word = ''
-                best_dist = np.inf
-                for word in self.cm_wordlist:
-                    if not self.arr_not_in_word(word, red_words + bad_words):
-                        continue
-
-                    bad_dist = np.inf
-                    worst_bad = ''
-                    for bad_word in self.bad_word_dists:
-                        if self.bad_word_dists[bad_word][word] < bad_dist:
-                            bad_dist = self.bad_word_dists[bad_word][word]
-                            worst_bad = bad_word
-                    worst_red = 0
-                    for red in red_word:
-                        dist = self.red_word_dists[red][word]
-                        if dist > worst_red:
-                            worst_red = dist
-
-                    if worst_red < best_dist and worst_red < bad_dist:
-                        best_dist = worst_red
-                        best_word = word
-                        # print(worst_red,red_word,word)
-
-                        if best_dist < best_per_dist:
-                            best_per_dist = best_dist
-                            best_per = best_word
-                            best_red_word = red_word
-            bests[clue_num] = (best_red_word, best_per, best_per_dist)
-
-        print("BESTS: ", bests)
+        return self._choose_clue(red_words, bad_words, self.red_word_dists, self.bad_word_dists)
+
+    def _choose_clue(self, red_words, bad_words, red_word_dists, bad_word_dists, verbose=True):
+        """The clue and number for the red words, given the distances of the board words to every clue"""
+        # the clues that are not too close to a word on the board, the same for every combination
+        allowed = np.logical_and.reduce([self.vocabulary.not_in_word_mask(word) for word in red_words + bad_words])
+        red_distances = [red_word_dists[red] for red in red_words]
+        bad_distances = [bad_word_dists[bad_word] for bad_word in bad_word_dists]
+        bests = best_clues(red_words, red_distances, bad_distances, self.cm_wordlist, 3, allowed)
+
+        if verbose:
+            print("BESTS: ", bests)
         li = []
         pi = []
         chosen_clue = bests[1]
@@ -114,14 +121,15 @@ class AICodemaster(Codemaster):
             best = np.inf
             worst_word = ''
             for word in best_red_word:
-                dist = cos_dist(self.concatenate(word, all_vectors), self.concatenate(combined_clue, all_vectors))
+                dist = self.embeddings.distance(word, combined_clue)
                 if dist > worst:
                     worst_word = word
                     worst = dist
                 if dist < best:
                     best = dist
             if worst < 0.5 and worst != -np.inf:
-                print(worst, chosen_clue, chosen_num)
+                if verbose:
+                    print(worst, chosen_clue, chosen_num)
                 chosen_clue = clue
                 chosen_num = clue_num
 
@@ -133,7 +141,8 @@ class AICodemaster(Codemaster):
             chosen_num = 1
         # print("LI: ", li)
         # print("The clue is: ", li[0][3])
-        print('chosen_clue is:', chosen_clue)
+        if verbose:
+            print('chosen_clue is:', chosen_clue)
         # return in array styled: ["clue", number]
         return chosen_clue[1], chosen_num  # [li[0][3], 1]
 
@@ -1,13 +1,14 @@
-from operator import itemgetter
-
 from nltk.corpus import wordnet
 from nltk.stem import WordNetLemmatizer
 from nltk.stem.lancaster import LancasterStemmer
 
-from players.codemaster import Codemaster
+from players.clue_vocabulary import get_clue_vocabulary
+from players.codemaster import AnytimeCodemaster
+
 
+class AICodemaster(AnytimeCodemaster):
 
-class AICodemaster(Codemaster):
+    deterministic_clues = True
 
     def __init__(self, brown_ic=None, glove_vecs=None, word_vectors=None):
         super().__init__()
@@ -16,51 +17,109 @@ class AICodemaster(Codemaster):
         self.word_vectors = word_vectors
         self.wordnet_lemmatizer = WordNetLemmatizer()
         self.lancaster_stemmer = LancasterStemmer()
-        self.cm_wordlist = []
-        with open('players/cm_wordlist.txt') as infile:
-            for line in infile:
-                self.cm_wordlist.append(line.rstrip())
-        self.syns = []
-        for word in self.cm_wordlist:
-            for synset_in_cmwordlist in wordnet.synsets(word):
-                self.syns.append(synset_in_cmwordlist)
+        # shared by every codemaster of the process, never modified
+        self.cm_wordlist = get_clue_vocabulary().words
+        self.syns = get_clue_vocabulary().synsets()
+        # clue synsets by (part of speech, lexicographer file), in wordlist order
+        self.syns_by_lexname = {}
+        for i, synset in enumerate(self.syns):
+            self.syns_by_lexname.setdefault((synset.pos(), synset.lexname()), []).append(i)
+        self._other_syns = {}
+        # board -> clue searched ahead by speculate
+        self.speculated_clues = {}
 
     def set_game_state(self, words, maps):
         self.words = words
         self.maps = maps
 
-    def get_clue(self):
-        lin_results = []
-        count = 0
+    def reset(self):
+        """Forget the clues searched ahead for the previous game"""
+        self.speculated_clues = {}
+
+    def _search_order(self, red_words):
+        """(red word index, red synset index, red synset, clue synset indices) to try, promising first
+
+        Lin similarity is only defined between synsets of the same part of speech, so
+        only those clues are tried. Clues from the same lexicographer file as a red
+        synset (noun.animal, verb.motion, ...) come first, then the other clues, and
+        the first (most frequent) senses of the red words before the later ones.
+        """
+        units = []
+        for red_index, red_word in enumerate(red_words):
+            for red_synset_index, red_synset in enumerate(wordnet.synsets(red_word)):
+                key = (red_synset.pos(), red_synset.lexname())
+                if key not in self._other_syns:
+                    self._other_syns[key] = [i for other_key, syns in self.syns_by_lexname.items()
+                                             if other_key[0] == key[0] and other_key != key for i in syns]
+                units.append((0, red_synset_index, red_index, red_synset, self.syns_by_lexname.get(key, [])))
+                units.append((1, red_synset_index, red_index, red_synset, self._other_syns[key]))
+        units.sort(key=lambda unit: unit[:3])
+        return [(red_index, red_synset_index, red_synset, syns)
+                for _, red_synset_index, red_index, red_synset, syns in units]
+
+    def _search(self, words, maps, stop):
+        """Best [clue, 1] of a board and whether the search finished before stop() returned True"""
         red_words = []
         bad_words = []
         for i in range(25):
-            if self.words[i][0] == '*':
+            if words[i][0] == '*':
                 continue
-            elif self.maps[i] == "Assassin" or self.maps[i] == "Blue" or self.maps[i] == "Civilian":
-                bad_words.append(self.words[i].lower())
+            elif maps[i] == "Assassin" or maps[i] == "Blue" or maps[i] == "Civilian":
+                bad_words.append(words[i].lower())
             else:
-                red_words.append(self.words[i].lower())
-        print("RED:\t", red_words)
+                red_words.append(words[i].lower())
+
+        # (lin score, red word index, clue synset index, red synset index) of the best clue so far, ties
+        # go to the last pair of the red word, clue synset, red synset loops like the exhaustive search
+        best = None
+        allowed = {}
+        stopped = False
+        for red_index, red_synset_index, red_synset, syns in self._search_order(red_words):
+            for synset_index in syns:
+                if stop():
+                    stopped = True
+                    break
+                try:
+                    lin_score = self.syns[synset_index].lin_similarity(red_synset, self.brown_ic)
+                except Exception:
+                    continue
+                if not lin_score:
+                    continue
+                candidate = (lin_score, red_index, synset_index, red_synset_index)
+                if best is not None and candidate <= best:
+                    continue
+                if synset_index not in allowed:
+                    allowed[synset_index] = self.arr_not_in_word(self.syns[synset_index].lemma_names()[0],
+                                                                 red_words + bad_words)
+                if allowed[synset_index]:
+                    best = candidate
+            if stopped:
+                break
+
+        if best is None:
+            # nothing scored before the deadline, any clue that is not on the board
+            return [next(word for word in self.cm_wordlist if self.arr_not_in_word(word, red_words + bad_words)), 1], \
+                not stopped
+        return [self.syns[best[2]].lemma_names()[0], 1], not stopped
 
-        for red_word in red_words:
-            for synset_in_cmwordlist in self.syns:
-                lin_clue = 0
-                for red_synset in wordnet.synsets(red_word):
-                    try:
-                        # only if the two compared words have the same part of speech
-                        lin_score = synset_in_cmwordlist.lin_similarity(red_synset, self.brown_ic)
-                    except :
-                        continue
-                    if lin_score:
-                        if not self.arr_not_in_word(synset_in_cmwordlist.lemma_names()[0], red_words + bad_words):
-                            continue
-                        lin_results.append((lin_score, synset_in_cmwordlist))
-                        if lin_score > lin_clue:
-                            lin_clue = lin_score
+    def speculate(self, words, maps, cancelled):
+        """Search the clue of a likely next board ahead, get_clue returns it if the board comes"""
+        key = (tuple(words), tuple(maps))
+        if key in self.speculated_clues:
+            return
+        clue, finished = self._search(words, maps, cancelled.is_set)
+        if finished:
+            self.speculated_clues[key] = clue
 
-        lin_results = list(reversed(sorted(lin_results, key=itemgetter(0))))
-        return [lin_results[0][1].lemma_names()[0], 1]
+    def get_clue(self, deadline=None):
+        print("RED:\t", [word.lower() for word, key in zip(self.words, self.maps) if word[0] != '*' and key == "Red"])
+        self.deadline_hit = False
+        clue = self.speculated_clues.get((tuple(self.words), tuple(self.maps)))
+        if clue is not None:
+            return list(clue)
+        clue, finished = self._search(self.words, self.maps, lambda: self.deadline_passed(deadline))
+        self.deadline_hit = not finished
+        return clue
 
     def arr_not_in_word(self, word, arr):
         if word in arr:
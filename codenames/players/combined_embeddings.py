@@ -0,0 +1,184 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from players.clue_vocabulary import get_game_vocabulary
+
+
+def _keys(vectors) -> Iterable[str]:
+    """Words of a GloVe dict or gensim KeyedVectors"""
+    index_to_key = getattr(vectors, "index_to_key", None)
+    return index_to_key if index_to_key is not None else vectors.keys()
+
+
+class CombinedEmbeddings:
+    """Several keyed vectors concatenated into one contiguous, normalized float32 matrix
+
+    The row of a word is the concatenation of its vector in every source, each
+    multiplied by the weight of its source, scaled to unit length. The cosine
+    distance of two words is then 1 - the dot product of their rows, which
+    equals the cosine distance of their np.hstack-ed vectors when all weights
+    are 1.
+
+    Rows are built once for `words` (by default the words present in every
+    source), words are numbered by their position in it. A word outside of
+    `words` that every source knows gets a row appended on first use.
+    """
+
+    def __init__(self, sources: Sequence, weights: Optional[Sequence[float]] = None,
+                 words: Optional[Iterable[str]] = None):
+        """
+        Args:
+            sources: Keyed vectors accessed like vectors["<word>"], e.g. a GloVe dict or gensim KeyedVectors.
+            weights (optional): Factor of each source, all 1.0 by default.
+            words (optional): Words to build rows for up front, defaults to the intersection of the sources.
+        """
+        assert len(sources) > 0, "at least one source of vectors is needed"
+        self.sources = tuple(sources)
+        self.weights = tuple(float(w) for w in weights) if weights is not None else (1.0,) * len(self.sources)
+        assert len(self.weights) == len(self.sources), "one weight per source is needed"
+
+        if words is None:
+            words = set(_keys(self.sources[0]))
+            for source in self.sources[1:]:
+                words.intersection_update(_keys(source))
+            words = sorted(words)
+        words = list(words)
+
+        self.words: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._buffer = None
+        self._present = None
+        self._size = 0
+        self.dim = None
+
+        rows = [self._combine(word) for word in words]
+        self.dim = next((len(row) for row in rows if row is not None), 0)
+        self._reserve(len(words))
+        for word, row in zip(words, rows):
+            self._append(word, row)
+
+    def _combine(self, word: str) -> Optional[np.ndarray]:
+        """Weighted, normalized concatenation of the vectors of word, None if a source does not know it"""
+        try:
+            parts = [np.asarray(source[word], dtype=np.float32) * weight
+                     for source, weight in zip(self.sources, self.weights)]
+        except KeyError:
+            return None
+        row = np.concatenate(parts)
+        norm = np.linalg.norm(row)
+        return row / norm if norm > 0 else row
+
+    def _reserve(self, capacity: int) -> None:
+        if self._buffer is not None and len(self._buffer) >= capacity:
+            return
+        buffer = np.zeros((max(capacity, 16), self.dim), dtype=np.float32)
+        present = np.zeros(len(buffer), dtype=bool)
+        if self._buffer is not None:
+            buffer[:self._size] = self._buffer[:self._size]
+            present[:self._size] = self._present[:self._size]
+        self._buffer, self._present = buffer, present
+
+    def _append(self, word: str, row: Optional[np.ndarray]) -> int:
+        if self._size == len(self._buffer):
+            self._reserve(2 * self._size)
+        word_id = self._size
+        if row is not None:
+            self._buffer[word_id] = row
+            self._present[word_id] = True
+        self.words.append(word)
+        self.ids[word] = word_id
+        self._size += 1
+        return word_id
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """(len(self), dim) matrix of the rows of every word, zero for the words some source does not know"""
+        return self._buffer[:self._size]
+
+    @property
+    def present(self) -> np.ndarray:
+        """Mask of the words known by every source"""
+        return self._present[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, word: str) -> bool:
+        word_id = self.ids.get(word)
+        return word_id is not None and self._present[word_id]
+
+    def index(self, word: str) -> int:
+        """Row of word, appending it if it is new, raises KeyError if a source does not know it"""
+        word_id = self.ids.get(word)
+        if word_id is None:
+            row = self._combine(word)
+            with self._lock:
+                word_id = self.ids.get(word)
+                if word_id is None:
+                    word_id = self._append(word, row)
+        if not self._present[word_id]:
+            raise KeyError(word)
+        return word_id
+
+    def vector(self, word: str) -> np.ndarray:
+        """Normalized combined vector of word, a view into the matrix"""
+        word_id = self.index(word)
+        # the buffer is replaced when index() appends a row beyond its capacity
+        return self._buffer[word_id]
+
+    def distance(self, word1: str, word2: str) -> float:
+        """Cosine distance of two words, raises KeyError if a source does not know one of them"""
+        return 1.0 - float(np.dot(self.vector(word1), self.vector(word2)))
+
+    def distances(self, word: str, others: Sequence[str]) -> np.ndarray:
+        """Cosine distances of word to each of others, inf for the words a source does not know"""
+        ids = np.empty(len(others), dtype=np.intp)
+        for i, other in enumerate(others):
+            try:
+                ids[i] = self.index(other)
+            except KeyError:
+                ids[i] = -1
+        try:
+            vector = self.vector(word)
+        except KeyError:
+            return np.full(len(others), np.inf)
+        # one product over every row is cheaper than gathering the rows of others first
+        distances = 1.0 - (self.matrix @ vector).astype(np.float64)
+        result = np.full(len(others), np.inf)
+        known = ids >= 0
+        result[known] = distances[ids[known]]
+        return result
+
+    def distances_of_ids(self, word_id: int, ids: np.ndarray) -> np.ndarray:
+        """distances() of words given by their rows, inf for the words a source does not know"""
+        if not self._present[word_id]:
+            return np.full(len(ids), np.inf)
+        distances = 1.0 - (self.matrix @ self._buffer[word_id]).astype(np.float64)
+        result = distances[ids]
+        result[~self.present[ids]] = np.inf
+        return result
+
+
+_combined: Dict[tuple, CombinedEmbeddings] = {}
+_combined_lock = threading.Lock()
+
+
+def get_combined_embeddings(sources: Sequence, weights: Optional[Sequence[float]] = None) -> CombinedEmbeddings:
+    """Return the process wide combined embeddings of sources, built once
+
+    Rows are built up front for the GameVocabulary, in its order, so the rows of
+    the clue and wordpool words are their ids. Other words get rows on first use.
+    """
+    weights = tuple(weights) if weights is not None else None
+    key = (tuple(id(source) for source in sources), weights)
+    # the instance keeps references to the sources, so their ids are not reused while it is cached
+    cached = _combined.get(key)
+    if cached is None:
+        with _combined_lock:
+            cached = _combined.get(key)
+            if cached is None:
+                cached = _combined[key] = CombinedEmbeddings(sources, weights, get_game_vocabulary().words)
+    return cached
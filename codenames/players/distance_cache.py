@@ -0,0 +1,164 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from players.clue_vocabulary import get_clue_vocabulary
+from players.combined_embeddings import CombinedEmbeddings
+
+DISTANCE_CACHE_DIR = "players/distance_cache"
+
+
+def _wordpool_words(wordpool_file: str) -> List[str]:
+    with open(wordpool_file) as f:
+        return sorted({line.strip().lower() for line in f if line.strip()})
+
+
+class DistanceMatrix:
+    """Cosine distances between every wordpool word and every clue word of one CombinedEmbeddings
+
+    Boards are drawn from the wordpool and clues from the clue wordlist, so the
+    distances the players compute during a game are slices of this matrix.
+    Pairs outside of it (other wordpools, clues typed by humans, board words as
+    clues) are computed by the embeddings.
+    """
+
+    def __init__(self, embeddings: CombinedEmbeddings, board_words: Sequence[str], clue_words: Sequence[str],
+                 similarities: np.ndarray):
+        self.embeddings = embeddings
+        self.rows: Dict[str, int] = {word: i for i, word in enumerate(board_words)}
+        self.columns: Dict[str, int] = {word: i for i, word in enumerate(clue_words)}
+        # the same by embeddings row, -1 for the rows outside of the matrix
+        self.row_of_id = self._by_row(self.rows)
+        self.column_of_id = self._by_row(self.columns)
+        # dot products of the normalized rows, nan for the words missing from a source
+        self.similarities = similarities
+
+    def _by_row(self, positions: Dict[str, int]) -> np.ndarray:
+        by_row = np.full(len(self.embeddings), -1, dtype=np.intp)
+        for word, position in positions.items():
+            row = self.embeddings.ids.get(word)
+            if row is not None:
+                by_row[row] = position
+        by_row.setflags(write=False)
+        return by_row
+
+    @staticmethod
+    def compute(embeddings: CombinedEmbeddings, board_words: Sequence[str], clue_words: Sequence[str]) -> np.ndarray:
+        column_rows = np.array([embeddings.ids[word] for word in clue_words], dtype=np.intp)
+        columns = embeddings.matrix[column_rows]
+        missing_columns = ~embeddings.present[column_rows]
+        similarities = np.full((len(board_words), len(clue_words)), np.nan, dtype=np.float32)
+        for i, word in enumerate(board_words):
+            try:
+                vector = embeddings.vector(word)
+            except KeyError:
+                continue
+            # one product per row, like CombinedEmbeddings.distances, so both give the same distances
+            similarities[i] = columns @ vector
+            similarities[i, missing_columns] = np.nan
+        return similarities
+
+    def distances(self, word: str, others: Sequence[str]) -> np.ndarray:
+        """Cosine distances of word to each of others, inf for the words a source does not know"""
+        row = self.rows.get(word)
+        if row is not None:
+            ids = np.fromiter((self.columns.get(other, -1) for other in others), dtype=np.intp, count=len(others))
+            similarities = self.similarities[row]
+        else:
+            column = self.columns.get(word)
+            if column is None:
+                return self.embeddings.distances(word, others)
+            ids = np.fromiter((self.rows.get(other, -1) for other in others), dtype=np.intp, count=len(others))
+            similarities = self.similarities[:, column]
+
+        result = np.empty(len(others))
+        known = ids >= 0
+        result[known] = 1.0 - similarities[ids[known]].astype(np.float64)
+        result[np.isnan(result)] = np.inf
+        if not known.all():
+            unknown = np.flatnonzero(~known)
+            result[unknown] = self.embeddings.distances(word, [others[i] for i in unknown])
+        return result
+
+    def distances_of_ids(self, word_id: int, ids: np.ndarray) -> np.ndarray:
+        """distances() of words given by their embeddings rows, i.e. their GameVocabulary ids
+
+        The rows must be ones the embeddings had when the matrix was built,
+        which the rows of the game vocabulary are.
+        """
+        row = self.row_of_id[word_id]
+        if row >= 0:
+            positions = self.column_of_id[ids]
+            similarities = self.similarities[row]
+        else:
+            column = self.column_of_id[word_id]
+            if column < 0:
+                return self.embeddings.distances_of_ids(word_id, ids)
+            positions = self.row_of_id[ids]
+            similarities = self.similarities[:, column]
+
+        result = np.empty(len(ids))
+        known = positions >= 0
+        result[known] = 1.0 - similarities[positions[known]].astype(np.float64)
+        result[np.isnan(result)] = np.inf
+        if not known.all():
+            result[~known] = self.embeddings.distances_of_ids(word_id, ids[~known])
+        return result
+
+
+def _cache_key(embeddings: CombinedEmbeddings, board_words: List[str], clue_words: Sequence[str]) -> str:
+    """Hash of the rows the matrix is computed from, i.e. of the vectors, their weights and stacking order"""
+    digest = hashlib.sha1()
+    for words in (board_words, clue_words):
+        digest.update("\n".join(words).encode("utf-8"))
+        ids = []
+        for word in words:
+            try:
+                ids.append(embeddings.index(word))
+            except KeyError:
+                ids.append(-1)
+        ids = np.array(ids, dtype=np.intp)
+        digest.update(ids.tobytes())
+        digest.update(np.ascontiguousarray(embeddings.matrix[ids[ids >= 0]]).tobytes())
+    return digest.hexdigest()[:24]
+
+
+_matrices: Dict[tuple, DistanceMatrix] = {}
+_matrices_lock = threading.Lock()
+
+
+def get_distance_matrix(embeddings: CombinedEmbeddings, wordpool_file: str = "game_wordpool.txt",
+                        cache_dir: str = DISTANCE_CACHE_DIR) -> DistanceMatrix:
+    """Return the process wide distance matrix of embeddings, loading it from disk or computing it once
+
+    Matrices are saved as <cache_dir>/<hash>.npy, where the hash covers the
+    wordpool, the clue wordlist and the combined rows of their words.
+    """
+    key = (id(embeddings), wordpool_file, os.path.abspath(cache_dir))
+    matrix = _matrices.get(key)
+    if matrix is not None and matrix.embeddings is embeddings:
+        return matrix
+
+    with _matrices_lock:
+        matrix = _matrices.get(key)
+        if matrix is not None and matrix.embeddings is embeddings:
+            return matrix
+
+        board_words = _wordpool_words(wordpool_file)
+        clue_words = get_clue_vocabulary().words
+        path = os.path.join(cache_dir, f"{_cache_key(embeddings, board_words, clue_words)}.npy")
+        try:
+            similarities = np.load(path)
+            assert similarities.shape == (len(board_words), len(clue_words))
+        except (OSError, ValueError, AssertionError):
+            similarities = DistanceMatrix.compute(embeddings, board_words, clue_words)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, similarities)
+            os.replace(tmp_path, path)
+        similarities.setflags(write=False)
+        matrix = _matrices[key] = DistanceMatrix(embeddings, board_words, clue_words, similarities)
+    return matrix
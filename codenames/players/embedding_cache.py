@@ -0,0 +1,139 @@
+import atexit
+import json
+import os
+import threading
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """Persistent word embedding store for a single embedding model
+
+    Embeddings are kept on disk as a float32 matrix (<model>.npy) plus a word
+    index (<model>.json) whose i-th entry names the i-th row of the matrix.
+    New embeddings are written back every `autosave_every` additions and when
+    the process exits. save() may run in another thread while the cache is
+    used, e.g. in an executor of an event loop.
+    """
+
+    def __init__(self, model: str, cache_dir: str = "players/embedding_cache", autosave_every: int = 256):
+        self.model = model
+        self.cache_dir = cache_dir
+        self.autosave_every = autosave_every
+        self.matrix_path = os.path.join(cache_dir, f"{model}.npy")
+        self.index_path = os.path.join(cache_dir, f"{model}.json")
+
+        self.index: Dict[str, int] = {}
+        self.matrix = None
+        self._pending_words: List[str] = []
+        self._pending_rows: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._load()
+        atexit.register(self.save)
+
+    def _load(self):
+        """Read the cache files if they exist"""
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.index_path)):
+            return
+        with open(self.index_path, "r") as f:
+            words = json.load(f)
+        matrix = np.load(self.matrix_path)
+        if len(words) != len(matrix):
+            print(f"Embedding cache {self.index_path} is inconsistent, ignoring it")
+            return
+        self.matrix = matrix.astype(np.float32, copy=False)
+        self.index = {word: i for i, word in enumerate(words)}
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def missing(self, words: Iterable[str]) -> List[str]:
+        """Return the unique words (in order of appearance) that are not cached"""
+        seen = set()
+        missing = []
+        for word in words:
+            if word not in self.index and word not in seen:
+                seen.add(word)
+                missing.append(word)
+        return missing
+
+    def add(self, words: List[str], embeddings, autosave: bool = True) -> None:
+        """Add new embeddings to the cache (kept in memory until save() is called)
+
+        With autosave False the caller saves when save_due() says so.
+        """
+        with self._lock:
+            for word, embedding in zip(words, embeddings):
+                if word in self.index:
+                    continue
+                self.index[word] = len(self.index)
+                self._pending_words.append(word)
+                self._pending_rows.append(np.asarray(embedding, dtype=np.float32))
+        if autosave and self.save_due():
+            self.save()
+
+    def save_due(self) -> bool:
+        """Whether enough embeddings were added since the last save to write them"""
+        return len(self._pending_words) >= self.autosave_every
+
+    def get_many(self, words: List[str]) -> np.ndarray:
+        """Return a (len(words), dim) float32 matrix, raises KeyError for uncached words"""
+        with self._lock:
+            self._consolidate()
+            return self.matrix[[self.index[word] for word in words]]
+
+    def _consolidate(self):
+        """Fold pending rows into the contiguous matrix"""
+        if not self._pending_rows:
+            return
+        pending = np.vstack(self._pending_rows)
+        self.matrix = pending if self.matrix is None else np.vstack((self.matrix, pending))
+        self._pending_rows = []
+
+    def save(self) -> None:
+        """Write the cache to disk if anything was added since the last save
+
+        Files are written to temporary paths and then renamed, so readers never
+        see a half written cache.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._pending_words:
+                    return
+                self._consolidate()
+                # rows are only ever appended by building a new matrix, so this one stays as it is
+                matrix = self.matrix
+                words = [None] * len(self.index)
+                for word, i in self.index.items():
+                    words[i] = word
+                saved = len(self._pending_words)
+            self._write(matrix, words)
+            with self._lock:
+                del self._pending_words[:saved]
+
+    def _write(self, matrix: np.ndarray, words: List[str]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_matrix_path = f"{self.matrix_path}.{os.getpid()}.tmp"
+        tmp_index_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_matrix_path, "wb") as f:
+            np.save(f, matrix)
+        with open(tmp_index_path, "w") as f:
+            json.dump(words, f)
+        os.replace(tmp_matrix_path, self.matrix_path)
+        os.replace(tmp_index_path, self.index_path)
+
+
+_caches: Dict[tuple, EmbeddingCache] = {}
+
+
+def get_embedding_cache(model: str, cache_dir: str = "players/embedding_cache") -> EmbeddingCache:
+    """Return the process wide cache for a model, loading it from disk only once"""
+    key = (model, os.path.abspath(cache_dir))
+    if key not in _caches:
+        _caches[key] = EmbeddingCache(model, cache_dir)
+    return _caches[key]
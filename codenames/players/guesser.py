@@ -27,6 +27,23 @@ class Guesser(ABC):
         """Return the top guessed word based on the clue and current game board"""
         pass
 
+    def reset(self):
+        """Prepare for a new game, called before an instance is reused
+
+        Players that keep state between turns must clear it here. The
+        resources passed to __init__ are kept.
+        """
+        pass
+
+    def speculate(self, words_on_board, cancelled):
+        """Prepare for the next clue while the codemaster is thinking
+
+        Called on a background thread. Must not change what the next set_clue,
+        set_board and get_answer return, only compute what they can reuse.
+        Stop early once the threading.Event cancelled is set.
+        """
+        pass
+
 
 class HumanGuesser(Guesser):
     """Guesser derived class for human interaction"""
@@ -1,6 +1,7 @@
 import numpy as np
-import scipy.spatial.distance
 
+from players.combined_embeddings import get_combined_embeddings
+from players.distance_cache import get_distance_matrix
 from players.guesser import Guesser
 
 
@@ -11,6 +12,8 @@ class AIGuesser(Guesser):
         self.brown_ic = brown_ic
         self.glove_vecs = glove_vecs
         self.word_vectors = word_vectors
+        self.embeddings = get_combined_embeddings((self.word_vectors, self.glove_vecs))
+        self.distance_matrix = get_distance_matrix(self.embeddings)
         self.num = 0
 
     def set_board(self, words):
@@ -32,17 +35,9 @@ class AIGuesser(Guesser):
         return sorted_words[0][1]
 
     def compute_distance(self, clue, board):
-        w2v = []
-        all_vectors = (self.word_vectors, self.glove_vecs,)
-
-        for word in board:
-            try:
-                if word[0] == '*':
-                    continue
-                w2v.append((scipy.spatial.distance.cosine(self.concatenate(clue, all_vectors),
-                                                          self.concatenate(word.lower(), all_vectors)), word))
-            except KeyError:
-                continue
+        board = [word for word in board if word[0] != '*']
+        distances = self.distance_matrix.distances(clue, [word.lower() for word in board])
+        w2v = [(distance, word) for distance, word in zip(distances.tolist(), board) if distance != np.inf]
 
         w2v = list(sorted(w2v))
         return w2v
@@ -1,14 +1,25 @@
 from asyncio import iscoroutinefunction as is_async
-from players.codemaster import Codemaster
+from players.codemaster import AnytimeCodemaster, Codemaster
 from players.guesser import Guesser
+from metrics import BOT_THINK_SECONDS, MESSAGE_SECONDS
 import json
 
+_SEND_SECONDS = MESSAGE_SECONDS.labels("send")
+_RECEIVE_SECONDS = MESSAGE_SECONDS.labels("receive")
+
 
 async def send(clientsocket, msg):
-    await clientsocket.send(msg)
+    with _SEND_SECONDS.time():
+        await clientsocket.send(msg)
 
 async def receive(clientsocket) -> str:
-    return await clientsocket.recv()
+    with _RECEIVE_SECONDS.time():
+        return await clientsocket.recv()
+
+
+def _think_time(role, player, method):
+    """Histogram timer of one player method"""
+    return BOT_THINK_SECONDS.labels(role, type(player).__name__, method).time()
 
 
 class OnlineHumanCodemaster(Codemaster):
@@ -113,20 +124,29 @@ class OnlineCodemaster(Codemaster):
 
     def __init__(self, clientsocket, codemaster, cm_kwargs={}):
         super().__init__()
-        self.codemaster = codemaster(**cm_kwargs)
+        # either a class or a ready instance, e.g. from a BotPool
+        self.codemaster = codemaster if isinstance(codemaster, Codemaster) else codemaster(**cm_kwargs)
         self.clientsocket = clientsocket
+        self.deadline_hit = False
 
     async def set_game_state(self, words_in_play, map_in_play):
-        self.codemaster.set_game_state(words_in_play, map_in_play)
+        with _think_time("codemaster", self.codemaster, "set_game_state"):
+            self.codemaster.set_game_state(words_in_play, map_in_play)
         msg = {"board": {"words": words_in_play, "key": map_in_play}}
         await send(self.clientsocket, json.dumps(msg))
 
-    async def get_clue(self):
+    async def get_clue(self, deadline=None):
+        """Clue of the wrapped codemaster, the deadline is passed on if it is an AnytimeCodemaster"""
         clue = None
-        if is_async(self.codemaster.get_clue):
-            clue = await self.codemaster.get_clue()
-        else:
-            clue = self.codemaster.get_clue()
+        kwargs = {}
+        if deadline is not None and isinstance(self.codemaster, AnytimeCodemaster):
+            kwargs["deadline"] = deadline
+        with _think_time("codemaster", self.codemaster, "get_clue"):
+            if is_async(self.codemaster.get_clue):
+                clue = await self.codemaster.get_clue(**kwargs)
+            else:
+                clue = self.codemaster.get_clue(**kwargs)
+        self.deadline_hit = getattr(self.codemaster, "deadline_hit", False)
         msg = {"clue_success": True}
         await send(self.clientsocket, json.dumps(msg))
         return clue
@@ -137,32 +157,38 @@ class OnlineGuesser(Guesser):
 
     def __init__(self, clientsocket, guesser, is_replaying=False, g_kwargs={}):
         super().__init__()
-        if is_replaying:
+        if is_replaying or isinstance(guesser, Guesser):
             self.guesser = guesser
         else:
             self.guesser = guesser(**g_kwargs)
         self.clientsocket = clientsocket
 
     def set_clue(self, clue, num):
-        self.guesser.set_clue(clue, num)
+        with _think_time("guesser", self.guesser, "set_clue"):
+            self.guesser.set_clue(clue, num)
 
     async def set_board(self, words):
-        self.words = words
-        self.guesser.set_board(words)
+        with _think_time("guesser", self.guesser, "set_board"):
+            self.guesser.set_board(words)
         msg = {"board": {"words": words}}
         await send(self.clientsocket, json.dumps(msg))
 
     async def get_answer(self):
         anwer = None
-        if is_async(self.guesser.get_answer):
-            answer = await self.guesser.get_answer()
-        else:
-            answer = self.guesser.get_answer()
-        msg = {"guess_success": self.words.index(answer.upper().strip())}
-        await send(self.clientsocket, json.dumps(msg))
+        with _think_time("guesser", self.guesser, "get_answer"):
+            if is_async(self.guesser.get_answer):
+                answer = await self.guesser.get_answer()
+            else:
+                answer = self.guesser.get_answer()
         return answer
 
+    async def send_guess_success(self, position):
+        """Send the position of the answer, which the game finds on its Board"""
+        msg = {"guess_success": position}
+        await send(self.clientsocket, json.dumps(msg))
+
     async def keep_guessing(self):
-        if is_async(self.guesser.keep_guessing):
-            return await self.guesser.keep_guessing()
-        return self.guesser.keep_guessing()
+        with _think_time("guesser", self.guesser, "keep_guessing"):
+            if is_async(self.guesser.keep_guessing):
+                return await self.guesser.keep_guessing()
+            return self.guesser.keep_guessing()
@@ -1,10 +1,14 @@
+import copy
+
 from nltk.stem.lancaster import LancasterStemmer
 from nltk.stem.wordnet import WordNetLemmatizer
 import numpy as np
-import scipy.spatial.distance
-import itertools
 from typing import Tuple, List
 
+from players.clue_search import best_clues
+from players.clue_vocabulary import get_clue_vocabulary, get_game_vocabulary, words_conflict
+from players.combined_embeddings import get_combined_embeddings
+from players.distance_cache import get_distance_matrix
 from players.codemaster import *
 
 class VectorCodemaster(Codemaster):
@@ -26,10 +30,16 @@ class VectorCodemaster(Codemaster):
         if "vectors" in kwargs:
             for vecs in kwargs["vectors"]:
                 self.all_vectors.append(vecs)
+        # one normalized row per word for all the vectors, shared with the other players using them
+        self.embeddings = get_combined_embeddings(self.all_vectors, kwargs.get("weights", None))
+        # distances between the wordpool and the clue words, computed once per set of vectors
+        self.distance_matrix = get_distance_matrix(self.embeddings)
 
         self.distance_threshold = kwargs.get("distance_threshold", 0.7)
         self.max_red_words_per_clue = kwargs.get("max_red_words_per_clue", 3)
         self.same_clue_patience = kwargs.get("sameCluePatience", 25)
+        # threads scoring shards of the clue words, worth it for vocabularies of tens of thousands of words
+        self.clue_search_workers = kwargs.get("clue_search_workers", 1)
 
         # print("patience:", self.sameCluePatience, "distancethresh",
         #       self.distanceThreshold, "maxRedWordsPerClue", self.maxRedWordsPerClue)
@@ -43,13 +53,80 @@ class VectorCodemaster(Codemaster):
         self.words_on_board = None
         self.key_grid = None
 
-        self.cm_word_set = set([])
-        with open('players/cm_wordlist.txt') as infile:
-            for line in infile:
-                self.cm_word_set.add(line.rstrip().lower())
+        # the shared clue words are never modified. Words are numbered by the game vocabulary, whose ids are the
+        # rows of self.embeddings, the clue words of this game are the ids set in clue_mask
+        self.vocabulary = get_clue_vocabulary()
+        self.game_vocabulary = get_game_vocabulary()
+        self.all_ids = np.arange(len(self.game_vocabulary))
+        self.clue_mask = self._vocabulary_mask()
+        # board -> (copy of this codemaster after playing the board, its clue), turns played ahead by speculate
+        self.speculated_turns = {}
+        self.speculated_clue = None
+
+    def reset(self) -> None:
+        """Restore the clue words and forget the previous game"""
+        self.clue_mask = self._vocabulary_mask()
+        self.same_clue_counter = 0
+        self.last_clue = None
+        self.bad_word_distances = None
+        self.red_word_distances = None
+        self.words_on_board = None
+        self.key_grid = None
+        self.speculated_turns = {}
+        self.speculated_clue = None
+
+    def speculate(self, words_on_board: List[str], key_grid: List[str], cancelled) -> None:
+        """Play the turn of a likely next board ahead on a copy, set_game_state adopts it if the board comes
+
+        The clue depends on the clues removed and given so far, which do not
+        change while the guesser is thinking, so the copy starts from the
+        state the real turn will start from.
+        """
+        board = (tuple(words_on_board), tuple(key_grid))
+        if cancelled.is_set() or board in self.speculated_turns:
+            return
+        turn = copy.copy(self)
+        turn.clue_mask = self.clue_mask.copy()
+        turn.speculated_turns = {}
+        # through the class, the instance attributes may be wrappers bound to self (see profiling.py)
+        type(self).set_game_state(turn, list(words_on_board), list(key_grid))
+        clue = type(self).get_clue(turn)
+        self.speculated_turns[board] = (turn, clue)
+
+    def _vocabulary_mask(self) -> np.ndarray:
+        """Mask of the words of the clue vocabulary, by game vocabulary id"""
+        mask = np.zeros(len(self.game_vocabulary), dtype=bool)
+        mask[:self.game_vocabulary.clue_count] = True
+        return mask
+
+    def _added_clue_words(self) -> List[str]:
+        """Clue words of the current game that are not in the clue vocabulary (board words that left the board)"""
+        clue_count = self.game_vocabulary.clue_count
+        return self.game_vocabulary.word_array[clue_count + np.flatnonzero(self.clue_mask[clue_count:])].tolist()
+
+    def _discard_clue_word(self, word: str) -> None:
+        word_id = self.game_vocabulary.ids.get(word)
+        # the lemmas and stems without an id are no clue words anyway
+        if word_id is not None:
+            self.clue_mask[word_id] = False
+
+    def _add_clue_word(self, word: str) -> None:
+        word_id = self.game_vocabulary.ids.get(word)
+        if word_id is not None:
+            self.clue_mask[word_id] = True
 
     def set_game_state(self, words_on_board: List[str], key_grid: List[str]) -> None:
         """A set function for wordOnBoard and keyGrid (called 'map' in framework) """
+        speculated = self.speculated_turns.get((tuple(words_on_board), tuple(key_grid)))
+        # turns speculated from this state are stale once it changes
+        self.speculated_turns = {}
+        if speculated is not None:
+            turn, clue = speculated
+            self.__dict__.update(turn.__dict__)
+            self.speculated_clue = clue
+            self.words_on_board = words_on_board
+            self.key_grid = key_grid
+            return
         self.words_on_board = words_on_board
         self.key_grid = key_grid
 
@@ -58,28 +135,25 @@ class VectorCodemaster(Codemaster):
         self._remove_conflicting_clues(red_words, bad_words)
 
     def _calc_distance_between_words_on_board_and_clue(self, red_words: List[str], bad_words: List[str]) -> None:
-        """Create word-distance dictionaries for both red words and bad words"""
+        """Compute the distances of both red words and bad words to every potential clue
+
+        Each word gets an array of its distances to every word of the game vocabulary, by id.
+        """
         self.red_word_distances = {}
         for redWord in red_words:
-            self.red_word_distances[redWord] = {}
-            red_word_stacked = self._hstack_word_vectors(redWord)
-            for potentialClue in self.cm_word_set | set(bad_words) | set(red_words):
-                try:
-                    dist = scipy.spatial.distance.cosine(red_word_stacked, self._hstack_word_vectors(potentialClue))
-                except KeyError:
-                    dist = np.inf
-                self.red_word_distances[redWord][potentialClue] = dist
+            self.red_word_distances[redWord] = self._distances_by_id(redWord)
 
         self.bad_word_distances = {}
         for badWord in bad_words:
-            self.bad_word_distances[badWord] = {}
-            bad_word_stacked = self._hstack_word_vectors(badWord)
-            for potentialClue in self.cm_word_set | set(bad_words) | set(red_words):
-                try:
-                    dist = scipy.spatial.distance.cosine(bad_word_stacked, self._hstack_word_vectors(potentialClue))
-                except KeyError:
-                    dist = np.inf
-                self.bad_word_distances[badWord][potentialClue] = dist
+            self.bad_word_distances[badWord] = self._distances_by_id(badWord)
+
+    def _distances_by_id(self, word: str) -> np.ndarray:
+        """Distances of a board word to every word of the game vocabulary"""
+        word_id = self.game_vocabulary.ids.get(word)
+        if word_id is None:
+            # a word of another wordpool
+            return self.distance_matrix.distances(word, self.game_vocabulary.words)
+        return self.distance_matrix.distances_of_ids(word_id, self.all_ids)
 
     def _remove_conflicting_clues(self, red_words: List[str], bad_words: List[str]) -> None:
         """Remove and save clues that overlap with words on the board"""
@@ -88,19 +162,18 @@ class VectorCodemaster(Codemaster):
             removed_clues_per_word = []
             lemm = self.wordnet_lemmatizer.lemmatize(word)
             lancas = self.lancaster_stemmer.stem(word)
-            for clue in self.cm_word_set.copy():
-                if word == clue or lemm == clue or lancas == clue \
-                        or clue.find(word) != -1 or word.find(clue) != -1 \
-                        or clue.find(lemm) != -1 or lemm.find(clue) != -1 \
-                        or clue.find(lancas) != -1 or lancas.find(clue) != -1:
-
-                    self.cm_word_set.discard(clue)
-                    self.cm_word_set.discard(word)
-                    self.cm_word_set.discard(lemm)
-                    self.cm_word_set.discard(lancas)
-
-                    removed_clues_per_word.append(clue)
-                    removed_clues_per_word.append(word)
+            # the conflicts with the vocabulary are computed once per board word, the added clues are few
+            conflicts = [clue for clue in self.vocabulary.conflicting_words(word)
+                         if self.clue_mask[self.game_vocabulary.ids[clue]]]
+            conflicts += [clue for clue in self._added_clue_words() if words_conflict(word, lemm, lancas, clue)]
+            for clue in conflicts:
+                self._discard_clue_word(clue)
+                self._discard_clue_word(word)
+                self._discard_clue_word(lemm)
+                self._discard_clue_word(lancas)
+
+                removed_clues_per_word.append(clue)
+                removed_clues_per_word.append(word)
             self.removed_clues[word] = removed_clues_per_word
 
     def _identify_words_on_board(self) -> Tuple[List[str], List[str]]:
@@ -121,6 +194,9 @@ class VectorCodemaster(Codemaster):
 
     def get_clue(self) -> Tuple[str, int]:
         """Function that returns a clue word and number of estimated related words on the board"""
+        if self.speculated_clue is not None:
+            clue, self.speculated_clue = self.speculated_clue, None
+            return clue
 
         red_words, bad_words = self._identify_words_on_board()
         # print("REDWORDS:", redWords)
@@ -130,55 +206,27 @@ class VectorCodemaster(Codemaster):
             # del self.badWordDists[word]
             removed_clues_per_word = self.removed_clues.get(word, [])
             for clue in removed_clues_per_word:
-                self.cm_word_set.add(clue)
+                self._add_clue_word(clue)
 
         to_remove = set(self.red_word_distances) - set(red_words)
         for word in to_remove:
             # del self.redWordDists[word]
             removed_clues_per_word = self.removed_clues.get(word, [])
             for clue in removed_clues_per_word:
-                self.cm_word_set.add(clue)
+                self._add_clue_word(clue)
 
-        bests = {}
-        # iterate though combinations of red words for best clue
-        # ignore clue with close distance to a bad word
-        for n_red_words_in_clue in range(1, self.max_red_words_per_clue + 1):
-            best_dist_per_clue_num = np.inf
-            best_word_per_clue_num = ""
-            best_red_word_per_clue_num = ""
+        # in id order, ties between clues go to the smallest id
+        clue_ids = np.flatnonzero(self.clue_mask)
+        clue_words = self.game_vocabulary.word_array[clue_ids]
+        allowed = None
+        if self.same_clue_counter >= self.same_clue_patience:
+            allowed = clue_words != self.last_clue
 
-            for red_word_combination in list(itertools.combinations(red_words, n_red_words_in_clue)):
-                best_dist = np.inf
-                best_word = ""
-
-                for potential_clue in self.cm_word_set:
-
-                    if potential_clue == self.last_clue and self.same_clue_counter >= self.same_clue_patience:
-                        continue
-
-                    min_bad_dist = np.inf
-                    min_bad_word = ""
-                    for bad_word in bad_words:
-                        if self.bad_word_distances[bad_word][potential_clue] < min_bad_dist:
-                            min_bad_dist = self.bad_word_distances[bad_word][potential_clue]
-                            min_bad_word = bad_word
-
-                    max_red_dist = 0
-                    for red_word in red_word_combination:
-                        dist = self.red_word_distances[red_word][potential_clue]
-                        if dist > max_red_dist:
-                            max_red_dist = dist
-
-                    if max_red_dist < best_dist and max_red_dist < min_bad_dist:
-                        best_dist = max_red_dist
-                        best_word = potential_clue
-
-                        if best_dist < best_dist_per_clue_num:
-                            best_dist_per_clue_num = best_dist
-                            best_word_per_clue_num = best_word
-                            best_red_word_per_clue_num = red_word_combination
-
-            bests[n_red_words_in_clue] = (best_red_word_per_clue_num, best_word_per_clue_num, best_dist_per_clue_num)
+        # best clue for every number of red words, ignoring clues closer to a bad word
+        red_distances = [self.red_word_distances[word][clue_ids] for word in red_words]
+        bad_distances = [self.bad_word_distances[word][clue_ids] for word in bad_words]
+        bests = best_clues(red_words, red_distances, bad_distances, clue_words,
+                           self.max_red_words_per_clue, allowed, workers=self.clue_search_workers)
 
         # print("bests:", bests)
 
@@ -193,7 +241,7 @@ class VectorCodemaster(Codemaster):
             best = np.inf
 
             for word in redWordCombo:
-                dist = self.red_word_distances[word][potential_clue]
+                dist = self.red_word_distances[word][self.game_vocabulary.ids[potential_clue]]
                 if dist > worst:
                     worst = dist
                 if dist < best:
@@ -213,13 +261,3 @@ class VectorCodemaster(Codemaster):
         self.last_clue = chosen_clue
         return chosen_clue, chosen_num
 
-    def _hstack_word_vectors(self, word):
-        """For word, stack all word embedding nd.array for each kind of word vector"""
-        try:
-            stacked_words = self.all_vectors[0][word]
-            for vec in self.all_vectors[1:]:
-                stacked_words = np.hstack((stacked_words, vec[word]))
-            return stacked_words
-        except KeyError:
-            return None
-
@@ -1,7 +1,9 @@
 import numpy as np
-import scipy.spatial.distance
 from typing import Tuple, List
 
+from players.clue_vocabulary import get_game_vocabulary
+from players.combined_embeddings import get_combined_embeddings
+from players.distance_cache import get_distance_matrix
 from players.guesser import *
 
 class VectorGuesser(Guesser):
@@ -23,6 +25,12 @@ class VectorGuesser(Guesser):
         if "vectors" in kwargs:
             for vecs in kwargs["vectors"]:
                 self.all_vectors.append(vecs)
+        # one normalized row per word for all the vectors, shared with the other players using them
+        self.embeddings = get_combined_embeddings(self.all_vectors, kwargs.get("weights", None))
+        # distances between the wordpool and the clue words, computed once per set of vectors
+        self.distance_matrix = get_distance_matrix(self.embeddings)
+        # ids of the board words and clues, the rows of self.embeddings
+        self.vocabulary = get_game_vocabulary()
 
         self.init_num_guesses = None
         self.num_guesses_left = None
@@ -67,27 +75,14 @@ class VectorGuesser(Guesser):
 
     def _calc_dist_between_clues_and_board(self) -> List[Tuple[str, float]]:
         """Calc cosine similarity between clue word and words on the board"""
-        word_distance_tuples = []
-        cos_dist = scipy.spatial.distance.cosine
-        for word in self.words_on_board:
-            try:
-                if word[0] == '*':
-                    continue
-                else:
-                    distance = cos_dist(self._hstack_word_vectors(self.clue_word),
-                                        self._hstack_word_vectors(word.lower()))  # 1 - cos_dist = cos similarity
-                    word_distance_tuples.append((word, distance))
-            except KeyError:
-                continue
-
-        return word_distance_tuples
-
-    def _hstack_word_vectors(self, word):
-        """For word, stack all word embedding nd.array for each kind of word vector"""
-        try:
-            stacked_words = self.all_vectors[0][word]
-            for vec in self.all_vectors[1:]:
-                stacked_words = np.hstack((stacked_words, vec[word]))
-            return stacked_words
-        except KeyError:
-            return None
+        # words on board that have already been identified start with '*'
+        words = [word for word in self.words_on_board if word[0] != '*']
+        clue_id = self.vocabulary.id_of(self.clue_word)
+        ids = self.vocabulary.ids_of(words)
+        if clue_id >= 0 and (ids >= 0).all():
+            distances = self.distance_matrix.distances_of_ids(clue_id, ids)
+        else:
+            # a clue typed by a human or a board of another wordpool
+            distances = self.distance_matrix.distances(self.clue_word, [word.lower() for word in words])
+        # words unknown to some of the vectors are skipped
+        return [(word, distance) for word, distance in zip(words, distances.tolist()) if distance != np.inf]
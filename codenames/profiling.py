@@ -0,0 +1,212 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# the player methods that are profiled, everything else (loading vectors, rendering, logging) is left out
+PROFILED_METHODS = {
+    "codemaster": ("set_game_state", "get_clue"),
+    "guesser": ("set_clue", "set_board", "get_answer", "keep_guessing"),
+}
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class BotProfiler:
+    """Profiles the methods of the players, aggregated per player class
+
+    Only the calls of PROFILED_METHODS are profiled, once per turn. The stacks
+    seen inside them are aggregated per player class and written in the folded
+    format read by flamegraph.pl, speedscope and most flame graph viewers.
+
+    Modes:
+        "sample": a background thread samples the stack of the calling thread
+            every interval_s, weights are numbers of samples. Works for async
+            methods, samples taken while the method is suspended are skipped,
+            so the sessions of an event loop can be profiled concurrently.
+        "deterministic": every Python and C call is timed with sys.setprofile,
+            weights are microseconds of self time. Slower, async methods are
+            sampled instead.
+    """
+
+    def __init__(self, mode: str = "sample", output_dir: str = "profiles", interval_s: float = 0.005):
+        assert mode in ("sample", "deterministic"), f"unknown profiling mode {mode}"
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval_s = interval_s
+
+        # player class -> folded stack -> weight
+        self.stacks: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        # player class -> method -> duration of every call
+        self.durations: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+
+        self._lock = threading.Lock()
+        # (thread id, player class, code object of the profiled method) -> number of calls in progress,
+        # async methods of several sessions can be in progress on the thread of an event loop at once
+        self._active: Dict[tuple, int] = defaultdict(int)
+        self._sampler = None
+
+    def attach(self, player, role: str):
+        """Profile the methods of a player instance, returns the player"""
+        player_class = type(player).__name__
+        for name in PROFILED_METHODS[role]:
+            method = getattr(player, name, None)
+            if method is None or getattr(method, "_profiled", False):
+                continue
+            setattr(player, name, self._wrap(method, player_class))
+        return player
+
+    def _wrap(self, method, player_class: str):
+        code = getattr(method, "__func__", method).__code__
+        name = method.__name__
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                active = self._start_sampling(player_class, code)
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self._stop_sampling(active)
+                    self.durations[player_class][name].append(time.perf_counter() - start)
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                tracer = active = None
+                if self.mode == "deterministic":
+                    tracer = _Tracer(self, player_class)
+                    sys.setprofile(tracer)
+                else:
+                    active = self._start_sampling(player_class, code)
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    if tracer is not None:
+                        sys.setprofile(None)
+                        tracer.finish()
+                    else:
+                        self._stop_sampling(active)
+                    self.durations[player_class][name].append(time.perf_counter() - start)
+
+        wrapper._profiled = True
+        return wrapper
+
+    ##### sampling #####
+
+    def _start_sampling(self, player_class: str, code) -> tuple:
+        active = (threading.get_ident(), player_class, code)
+        with self._lock:
+            self._active[active] += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_forever, daemon=True, name="bot-profiler")
+                self._sampler.start()
+        return active
+
+    def _stop_sampling(self, active: tuple) -> None:
+        with self._lock:
+            self._active[active] -= 1
+            if not self._active[active]:
+                del self._active[active]
+
+    def _sample_forever(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            # a sample counts once however many calls of the method are in progress, only the running one is
+            # on the stack of the thread
+            for thread_id, player_class, code in active:
+                stack = self._stack_below(frames.get(thread_id), code)
+                if stack is not None:
+                    self.stacks[player_class][stack] += 1
+            # the frames keep the locals of the sampled threads (e.g. the Game) alive
+            del frames
+
+    @staticmethod
+    def _stack_below(frame, code) -> Optional[str]:
+        """Folded stack from the frame of the profiled method down to frame, None outside of it"""
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame.f_code))
+            if frame.f_code is code:
+                return ";".join(reversed(names))
+            frame = frame.f_back
+        return None
+
+    ##### output #####
+
+    def write(self) -> List[str]:
+        """Write <player class>.folded and summary.json to output_dir, returns the written paths"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        for player_class, stacks in sorted(self.stacks.items()):
+            path = os.path.join(self.output_dir, f"{player_class}.folded")
+            with open(path, "w") as f:
+                for stack, weight in sorted(stacks.items()):
+                    if round(weight) > 0:
+                        f.write(f"{stack} {round(weight)}\n")
+            paths.append(path)
+
+        summary = {
+            "mode": self.mode,
+            "unit": "samples" if self.mode == "sample" else "microseconds",
+            "players": {
+                player_class: {
+                    method: {"calls": len(times), "total_s": sum(times), "max_s": max(times), "per_call_s": times}
+                    for method, times in methods.items()
+                }
+                for player_class, methods in self.durations.items()
+            },
+        }
+        path = os.path.join(self.output_dir, "summary.json")
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        paths.append(path)
+        return paths
+
+
+class _Tracer:
+    """sys.setprofile callback attributing the self time of every call to its folded stack"""
+
+    def __init__(self, profiler: BotProfiler, player_class: str):
+        self.stacks = profiler.stacks[player_class]
+        # [folded stack, start, time spent in children]
+        self.calls = []
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == "c_call" and arg is sys.setprofile:
+            return
+        if event == "call" or event == "c_call":
+            name = _frame_name(frame.f_code) if event == "call" else \
+                f"{getattr(arg, '__qualname__', getattr(arg, '__name__', 'builtin'))} (builtin)"
+            parent = self.calls[-1][0] + ";" if self.calls else ""
+            self.calls.append([parent + name, now, 0.0])
+        elif (event == "return" or event == "c_return" or event == "c_exception") and self.calls:
+            stack, start, children = self.calls.pop()
+            elapsed = now - start
+            self.stacks[stack] += (elapsed - children) * 1e6
+            if self.calls:
+                self.calls[-1][2] += elapsed
+
+    def finish(self) -> None:
+        # calls still open when the profile was removed (the wrapped method itself)
+        now = time.perf_counter()
+        while self.calls:
+            stack, start, children = self.calls.pop()
+            elapsed = now - start
+            self.stacks[stack] += (elapsed - children) * 1e6
+            if self.calls:
+                self.calls[-1][2] += elapsed
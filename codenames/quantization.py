@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+QUANTIZATION_MODES = ("float16", "int8")
+
+# rows quantized at once while loading, bounds the float32 copy held during loading
+_CHUNK_ROWS = 65536
+
+
+def quantize_rows(rows: np.ndarray, mode: str):
+    """Quantize a (n, dim) matrix, returns (data, scales) with scales None for float16
+
+    int8 rows are scaled to use the full [-127, 127] range, row i is approximately
+    data[i] * scales[i].
+    """
+    assert mode in QUANTIZATION_MODES, f"unknown quantization mode {mode}"
+    rows = np.asarray(rows, dtype=np.float32)
+    if mode == "float16":
+        return rows.astype(np.float16), None
+    scales = np.abs(rows).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    data = np.rint(rows / scales[:, None]).astype(np.int8)
+    return data, scales.astype(np.float32)
+
+
+class QuantizedVectors:
+    """Word vectors stored as float16 or as int8 with one float32 scale per row
+
+    Behaves like the GloVe dicts and gensim KeyedVectors the players use:
+    vectors["<word>"] returns the dequantized float32 vector of one word, and
+    raises KeyError for unknown words. No full precision copy is kept, every
+    distance is computed from the quantized values.
+    """
+
+    def __init__(self, words: Sequence[str], data: np.ndarray, scales: Optional[np.ndarray] = None):
+        assert len(words) == len(data), "one row per word is needed"
+        assert (data.dtype == np.int8) == (scales is not None), "int8 rows need their scales"
+        self.index_to_key: List[str] = list(words)
+        self.key_to_index: Dict[str, int] = {word: i for i, word in enumerate(self.index_to_key)}
+        self.data = data
+        self.scales = scales
+        self.mode = "int8" if scales is not None else "float16"
+        self.vector_size = data.shape[1] if data.ndim == 2 else 0
+
+    @staticmethod
+    def from_vectors(vectors, mode: str) -> "QuantizedVectors":
+        """Quantize a GloVe dict or gensim KeyedVectors"""
+        words = list(getattr(vectors, "index_to_key", None) or vectors.keys())
+        matrix = getattr(vectors, "vectors", None)
+        chunks, scales = [], []
+        for start in range(0, len(words), _CHUNK_ROWS):
+            if matrix is not None:
+                rows = matrix[start:start + _CHUNK_ROWS]
+            else:
+                rows = np.array([vectors[word] for word in words[start:start + _CHUNK_ROWS]], dtype=np.float32)
+            data, chunk_scales = quantize_rows(rows, mode)
+            chunks.append(data)
+            scales.append(chunk_scales)
+        return QuantizedVectors._from_chunks(words, chunks, scales, mode)
+
+    @staticmethod
+    def _from_chunks(words, chunks, scales, mode) -> "QuantizedVectors":
+        data = np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype=np.int8 if mode == "int8" else np.float16)
+        if mode == "int8":
+            return QuantizedVectors(words, data, np.concatenate(scales) if scales else np.zeros(0, dtype=np.float32))
+        return QuantizedVectors(words, data)
+
+    def __getitem__(self, word: str) -> np.ndarray:
+        i = self.key_to_index[word]
+        if self.scales is None:
+            return self.data[i].astype(np.float32)
+        return self.data[i].astype(np.float32) * self.scales[i]
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.key_to_index
+
+    def __len__(self):
+        return len(self.index_to_key)
+
+    def __iter__(self):
+        return iter(self.index_to_key)
+
+    def keys(self):
+        return self.key_to_index.keys()
+
+    def get(self, word: str, default=None):
+        try:
+            return self[word]
+        except KeyError:
+            return default
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the vectors, without the word index"""
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+def load_glove_quantized(glove_file_path: str, mode: str) -> QuantizedVectors:
+    """Load a GloVe text file straight into quantized storage, one chunk of float32 rows at a time"""
+    words, chunks, scales, rows = [], [], [], []
+    with open(glove_file_path, encoding="utf-8") as infile:
+        for line in infile:
+            line = line.rstrip().split(' ')
+            words.append(line[0])
+            rows.append(np.array(line[1:], dtype=np.float32))
+            if len(rows) == _CHUNK_ROWS:
+                data, chunk_scales = quantize_rows(np.vstack(rows), mode)
+                chunks.append(data)
+                scales.append(chunk_scales)
+                rows = []
+    if rows:
+        data, chunk_scales = quantize_rows(np.vstack(rows), mode)
+        chunks.append(data)
+        scales.append(chunk_scales)
+    return QuantizedVectors._from_chunks(words, chunks, scales, mode)
+
+
+def load_w2v_quantized(w2v_file_path: str, mode: str) -> QuantizedVectors:
+    """Load a binary word2vec file into quantized storage, read as float16 to halve the peak memory"""
+    from gensim.models import KeyedVectors
+    vectors = KeyedVectors.load_word2vec_format(w2v_file_path, binary=True, unicode_errors='ignore',
+                                                datatype=np.float16)
+    if mode == "float16":
+        return QuantizedVectors(vectors.index_to_key, vectors.vectors)
+    return QuantizedVectors.from_vectors(vectors, mode)
+
+
+def vectors_nbytes(vectors) -> int:
+    """Bytes of the vectors of a GloVe dict, gensim KeyedVectors or QuantizedVectors"""
+    if isinstance(vectors, QuantizedVectors):
+        return vectors.nbytes
+    matrix = getattr(vectors, "vectors", None)
+    if matrix is not None:
+        return matrix.nbytes
+    return sum(vector.nbytes for vector in vectors.values())
+
+
+##### Accuracy report #####
+
+class _ShadowCodemaster:
+    """Plays with the full precision codemaster and asks the quantized ones the same questions"""
+
+    def __init__(self, reference, shadows: Dict[str, object], counts):
+        self.reference = reference
+        self.shadows = shadows
+        self.counts = counts
+
+    def set_game_state(self, words, key_grid):
+        self.reference.set_game_state(words, key_grid)
+        for shadow in self.shadows.values():
+            shadow.set_game_state(words, key_grid)
+
+    def get_clue(self):
+        clue, num = self.reference.get_clue()
+        for mode, shadow in self.shadows.items():
+            shadow_clue, shadow_num = shadow.get_clue()
+            self.counts[mode]["clues"] += 1
+            self.counts[mode]["clue_changed"] += shadow_clue != clue
+            self.counts[mode]["clue_num_changed"] += int(shadow_num) != int(num)
+        return clue, num
+
+
+class _ShadowGuesser:
+    """Plays with the full precision guesser and asks the quantized ones the same questions"""
+
+    def __init__(self, reference, shadows: Dict[str, object], counts):
+        self.reference = reference
+        self.shadows = shadows
+        self.counts = counts
+
+    def set_board(self, words):
+        self.reference.set_board(words)
+        for shadow in self.shadows.values():
+            shadow.set_board(words)
+
+    def set_clue(self, clue, num):
+        self.reference.set_clue(clue, num)
+        for shadow in self.shadows.values():
+            shadow.set_clue(clue, num)
+
+    def get_answer(self):
+        answer = self.reference.get_answer()
+        for mode, shadow in self.shadows.items():
+            shadow_answer = shadow.get_answer()
+            self.counts[mode]["guesses"] += 1
+            self.counts[mode]["guess_changed"] += shadow_answer != answer
+        return answer
+
+    def keep_guessing(self):
+        for shadow in self.shadows.values():
+            shadow.keep_guessing()
+        return self.reference.keep_guessing()
+
+
+def accuracy_report(codemaster_class, guesser_class, kwargs_per_mode: Dict[str, dict],
+                    seeds: Iterable[int]) -> Dict[str, dict]:
+    """How often the quantized players choose another clue or guess than the full precision ones
+
+    Games are played by the full precision players (kwargs_per_mode[None]), the
+    players of every other mode see the same boards and clues and are only
+    asked what they would do, so every decision is compared on the same state.
+    """
+    from game import Game
+
+    counts = defaultdict(lambda: defaultdict(int))
+    modes = [mode for mode in kwargs_per_mode if mode is not None]
+    for seed in seeds:
+        codemaster = _ShadowCodemaster(codemaster_class(**kwargs_per_mode[None]),
+                                       {mode: codemaster_class(**kwargs_per_mode[mode]) for mode in modes}, counts)
+        guesser = _ShadowGuesser(guesser_class(**kwargs_per_mode[None]),
+                                 {mode: guesser_class(**kwargs_per_mode[mode]) for mode in modes}, counts)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            Game(lambda **_: codemaster, lambda **_: guesser, seed=seed, do_print=False, do_log=False).run()
+
+    report = {}
+    for mode in modes:
+        c = counts[mode]
+        report[mode] = {
+            "clues": c["clues"],
+            "clue_change_rate": c["clue_changed"] / c["clues"] if c["clues"] else None,
+            "clue_num_change_rate": c["clue_num_changed"] / c["clues"] if c["clues"] else None,
+            "guesses": c["guesses"],
+            "guess_change_rate": c["guess_changed"] / c["guesses"] if c["guesses"] else None,
+        }
+    return report
+
+
+def main():
+    from game import Game
+
+    parser = argparse.ArgumentParser(
+        description="Report how often quantized vectors change the clues and guesses of a pair of players.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("codemaster", help="import string of form A.B.C.MyClass")
+    parser.add_argument("guesser", help="import string of form A.B.C.MyClass")
+    parser.add_argument("--glove", help="Path to glove file or None", default=None)
+    parser.add_argument("--w2v", help="Path to w2v file or None", default=None)
+    parser.add_argument("--modes", nargs="+", choices=QUANTIZATION_MODES, default=list(QUANTIZATION_MODES))
+    parser.add_argument("--games", type=int, default=20, help="Number of seeded games")
+    parser.add_argument("--first_seed", type=int, default=0, help="Seed of the first game")
+    parser.add_argument("--output", help="Write the report as JSON to this file", default=None)
+    args = parser.parse_args()
+
+    def import_class(import_string):
+        module_name, class_name = import_string.rsplit(".", 1)
+        return getattr(importlib.import_module(module_name), class_name)
+
+    kwargs_per_mode = {}
+    memory = {}
+    for mode in [None] + args.modes:
+        kwargs = {}
+        if args.glove is not None:
+            kwargs["glove_vecs"] = Game.load_glove_vecs(args.glove, quantize=mode)
+        if args.w2v is not None:
+            kwargs["word_vectors"] = Game.load_w2v(args.w2v, quantize=mode)
+        kwargs_per_mode[mode] = kwargs
+        memory[mode or "full"] = {name: vectors_nbytes(vectors) for name, vectors in kwargs.items()}
+        print(f"loaded {mode or 'full precision'} vectors: {memory[mode or 'full']}")
+
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    report = accuracy_report(import_class(args.codemaster), import_class(args.guesser), kwargs_per_mode, seeds)
+    full_bytes = sum(memory["full"].values())
+    for mode, row in report.items():
+        row["vector_bytes"] = sum(memory[mode].values())
+        row["memory_reduction"] = full_bytes / row["vector_bytes"] if row["vector_bytes"] else None
+
+    def rate(r):
+        return "n/a" if r is None else f"{r:.1%}"
+
+    print(f"\n{args.games} games, {args.codemaster} + {args.guesser}")
+    for mode, row in report.items():
+        print(f"{mode}: clue changed {rate(row['clue_change_rate'])} of {row['clues']}, "
+              f"number changed {rate(row['clue_num_change_rate'])}, "
+              f"guess changed {rate(row['guess_change_rate'])} of {row['guesses']}, "
+              f"vectors {row['vector_bytes'] / 2 ** 20:.1f} MiB ({row['memory_reduction'] or 0:.1f}x smaller)")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"games": args.games, "first_seed": args.first_seed, "memory_bytes": memory,
+                       "modes": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
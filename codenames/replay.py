@@ -4,6 +4,7 @@ import os
 from typing import Literal, Dict, List
 from players.codemaster import Codemaster
 from players.guesser import Guesser
+from metrics import REPLAY_WRITE_SECONDS
 
 
 class Action(ABC):
@@ -199,7 +200,7 @@ class ReplayHandler(Codemaster, Guesser):
         if complete:
             self.replay.now_complete()
         try:
-            with open(self.get_replay_path(), "w") as f:
+            with REPLAY_WRITE_SECONDS.time(), open(self.get_replay_path(), "w") as f:
                 f.write(self.replay.to_json())
         except Exception as e:
             print(e)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+VECTOR_CACHE_DIR = "players/vector_cache"
+
+# rows copied at once while writing the cache
+_CHUNK_ROWS = 65536
+
+
+def game_vocabulary(wordpool_file: str = "game_wordpool.txt", clue_wordlist_file: str = "players/cm_wordlist.txt",
+                    extra: Iterable[str] = ()) -> List[str]:
+    """Every word the bots look up in a game: the lowercased wordpool, the clue wordlist and extra"""
+    words = set(extra)
+    for path in (wordpool_file, clue_wordlist_file):
+        with open(path) as f:
+            words.update(line.strip().lower() for line in f if line.strip())
+    return sorted(words)
+
+
+class _FullVectors:
+    """Every vector of a source file, memory mapped from the cache and looked up by binary search"""
+
+    def __init__(self, cache_path: str):
+        self.words = np.load(os.path.join(cache_path, "words.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(cache_path, "vectors.npy"), mmap_mode="r")
+
+    def find(self, words: List[str]) -> np.ndarray:
+        """Row of each word, -1 for the words the source does not have"""
+        encoded = [word.encode("utf-8") for word in words]
+        fits = np.array([len(key) <= self.words.itemsize for key in encoded], dtype=bool)
+        keys = np.array([key if ok else b"" for key, ok in zip(encoded, fits)], dtype=self.words.dtype)
+        positions = np.minimum(np.searchsorted(self.words, keys), len(self.words) - 1)
+        found = fits & (self.words[positions] == keys) if len(self.words) else np.zeros(len(words), dtype=bool)
+        return np.where(found, positions, -1)
+
+
+def _source_stamp(source_path: str) -> dict:
+    stat = os.stat(source_path)
+    return {"source": os.path.abspath(source_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _read_source(source_path: str, binary: bool):
+    """All the words and vectors of a GloVe text file (binary=False) or a word2vec binary file"""
+    if binary:
+        from gensim.models import KeyedVectors
+        vectors = KeyedVectors.load_word2vec_format(source_path, binary=True, unicode_errors='ignore')
+        return vectors.index_to_key, vectors.vectors
+    words, rows = [], []
+    with open(source_path, encoding="utf-8") as infile:
+        for line in infile:
+            line = line.rstrip().split(' ')
+            words.append(line[0])
+            rows.append(np.array(line[1:], dtype=np.float32))
+    return words, np.vstack(rows)
+
+
+def build_full_cache(source_path: str, binary: bool, cache_dir: str = VECTOR_CACHE_DIR) -> str:
+    """Convert a vector file to the memory mappable cache once, returns the cache folder
+
+    The cache holds the words sorted as fixed width utf-8 (words.npy) and their
+    float32 vectors in the same order (vectors.npy). It is rebuilt when the size
+    or modification time of the source file changes.
+    """
+    cache_path = os.path.join(cache_dir, os.path.basename(source_path))
+    stamp = _source_stamp(source_path)
+    try:
+        with open(os.path.join(cache_path, "meta.json")) as f:
+            if json.load(f) == stamp:
+                return cache_path
+    except (OSError, ValueError):
+        pass
+
+    print(f"Building the vector cache of {source_path}, once")
+    words, matrix = _read_source(source_path, binary)
+    encoded = [word.encode("utf-8") for word in words]
+    keys = np.array(encoded, dtype=f"S{max(map(len, encoded), default=1)}")
+    order = np.argsort(keys, kind="stable")
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "words.npy"), keys[order])
+    out = np.lib.format.open_memmap(os.path.join(tmp_path, "vectors.npy"), mode="w+",
+                                    dtype=np.float32, shape=(len(order), matrix.shape[1]))
+    for start in range(0, len(order), _CHUNK_ROWS):
+        out[start:start + _CHUNK_ROWS] = matrix[order[start:start + _CHUNK_ROWS]]
+    out.flush()
+    del out
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(stamp, f)
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+class RestrictedVectors:
+    """Vectors of a fixed vocabulary in memory, the rest of the source file looked up on demand
+
+    Behaves like the GloVe dicts and gensim KeyedVectors the players use.
+    Looking up a word outside of the vocabulary (e.g. a clue typed by a human)
+    reads its row from the memory mapped cache of the full file and keeps it.
+    """
+
+    def __init__(self, words: List[str], vectors: np.ndarray, full_cache_path: Optional[str] = None):
+        self.index_to_key: List[str] = list(words)
+        self.key_to_index: Dict[str, int] = {word: i for i, word in enumerate(self.index_to_key)}
+        self.vectors = vectors
+        self.vectors.setflags(write=False)
+        self.vector_size = vectors.shape[1]
+        self.full_cache_path = full_cache_path
+        self._full = None
+        self._extra: Dict[str, Optional[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _lookup_full(self, word: str) -> Optional[np.ndarray]:
+        if self.full_cache_path is None:
+            return None
+        with self._lock:
+            if self._full is None:
+                self._full = _FullVectors(self.full_cache_path)
+            row = self._full.find([word])[0]
+        if row < 0:
+            return None
+        vector = np.array(self._full.vectors[row])
+        vector.setflags(write=False)
+        return vector
+
+    def __getitem__(self, word: str) -> np.ndarray:
+        i = self.key_to_index.get(word)
+        if i is not None:
+            return self.vectors[i]
+        if word not in self._extra:
+            # unknown words are remembered too, so they are searched once
+            self._extra[word] = self._lookup_full(word)
+        vector = self._extra[word]
+        if vector is None:
+            raise KeyError(word)
+        return vector
+
+    def __contains__(self, word: str) -> bool:
+        try:
+            self[word]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.index_to_key)
+
+    def __iter__(self):
+        return iter(self.index_to_key)
+
+    def keys(self):
+        return self.key_to_index.keys()
+
+    def get(self, word: str, default=None):
+        try:
+            return self[word]
+        except KeyError:
+            return default
+
+
+def load_restricted(source_path: str, vocabulary: Iterable[str], binary: bool,
+                    cache_dir: str = VECTOR_CACHE_DIR) -> RestrictedVectors:
+    """Load the vectors of vocabulary from a GloVe text file or a word2vec binary file
+
+    The first load of a file converts it to the cache (see build_full_cache), the
+    first load of a vocabulary saves its rows next to it. Later loads only read
+    those rows.
+    """
+    cache_path = build_full_cache(source_path, binary, cache_dir)
+    vocabulary = sorted(set(vocabulary))
+    digest = hashlib.sha1("\n".join(vocabulary).encode("utf-8")).hexdigest()[:16]
+    restricted_path = os.path.join(cache_path, f"restricted-{digest}.npz")
+
+    try:
+        with np.load(restricted_path) as restricted:
+            return RestrictedVectors(restricted["words"].tolist(), restricted["vectors"], cache_path)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    full = _FullVectors(cache_path)
+    rows = full.find(vocabulary)
+    found = rows >= 0
+    words = [word for word, ok in zip(vocabulary, found) if ok]
+    # utf-8 bytes sort like the words, so the rows are increasing and read in file order
+    vectors = np.array(full.vectors[rows[found]], dtype=np.float32)
+    del full
+
+    tmp_path = f"{restricted_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, words=np.array(words, dtype=str), vectors=vectors)
+    os.replace(tmp_path, restricted_path)
+    return RestrictedVectors(words, vectors, cache_path)
@@ -1,244 +1,106 @@
+import argparse
+import json
+import os
+import shutil
 import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+from results_store import create_run_dir
+from tournament_manifest import TournamentManifest
 
-# for everything else but glove vs glove
-def run():
-    # w2v_thresholds vs w2vglove300
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_w2v_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove", "players/glove/glove.6B.300d.txt",
-                        "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_w2v_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove", "players/glove/glove.6B.300d.txt",
-                        "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_w2v_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove", "players/glove/glove.6B.300d.txt",
-                        "--seed", str_counter])
-        counter += 50
+# games already played with the same bots, vectors and seed are not replayed, see result_cache.py
+RESULT_CACHE = "results/result_cache.sqlite"
 
-    # glove300_thresholds vs w2vglove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.300d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.300d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.300d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
+W2V = "players/GoogleNews-vectors-negative300.bin"
+SEEDS = [100 + 50 * i for i in range(30)]
+THRESHOLDS = ("03", "05", "07")
 
-    # glove200_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.200d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.200d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.200d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
 
-    # glove100_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.100d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.100d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.100d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
+def _glove(dim):
+    return f"players/glove/glove.6B.{dim}d.txt"
 
-    # glove50_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.50d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.50d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(["python", "run_game.py", "players.codemaster_glove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-                        "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.50d.txt",
-                        "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
 
+# codemaster family and vector arguments of run_game.py, each threshold of the family plays the w2vglove guesser
+GROUPS = [
+    # w2v_thresholds vs w2vglove300
+    ("w2v", ["--w2v", W2V, "--glove", _glove(300)]),
+    # glove300_thresholds vs w2vglove300 (GLOVE V GLOVE)
+    ("glove", ["--w2v", W2V, "--glove_cm", _glove(300), "--glove_guesser", _glove(300)]),
+    # glove200_thresholds vs glove300 (GLOVE V GLOVE)
+    ("glove", ["--w2v", W2V, "--glove_cm", _glove(200), "--glove_guesser", _glove(300)]),
+    # glove100_thresholds vs glove300 (GLOVE V GLOVE)
+    ("glove", ["--w2v", W2V, "--glove_cm", _glove(100), "--glove_guesser", _glove(300)]),
+    # glove50_thresholds vs glove300 (GLOVE V GLOVE)
+    ("glove", ["--w2v", W2V, "--glove_cm", _glove(50), "--glove_guesser", _glove(300)]),
     # w2vglove300_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.300d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.300d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.300d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
+    ("w2vglove", ["--w2v", W2V, "--glove_cm", _glove(300), "--glove_guesser", _glove(300)]),
     # w2vglove200_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.200d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.200d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.200d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
+    ("w2vglove", ["--w2v", W2V, "--glove_cm", _glove(200), "--glove_guesser", _glove(300)]),
     # w2vglove100_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.100d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.100d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_07.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.100d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
+    ("w2vglove", ["--w2v", W2V, "--glove_cm", _glove(100), "--glove_guesser", _glove(300)]),
     # w2vglove50_thresholds vs glove300 (GLOVE V GLOVE)
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_03.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.50d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_05.AICodemaster", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.50d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-    counter = 100
-    for i in range(30):
-        str_counter = str(int(counter))
-        subprocess.run(
-            ["python", "run_game.py", "players.codemaster_w2vglove_0.AICodemaster7", "players.guesser_w2vglove.AIGuesser", "--w2v",
-             "players/GoogleNews-vectors-negative300.bin", "--glove_cm", "players/glove/glove.6B.50d.txt",
-             "--glove_guesser", "players/glove/glove.6B.300d.txt", "--seed", str_counter])
-        counter += 50
-
-
-run()
+    ("w2vglove", ["--w2v", W2V, "--glove_cm", _glove(50), "--glove_guesser", _glove(300)]),
+]
+
+
+def games():
+    """run_game.py arguments of every game, in the order they are played"""
+    return [[f"players.codemaster_{family}_{threshold}.AICodemaster", "players.guesser_w2vglove.AIGuesser",
+             *vector_args, "--seed", str(seed)]
+            for family, vector_args in GROUPS for threshold in THRESHOLDS for seed in SEEDS]
+
+
+def play(manifest: TournamentManifest, game: str, args, quiet: bool) -> None:
+    """Play one game in a run_game.py process and report it to the manifest"""
+    game_dir = manifest.game_dir(game)
+    # left over by an interrupted attempt
+    shutil.rmtree(game_dir, ignore_errors=True)
+    command = [sys.executable, "run_game.py", *args, "--results_dir", game_dir, "--result_cache", RESULT_CACHE]
+    if quiet:
+        command.append("--no_print")
+    process = subprocess.run(command)
+    try:
+        with open(os.path.join(game_dir, "bot_results_new_style.txt")) as f:
+            record = json.loads(f.readlines()[-1])
+    except (OSError, IndexError, ValueError):
+        manifest.mark_failed(game, f"run_game.py exited with {process.returncode} without a result")
+        return
+    manifest.mark_done(game, record)
+    shutil.rmtree(game_dir, ignore_errors=True)
+
+
+def run(run_dir=None, workers=1):
+    """Play the games of the run folder not finished yet, in a new run folder by default
+
+    Returns the manifest of the run, whose bot_results*.txt files have every
+    finished game in order.
+    """
+    manifest = TournamentManifest(run_dir if run_dir is not None else create_run_dir(name="analysis"))
+    manifest.add_games(games())
+    pending = manifest.pending()
+    print(f"{manifest.run_dir}: {len(pending)} of {len(manifest.specs)} games to play")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(lambda job: play(manifest, *job, quiet=workers > 1), pending):
+                pass
+    finally:
+        # also after an interruption, so that the results files have every finished game
+        merged = manifest.merge_results()
+        print(f"{merged} games in {manifest.run_dir}, {manifest.counts()}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play the games of the result analysis, resumable after an interruption",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--resume", default=None, metavar="RUN_DIR",
+                        help="Run folder of an interrupted run whose unfinished games are played")
+    parser.add_argument("--workers", type=int, default=1, help="Games played at the same time")
+    args = parser.parse_args()
+    run(args.resume, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import weakref
+from typing import Dict, Optional
+
+from fingerprints import combined_fingerprint, file_fingerprint, kwargs_fingerprints, module_fingerprint, \
+    source_fingerprint
+from results_store import ResultsWriter
+
+# modules whose source decides the outcome of a game besides the players
+ENGINE_MODULES = ("game", "board")
+# data files read by the engine and the players, relative to the codenames folder
+DATA_FILES = ("game_wordpool.txt", "players/cm_wordlist.txt")
+
+
+def engine_fingerprint() -> str:
+    fingerprints = {name: module_fingerprint(name) for name in ENGINE_MODULES}
+    fingerprints.update({path: file_fingerprint(path) for path in DATA_FILES})
+    return combined_fingerprint(fingerprints)
+
+
+def cacheable(seed, clue_deadline_s=None, instrument=False, profiler=None) -> bool:
+    """Whether a game replays to the same outcome: a fixed seed and nothing timed"""
+    return seed != "time" and not isinstance(seed, float) and clue_deadline_s is None \
+        and not instrument and profiler is None
+
+
+class ResultCache:
+    """Content addressed store of game results records
+
+    A game is keyed by the engine source and data files, the class and the
+    source of the module of both players and of the players.* modules it
+    imports, fingerprints of their kwargs (see fingerprints.py, word vectors are
+    hashed by the vectors the game can look up) and the seed, so results are
+    only reused while none of them changed. Editing one bot only invalidates
+    the games it plays.
+
+    Loading the word vectors to fingerprint them can cost more than the game,
+    so the fingerprints of the files the vectors came from are remembered by
+    path, size and modification time.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            record TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT NOT NULL,
+            options TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL,
+            PRIMARY KEY (path, options)
+        );
+    """
+
+    def __init__(self, path: str = "results/result_cache.sqlite"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._engine = engine_fingerprint()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # tournaments and run_game.py processes may share the cache
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(self.SCHEMA)
+        self._finalizer = weakref.finalize(self, self.connection.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._finalizer()
+        self.connection = None
+
+    def key(self, codemaster, cm_fingerprints: Dict[str, str], guesser, g_fingerprints: Dict[str, str], seed) -> str:
+        """Key of a game
+
+        Args:
+            codemaster, guesser: The player classes.
+            cm_fingerprints, g_fingerprints: fingerprints.kwargs_fingerprints of their kwargs.
+            seed: The board seed, an int.
+        """
+        parts = [self._engine,
+                 codemaster.__module__, codemaster.__qualname__, source_fingerprint(codemaster),
+                 combined_fingerprint(cm_fingerprints),
+                 guesser.__module__, guesser.__qualname__, source_fingerprint(guesser),
+                 combined_fingerprint(g_fingerprints),
+                 repr(seed)]
+        return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def game_key(self, codemaster, cm_kwargs: dict, guesser, g_kwargs: dict, seed) -> str:
+        """Key of a game from the player kwargs themselves"""
+        return self.key(codemaster, kwargs_fingerprints(cm_kwargs), guesser, kwargs_fingerprints(g_kwargs), seed)
+
+    def get(self, key: str) -> Optional[dict]:
+        """The results record stored for a game, None if it was never played"""
+        row = self.connection.execute("SELECT record FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, record: dict) -> None:
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO results (key, record, created) VALUES (?, ?, ?)",
+                                    (key, json.dumps(record), time.time()))
+
+    def file_fingerprint(self, path: str, options: str = "") -> Optional[str]:
+        """The remembered fingerprint of the value loaded from a file, None if the file changed since"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        row = self.connection.execute(
+            "SELECT fingerprint FROM files WHERE path = ? AND options = ? AND size = ? AND mtime_ns = ?",
+            (os.path.abspath(path), options, stat.st_size, stat.st_mtime_ns)).fetchone()
+        return None if row is None else row[0]
+
+    def remember_file(self, path: str, fingerprint: str, options: str = "") -> None:
+        """Remember the fingerprint of the value loaded from a file with the loader options
+
+        Names resolved by a loader rather than paths (e.g. the WordNet ic file) are not remembered.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                    (os.path.abspath(path), options, stat.st_size, stat.st_mtime_ns, fingerprint))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else None}
+
+
+def emit_cached_result(record: dict, game_name: str, do_log: bool = True, results_dir: str = "results",
+                       results_store=None) -> dict:
+    """Log a stored results record like Game.write_results does, as a game of game_name"""
+    record = dict(record, game_name=game_name, result_cache_hit=True)
+    if do_log:
+        if results_store is not None:
+            results_store.add(record)
+        else:
+            ResultsWriter(results_dir).write(record)
+    return record
@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import weakref
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows, appends are still done with a single O_APPEND write
+    fcntl = None
+
+# numeric columns of the results table, in the order they are stored
+OUTCOME_COLUMNS = ["seed", "total_turns", "R", "B", "C", "A", "time_s"]
+
+# player names qualified by module, the AICodemaster threshold variants only differ by module
+QUALIFIED_CODEMASTER = "COALESCE(codemaster_module || '.', '') || codemaster"
+QUALIFIED_GUESSER = "COALESCE(guesser_module || '.', '') || guesser"
+
+def create_run_dir(root: str = "results", name: str = "run") -> str:
+    """Create a new, uniquely named results folder for one run inside root
+
+    The folder is created atomically, so concurrent runs never share or
+    clear each other's results.
+    """
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-", dir=root)
+
+
+class ResultsWriter:
+    """Appends results records to the bot_results*.txt files of a results folder
+
+    Safe with several writers (threads, processes or online sessions): every
+    line is written with one O_APPEND write while holding an exclusive lock
+    on the file, so lines never interleave.
+    """
+
+    def __init__(self, results_dir: str = "results"):
+        self.results_dir = results_dir
+        self.old_style_path = os.path.join(results_dir, "bot_results.txt")
+        self.new_style_path = os.path.join(results_dir, "bot_results_new_style.txt")
+
+    def write(self, record: dict) -> None:
+        os.makedirs(self.results_dir, exist_ok=True)
+        append_line(self.old_style_path, self.old_style_line(record))
+        append_line(self.new_style_path, json.dumps(record) + '\n')
+
+    @staticmethod
+    def old_style_line(record: dict) -> str:
+        """Line of a results record in bot_results.txt"""
+        return (f'TOTAL:{record["total_turns"]} B:{record["B"]} C:{record["C"]} A:{record["A"]}'
+                f' R:{record["R"]} CM:{record["codemaster"]} '
+                f'GUESSER:{record["guesser"]} SEED:{record["seed"]}\n')
+
+
+def append_line(path: str, line: str) -> None:
+    """Append line to a file with one O_APPEND write under an exclusive lock, lines of several writers never interleave"""
+    data = line.encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        os.write(fd, data)
+    finally:
+        # closing the descriptor releases the lock
+        os.close(fd)
+
+
+class ResultsStore:
+    """Results sink that buffers game records and writes them to SQLite in batches
+
+    Meant to replace the per-game appends to results/bot_results*.txt for large
+    tournaments. Use as a context manager, or call close() (also done at exit)
+    so that the last partial batch is written.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_name TEXT NOT NULL,
+            codemaster TEXT NOT NULL,
+            guesser TEXT NOT NULL,
+            codemaster_module TEXT,
+            guesser_module TEXT,
+            cm_kwargs TEXT NOT NULL,
+            g_kwargs TEXT NOT NULL,
+            seed REAL,
+            total_turns INTEGER NOT NULL,
+            R INTEGER NOT NULL,
+            B INTEGER NOT NULL,
+            C INTEGER NOT NULL,
+            A INTEGER NOT NULL,
+            time_s REAL
+        );
+        CREATE INDEX IF NOT EXISTS results_config
+            ON results (codemaster, guesser, cm_kwargs, g_kwargs);
+    """
+
+    INSERT = """
+        INSERT INTO results (game_name, codemaster, guesser, codemaster_module, guesser_module,
+                             cm_kwargs, g_kwargs, seed, total_turns, R, B, C, A, time_s)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, path: str = "results/bot_results.sqlite", batch_size: int = 256):
+        """
+        Args:
+            path (str, optional):
+                SQLite database file, created along with its folder if missing.
+            batch_size (int, optional):
+                Number of buffered records that triggers a write.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer: List[tuple] = []
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # several processes may share a store, wait for their transactions instead of failing
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(self.SCHEMA)
+        # buffered records are written when the store is collected or the process exits without close()
+        self._finalizer = weakref.finalize(self, self._write_and_close, self.connection, self.buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, record: dict) -> None:
+        """Buffer a results record as produced by Game, writing the batch when full"""
+        self.buffer.append((
+            record["game_name"], record["codemaster"], record["guesser"],
+            record.get("codemaster_module"), record.get("guesser_module"),
+            json.dumps(record["cm_kwargs"], sort_keys=True), json.dumps(record["g_kwargs"], sort_keys=True),
+            record["seed"], record["total_turns"],
+            record["R"], record["B"], record["C"], record["A"], record["time_s"]
+        ))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered records in a single transaction"""
+        if not self.buffer or self.connection is None:
+            return
+        with self.connection:
+            self.connection.executemany(self.INSERT, self.buffer)
+        self.buffer.clear()
+
+    def close(self) -> None:
+        self._finalizer()
+        self.connection = None
+
+    @classmethod
+    def _write_and_close(cls, connection: sqlite3.Connection, buffer: List[tuple]) -> None:
+        if buffer:
+            with connection:
+                connection.executemany(cls.INSERT, buffer)
+            buffer.clear()
+        connection.close()
+
+    def import_jsonl(self, jsonl_path: str = "results/bot_results_new_style.txt") -> int:
+        """Import a bot_results_new_style.txt file, returns the number of records"""
+        count = 0
+        with open(jsonl_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    self.add(json.loads(line))
+                    count += 1
+        self.flush()
+        return count
+
+
+def load_outcomes(path: str = "results/bot_results.sqlite") -> Dict[Tuple[str, str, str, str], Dict[str, np.ndarray]]:
+    """Load every game of a results store grouped by configuration
+
+    Returns:
+        A dict keyed by (codemaster, guesser, cm_kwargs json, g_kwargs json), where
+        player names are qualified by their module when it was recorded, whose
+        values map each of OUTCOME_COLUMNS, plus "won" (all red words found),
+        to a NumPy array with one entry per game.
+    """
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            f"SELECT {QUALIFIED_CODEMASTER}, {QUALIFIED_GUESSER}, cm_kwargs, g_kwargs, {', '.join(OUTCOME_COLUMNS)} "
+            "FROM results ORDER BY 1, 2, 3, 4, id"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    outcomes = {}
+    if not rows:
+        return outcomes
+
+    keys = [row[:4] for row in rows]
+    values = np.array([row[4:] for row in rows], dtype=np.float64)
+
+    # rows are sorted by configuration, so each configuration is one contiguous slice
+    starts = [0] + [i for i in range(1, len(keys)) if keys[i] != keys[i - 1]] + [len(keys)]
+    for start, end in zip(starts[:-1], starts[1:]):
+        block = values[start:end]
+        columns = {name: block[:, i] for i, name in enumerate(OUTCOME_COLUMNS)}
+        for name in ("total_turns", "R", "B", "C", "A"):
+            columns[name] = columns[name].astype(np.int64)
+        columns["won"] = columns["R"] >= 8
+        outcomes[keys[start]] = columns
+    return outcomes
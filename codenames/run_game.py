@@ -4,7 +4,14 @@ import argparse
 import time
 import os
 
+from clue_memo import ClueMemo
+from fingerprints import value_fingerprint
 from game import Game
+from instrumentation import format_summary
+from profiling import BotProfiler
+from quantization import QUANTIZATION_MODES
+from restricted_vectors import game_vocabulary
+from result_cache import ResultCache, cacheable, emit_cached_result
 from players.guesser import *
 from players.codemaster import *
 
@@ -24,10 +31,28 @@ class GameRun:
         parser.add_argument("--wordnet", help="Name of wordnet file or None, most like ic-brown.dat", default=None)
         parser.add_argument("--glove_cm", help="Path to glove file or None", default=None)
         parser.add_argument("--glove_guesser", help="Path to glove file or None", default=None)
+        parser.add_argument("--quantize", help="Keep the word vectors quantized to save memory",
+                            choices=QUANTIZATION_MODES, default=None)
+        parser.add_argument("--restrict_vocabulary", help="Keep only the vectors of the wordpool and clue "
+                            "words in memory, others are read from a cache of the vector file on demand",
+                            action='store_true', default=False)
 
         parser.add_argument("--no_log", help="Supress logging", action='store_true', default=False)
         parser.add_argument("--no_print", help="Supress printing", action='store_true', default=False)
         parser.add_argument("--game_name", help="Name of game in log", default="default")
+        parser.add_argument("--results_dir", help="Folder the results are appended to", default="results")
+        parser.add_argument("--instrument", help="Time the player calls and engine phases",
+                            action='store_true', default=False)
+        parser.add_argument("--profile", help="Profile the bot methods, by sampling or deterministically",
+                            choices=["sample", "deterministic"], default=None)
+        parser.add_argument("--profile_dir", help="Folder the flame graph profiles are written to",
+                            default="profiles")
+        parser.add_argument("--clue_deadline_s", help="Seconds the codemaster has for each clue",
+                            type=float, default=None)
+        parser.add_argument("--clue_memo", help="JSON file the clues of deterministic codemasters are memoized in",
+                            default=None)
+        parser.add_argument("--result_cache", help="SQLite file of the results of the games already played, "
+                            "a game found in it is not replayed", default=None)
 
         args = parser.parse_args()
 
@@ -37,9 +62,23 @@ class GameRun:
             self._save_stdout = sys.stdout
             sys.stdout = open(os.devnull, 'w')
         self.game_name = args.game_name
+        self.results_dir = args.results_dir
+        self.instrument = args.instrument
+        self.profiler = BotProfiler(args.profile, args.profile_dir) if args.profile else None
+        self.clue_deadline_s = args.clue_deadline_s
+        self.clue_memo = ClueMemo(path=args.clue_memo) if args.clue_memo else None
+
+        # set seed so that board/keygrid can be reloaded later
+        if args.seed == 'time':
+            self.seed = time.time()
+        else:
+            self.seed = int(args.seed)
 
         self.g_kwargs = {}
         self.cm_kwargs = {}
+        # passed to the vector loaders
+        loader_kwargs = {"quantize": args.quantize,
+                         "vocabulary": game_vocabulary() if args.restrict_vocabulary else None}
 
         # load codemaster class
         if args.codemaster == "human":
@@ -57,6 +96,24 @@ class GameRun:
             self.guesser = self.import_string_to_class(args.guesser)
             print('loaded guesser class')
 
+        self.result_cache = None
+        self.result_key = None
+        self.cached_result = None
+        # kwarg name, file and whether the codemaster and the guesser get it, in the order they are loaded below
+        self.resource_files = [("brown_ic", args.wordnet, True, True), ("glove_vecs", args.glove, True, True),
+                               ("word_vectors", args.w2v, True, True), ("glove_vecs", args.glove_cm, True, False),
+                               ("glove_vecs", args.glove_guesser, False, True)]
+        self.loader_options = f"quantize={args.quantize}"
+        if args.result_cache is not None and "human" not in (args.codemaster, args.guesser) \
+                and cacheable(self.seed, self.clue_deadline_s, self.instrument, self.profiler):
+            self.result_cache = ResultCache(args.result_cache)
+            self.result_key = self.key_from_files()
+            if self.result_key is not None:
+                self.cached_result = self.result_cache.get(self.result_key)
+                if self.cached_result is not None:
+                    # the game is not replayed, do not load the vectors
+                    return
+
         # if the game is going to have an ai, load up word vectors
         if sys.argv[1] != "human" or sys.argv[2] != "human":
             if args.wordnet is not None:
@@ -66,32 +123,61 @@ class GameRun:
                 print('loaded wordnet')
 
             if args.glove is not None:
-                glove_vectors = Game.load_glove_vecs(args.glove)
+                glove_vectors = Game.load_glove_vecs(args.glove, **loader_kwargs)
                 self.g_kwargs["glove_vecs"] = glove_vectors
                 self.cm_kwargs["glove_vecs"] = glove_vectors
                 print('loaded glove vectors')
 
             if args.w2v is not None:
-                w2v_vectors = Game.load_w2v(args.w2v)
+                w2v_vectors = Game.load_w2v(args.w2v, **loader_kwargs)
                 self.g_kwargs["word_vectors"] = w2v_vectors
                 self.cm_kwargs["word_vectors"] = w2v_vectors
                 print('loaded word vectors')
 
             if args.glove_cm is not None:
-                glove_vectors = Game.load_glove_vecs(args.glove_cm)
+                glove_vectors = Game.load_glove_vecs(args.glove_cm, **loader_kwargs)
                 self.cm_kwargs["glove_vecs"] = glove_vectors
                 print('loaded glove vectors')
 
             if args.glove_guesser is not None:
-                glove_vectors = Game.load_glove_vecs(args.glove_guesser)
+                glove_vectors = Game.load_glove_vecs(args.glove_guesser, **loader_kwargs)
                 self.g_kwargs["glove_vecs"] = glove_vectors
                 print('loaded glove vectors')
 
-        # set seed so that board/keygrid can be reloaded later
-        if args.seed == 'time':
-            self.seed = time.time()
-        else:
-            self.seed = int(args.seed)
+        if self.result_cache is not None:
+            self.remember_files()
+            if self.result_key is None:
+                self.result_key = self.result_cache.game_key(self.codemaster, self.cm_kwargs,
+                                                             self.guesser, self.g_kwargs, self.seed)
+                self.cached_result = self.result_cache.get(self.result_key)
+
+    def key_from_files(self):
+        """Result cache key computed from the remembered fingerprints of the files, None if one is unknown"""
+        cm_fingerprints, g_fingerprints = {}, {}
+        for name, path, to_codemaster, to_guesser in self.resource_files:
+            if path is None:
+                continue
+            fingerprint = self.result_cache.file_fingerprint(path, self.loader_options)
+            if fingerprint is None:
+                return None
+            if to_codemaster:
+                cm_fingerprints[name] = fingerprint
+            if to_guesser:
+                g_fingerprints[name] = fingerprint
+        return self.result_cache.key(self.codemaster, cm_fingerprints, self.guesser, g_fingerprints, self.seed)
+
+    def remember_files(self):
+        """Remember the fingerprints of the loaded files so that later runs can skip loading them"""
+        cm_kwargs, g_kwargs = dict(self.cm_kwargs), dict(self.g_kwargs)
+        # walk back from the last load so that files overridden by a later one are skipped
+        for name, path, to_codemaster, to_guesser in reversed(self.resource_files):
+            if path is None:
+                continue
+            values = [kwargs.pop(name, None) for kwargs, gets in ((cm_kwargs, to_codemaster), (g_kwargs, to_guesser))
+                      if gets]
+            value = next((value for value in values if value is not None), None)
+            if value is not None:
+                self.result_cache.remember_file(path, value_fingerprint(value), self.loader_options)
 
     def __del__(self):
         """reset stdout if using the do_print==False option"""
@@ -114,6 +200,13 @@ class GameRun:
 if __name__ == "__main__":
     game_setup = GameRun()
 
+    if game_setup.cached_result is not None:
+        results = emit_cached_result(game_setup.cached_result, game_setup.game_name, game_setup.do_log,
+                                     game_setup.results_dir)
+        print(f"Result cache hit: TOTAL:{results['total_turns']} R:{results['R']} B:{results['B']} "
+              f"C:{results['C']} A:{results['A']} SEED:{results['seed']}")
+        sys.exit(0)
+
     game = Game(game_setup.codemaster,
                 game_setup.guesser,
                 seed=game_setup.seed,
@@ -121,6 +214,19 @@ if __name__ == "__main__":
                 do_log=game_setup.do_log,
                 game_name=game_setup.game_name,
                 cm_kwargs=game_setup.cm_kwargs,
-                g_kwargs=game_setup.g_kwargs)
-
-    game.run()
+                g_kwargs=game_setup.g_kwargs,
+                results_dir=game_setup.results_dir,
+                instrument=game_setup.instrument,
+                profiler=game_setup.profiler,
+                clue_deadline_s=game_setup.clue_deadline_s,
+                clue_memo=game_setup.clue_memo)
+
+    results = game.run()
+    if game_setup.result_key is not None and results is not None:
+        game_setup.result_cache.put(game_setup.result_key, results)
+    if game_setup.instrument and results is not None:
+        print(format_summary(results))
+    if game_setup.profiler is not None:
+        print("Profiles written to", ", ".join(game_setup.profiler.write()))
+    if game_setup.clue_memo is not None:
+        game_setup.clue_memo.save()
@@ -2,6 +2,7 @@ import time
 import json
 
 from game import Game
+from results_store import create_run_dir
 from players.codemaster_glove_07 import AICodemaster as cm_glv07
 from players.guesser_glove import AIGuesser as g_glv
 from players.vector_codemaster import VectorCodemaster
@@ -24,8 +25,8 @@ class SharingExample:
     w2v = Game.load_w2v("players/GoogleNews-vectors-negative300.bin")
     print(f"{time.time() - start_time:.2f}s to load w2v")
 
-    print("\nclearing results folder...\n")
-    Game.clear_results()
+    results_dir = create_run_dir(name="simple_example")
+    print(f"\nwriting results to {results_dir}\n")
 
     seed = 0
 
@@ -33,33 +34,38 @@ class SharingExample:
     print("starting original glove_glove game")
     cm_kwargs = {"glove_vecs": glove_100d}
     g_kwargs = {"glove_vecs": glove_50d}
-    Game(cm_glv07, g_glv, seed=seed, do_print=False,  game_name="glv07-glv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs).run()
+    Game(cm_glv07, g_glv, seed=seed, do_print=False,  game_name="glv07-glv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs,
+         results_dir=results_dir).run()
 
     print("starting VectorCodemaster/VectorGuesser glove-glove game")
     cm_kwargs = {"vectors": [glove_100d], "distance_threshold": 0.7, "same_clue_patience": 1, "max_red_words_per_clue": 3}
     g_kwargs = {"vectors": [glove_50d]}
-    Game(VectorCodemaster, VectorGuesser, seed=seed, do_print=False,  game_name="vectorglv07-vectorglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs).run()
+    Game(VectorCodemaster, VectorGuesser, seed=seed, do_print=False,  game_name="vectorglv07-vectorglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs,
+         results_dir=results_dir).run()
 
     #
     print("starting original glovew2v-glovew2v game")
     cm_kwargs = {"glove_vecs": glove_50d,  "word_vectors": w2v}
     g_kwargs = {"glove_vecs": glove_50d,  "word_vectors": w2v}
-    Game(cm_w2vglv07, g_w2vglv, seed=seed, do_print=False,  game_name="w2vglv07-w2vglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs).run()
+    Game(cm_w2vglv07, g_w2vglv, seed=seed, do_print=False,  game_name="w2vglv07-w2vglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs,
+         results_dir=results_dir).run()
 
     print("starting VectorCodemaster/VectorGuesser glovew2v-glovew2v game")
     cm_kwargs = {"vectors": [w2v, glove_50d], "distance_threshold": 0.7, "same_clue_patience": 1, "max_red_words_per_clue": 3}
     g_kwargs = {"vectors": [w2v, glove_50d]}
-    Game(VectorCodemaster, VectorGuesser, seed=seed, do_print=False,  game_name="vectorw2vglv07-vectorw2vglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs).run()
+    Game(VectorCodemaster, VectorGuesser, seed=seed, do_print=False,  game_name="vectorw2vglv07-vectorw2vglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs,
+         results_dir=results_dir).run()
 
     #
     print("starting VectorCodemaster/VectorGuesser gloveglovew2v-gloveglovew2v game")
     cm_kwargs = {"vectors": [w2v, glove_50d, glove_100d], "distance_threshold": 0.7, "same_clue_patience": 1, "max_red_words_per_clue": 3}
     g_kwargs = {"vectors": [w2v, glove_50d, glove_100d]}
-    Game(VectorCodemaster, VectorGuesser, seed=seed, do_print=False,  game_name="vectorw2vglvglv07-vectorw2vglvglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs).run()
+    Game(VectorCodemaster, VectorGuesser, seed=seed, do_print=False,  game_name="vectorw2vglvglv07-vectorw2vglvglv", cm_kwargs=cm_kwargs, g_kwargs=g_kwargs,
+         results_dir=results_dir).run()
 
     # display the results
     print(f"\nfor seed {seed} ~")
-    with open("results/bot_results_new_style.txt") as f:
+    with open(f"{results_dir}/bot_results_new_style.txt") as f:
         for line in f.readlines():
             game_json = json.loads(line.rstrip())
             game_name = game_json["game_name"]
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Tuple
+
+
+class Speculator:
+    """Runs the speculate hooks of the bots on a background thread while the other side is thinking
+
+    start() queues player.speculate(*args, cancelled) calls for the states that
+    may come next, stop() cancels the calls not done yet once the real move has
+    arrived and waits, without blocking the event loop, for the running one to
+    notice. The bots keep what they computed and reuse it if the real state is
+    one of those they prepared.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculation")
+        self._cancelled = threading.Event()
+        self._futures: List = []
+
+    def start(self, calls: Iterable[Tuple[Callable, tuple]]) -> None:
+        """Cancel the previous calls and queue these (speculate method, args) ones in order
+
+        The calls run one at a time, so the new ones only start once a previous
+        call still running has noticed it was cancelled.
+        """
+        self._cancel()
+        self._cancelled = threading.Event()
+        self._futures = [self._executor.submit(self._run, speculate, args, self._cancelled)
+                         for speculate, args in calls]
+
+    @staticmethod
+    def _run(speculate, args, cancelled) -> None:
+        if cancelled.is_set():
+            return
+        try:
+            speculate(*args, cancelled)
+        except Exception:
+            # a failed speculation only costs the time it would have saved
+            traceback.print_exc()
+
+    def _cancel(self) -> List:
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+        futures, self._futures = self._futures, []
+        return futures
+
+    async def stop(self) -> None:
+        """Cancel the queued calls and wait for the running one to return, the bot is free after that"""
+        futures = self._cancel()
+        if futures:
+            await asyncio.wait([asyncio.wrap_future(future) for future in futures])
+
+    async def close(self) -> None:
+        await self.stop()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+CODENAMES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules are imported and read their data files relative to codenames/
+sys.path.insert(0, CODENAMES_DIR)
+
+EMBEDDING_DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def in_codenames_dir(monkeypatch):
+    monkeypatch.chdir(CODENAMES_DIR)
+
+
+def stub_embedding(word):
+    """Deterministic embedding of a word, the same in every request"""
+    seed = int.from_bytes(hashlib.sha1(word.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).normal(size=EMBEDDING_DIM).tolist()
+
+
+class StubEmbeddingsServer(ThreadingHTTPServer):
+    """Local stand-in for the embeddings endpoint that records the inputs of every request"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.requests = []
+        # seconds each response is held back
+        self.delay_s = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/embeddings"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body["input"])
+        time.sleep(self.server.delay_s)
+        data = [{"index": i, "embedding": stub_embedding(word)} for i, word in enumerate(body["input"])]
+        payload = json.dumps({"data": data}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def embeddings_server():
+    server = StubEmbeddingsServer()
+    yield server
+    server.stop()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from conftest import stub_embedding
+from players.ada_guesser import ADAGuesser
+from players.embedding_cache import EmbeddingCache
+
+BOARD = ["APPLE", "BANK", "*Red*", "CAR", "DOG"]
+
+
+def make_guesser(server, cache_dir):
+    return ADAGuesser(api_key="test", api_url=server.url, cache_dir=str(cache_dir), prefetch=False)
+
+
+def test_uncached_words_are_requested_in_one_batch_and_then_hit(embeddings_server, tmp_path):
+    guesser = make_guesser(embeddings_server, tmp_path)
+    guesser.set_board(BOARD)
+    guesser.set_clue("fruit", 1)
+    guesser.get_answer()
+    assert embeddings_server.requests == [["fruit", "APPLE", "BANK", "CAR", "DOG"]]
+
+    guesser.set_clue("fruit", 1)
+    guesser.get_answer()
+    guesser.set_clue("money", 1)
+    guesser.get_answer()
+    # only the new clue misses
+    assert embeddings_server.requests[1:] == [["money"]]
+
+
+def test_answer_matches_the_embeddings(embeddings_server, tmp_path):
+    guesser = make_guesser(embeddings_server, tmp_path)
+    guesser.set_board(BOARD)
+    guesser.set_clue("fruit", 1)
+    clue = np.array(stub_embedding("fruit"))
+
+    def similarity(word):
+        vector = np.array(stub_embedding(word))
+        return vector @ clue / (np.linalg.norm(vector) * np.linalg.norm(clue))
+
+    assert guesser.get_answer() == max(["APPLE", "BANK", "CAR", "DOG"], key=similarity)
+    assert not guesser.keep_guessing()
+
+
+def test_saved_cache_is_reused_by_another_process(embeddings_server, tmp_path):
+    guesser = make_guesser(embeddings_server, tmp_path)
+    guesser.get_embeddings(["fruit", "APPLE"])
+    guesser.cache.save()
+
+    # a fresh cache object reads what the first one saved, as a new process would
+    cache = EmbeddingCache(guesser.model, str(tmp_path))
+    assert cache.missing(["fruit", "APPLE", "BANK"]) == ["BANK"]
+    np.testing.assert_allclose(cache.get_many(["APPLE"])[0], stub_embedding("APPLE"), rtol=1e-6)
+    assert len(embeddings_server.requests) == 1
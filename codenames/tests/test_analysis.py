@@ -0,0 +1,43 @@
+import json
+import sys
+
+import numpy as np
+
+import analysis
+from analysis import ResultsTable
+
+
+def record(seed, total_turns=10, time_s=1.5, codemaster_module="players.codemaster_glove_05"):
+    return {"game_name": "test", "codemaster": "AICodemaster", "guesser": "AIGuesser",
+            "codemaster_module": codemaster_module, "guesser_module": "players.guesser_glove",
+            "cm_kwargs": {}, "g_kwargs": {}, "seed": seed, "total_turns": total_turns,
+            "R": 8, "B": 3, "C": 2, "A": 0, "time_s": time_s}
+
+
+def test_chunk_with_a_partial_line_is_decoded_line_by_line(tmp_path):
+    path = tmp_path / "bot_results_new_style.txt"
+    lines = [json.dumps(record(seed)) for seed in range(5)]
+    # interrupted while writing the last game
+    path.write_text("\n".join(lines) + "\n" + lines[0][:20])
+
+    table = ResultsTable.from_jsonl([str(path)], chunk_lines=4)
+    assert len(table) == 5
+    assert list(table.seeds) == [0, 1, 2, 3, 4]
+
+
+def test_zero_time_is_kept_and_missing_time_is_nan():
+    table = ResultsTable.from_records([record(0, time_s=0), record(1, time_s=None)])
+    assert table.time_s[0] == 0
+    assert np.isnan(table.time_s[1])
+
+
+def test_json_summary_has_null_instead_of_nan(tmp_path, monkeypatch):
+    path = tmp_path / "bot_results_new_style.txt"
+    path.write_text(json.dumps(record(0, time_s=None)) + "\n")
+    output = tmp_path / "summary.json"
+    monkeypatch.setattr(sys, "argv", ["analysis.py", str(path), "--json", str(output), "--bootstrap", "10"])
+    analysis.main()
+
+    text = output.read_text()
+    assert "NaN" not in text
+    assert json.loads(text)["summary"][0]["mean_time_s"] is None
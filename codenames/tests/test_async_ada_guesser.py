@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from conftest import stub_embedding
+from players.async_ada_guesser import AsyncEmbeddingClient, get_async_client
+from players.embedding_cache import EmbeddingCache
+
+
+def make_client(server, cache_dir, autosave_every=256):
+    cache = EmbeddingCache("stub-model", str(cache_dir), autosave_every=autosave_every)
+    return AsyncEmbeddingClient("test", "stub-model", server.url, cache, max_retries=0)
+
+
+def test_cancelling_the_game_that_started_a_request_does_not_cancel_it_for_the_others(embeddings_server, tmp_path):
+    embeddings_server.delay_s = 0.3
+    client = make_client(embeddings_server, tmp_path)
+
+    async def games():
+        first = asyncio.ensure_future(client.get_embeddings(["fruit", "APPLE"]))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(client.get_embeddings(["APPLE", "fruit"]))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        embeddings = await second
+        await client.close()
+        return first, embeddings
+
+    first, embeddings = asyncio.run(games())
+    assert first.cancelled()
+    np.testing.assert_allclose(embeddings, [stub_embedding("APPLE"), stub_embedding("fruit")], rtol=1e-6)
+    assert embeddings_server.requests == [["fruit", "APPLE"]]
+
+
+def test_cache_is_saved_off_the_event_loop(embeddings_server, tmp_path):
+    client = make_client(embeddings_server, tmp_path, autosave_every=2)
+    save = client.cache.save
+    saved_in = []
+
+    def recording_save():
+        saved_in.append(threading.current_thread())
+        save()
+
+    client.cache.save = recording_save
+
+    async def game():
+        await client.get_embeddings(["fruit", "APPLE", "BANK"])
+        await client.close()
+
+    asyncio.run(game())
+    assert saved_in and threading.main_thread() not in saved_in
+    assert EmbeddingCache("stub-model", str(tmp_path)).missing(["fruit", "APPLE", "BANK"]) == []
+
+
+def test_session_of_a_finished_loop_is_closed_when_replaced(embeddings_server, tmp_path):
+    client = make_client(embeddings_server, tmp_path)
+
+    asyncio.run(client.get_embeddings(["fruit"]))
+    first_session = client.session
+    asyncio.run(client.get_embeddings(["APPLE"]))
+
+    assert first_session.closed
+    assert client.session is not first_session
+    assert embeddings_server.requests == [["fruit"], ["APPLE"]]
+    asyncio.run(client.close())
+
+
+def test_clients_are_shared_only_with_the_same_cache_folder_and_settings(tmp_path):
+    client = get_async_client("test", "stub-model", "http://127.0.0.1:1", str(tmp_path / "a"), max_retries=1)
+    assert get_async_client("test", "stub-model", "http://127.0.0.1:1", str(tmp_path / "a"), max_retries=1) is client
+
+    other_folder = get_async_client("test", "stub-model", "http://127.0.0.1:1", str(tmp_path / "b"), max_retries=1)
+    assert other_folder is not client and other_folder.cache is not client.cache
+    other_retries = get_async_client("test", "stub-model", "http://127.0.0.1:1", str(tmp_path / "a"), max_retries=3)
+    assert other_retries is not client and other_retries.max_retries == 3
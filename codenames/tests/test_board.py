@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import board
+from conftest import stub_embedding
+from players.clue_vocabulary import get_clue_vocabulary, get_game_vocabulary
+from players.combined_embeddings import get_combined_embeddings
+from players.distance_cache import get_distance_matrix
+
+
+def test_clue_words_keep_their_ids_and_board_words_get_ids_after_them():
+    vocabulary = get_game_vocabulary()
+    clue_vocabulary = get_clue_vocabulary()
+    assert vocabulary.words[:len(clue_vocabulary)] == clue_vocabulary.words
+    wordpool = board.get_wordpool()
+    ids = vocabulary.ids_of(wordpool)
+    assert (ids >= 0).all()
+    assert [vocabulary.words[i] for i in ids] == [word.lower() for word in wordpool]
+    assert vocabulary.id_of("not a word") == -1
+
+
+def test_board_finds_guesses_by_id():
+    words = list(board.get_wordpool()[:25])
+    game_board = board.Board(words, ["Red"] * 8 + ["Blue"] * 7 + ["Civilian"] * 9 + ["Assassin"])
+    assert game_board.ids.tolist() == get_game_vocabulary().ids_of(words).tolist()
+    assert game_board.position_of(f" {words[3].lower()} ") == 3
+
+    assert game_board.reveal(3) == board.RED
+    assert game_board.revealed_count(board.RED) == 1
+    with pytest.raises(ValueError):
+        game_board.position_of(words[3])
+    with pytest.raises(ValueError):
+        game_board.position_of("not a word")
+
+
+def test_distances_of_ids_are_the_distances_of_the_words(tmp_path):
+    vocabulary = get_game_vocabulary()
+    # one word unknown to the vectors
+    vectors = {word: np.array(stub_embedding(word)) for word in vocabulary.words[1:]}
+    embeddings = get_combined_embeddings((vectors,))
+    assert embeddings.words[:len(vocabulary)] == list(vocabulary.words)
+    distance_matrix = get_distance_matrix(embeddings, cache_dir=str(tmp_path))
+
+    clue = vocabulary.words[5]
+    board_words = [word.lower() for word in board.get_wordpool()[:25]]
+    for word, others in ((board_words[0], list(vocabulary.words[:50]) + board_words),
+                         (clue, board_words + [vocabulary.words[0]])):
+        expected = distance_matrix.distances(word, others)
+        assert distance_matrix.distances_of_ids(vocabulary.ids[word], vocabulary.ids_of(others)).tolist() == \
+            expected.tolist()
+    assert np.isinf(distance_matrix.distances_of_ids(0, vocabulary.ids_of(board_words))).all()
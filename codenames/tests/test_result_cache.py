@@ -0,0 +1,34 @@
+import fingerprints
+import result_cache
+from players.codemaster_glove_07 import AICodemaster
+from players.guesser_glove import AIGuesser
+from result_cache import ResultCache
+
+
+def test_players_modules_imported_by_a_bot_are_found():
+    modules = fingerprints.player_modules(AICodemaster.__module__)
+    assert AICodemaster.__module__ in modules
+    assert {"players.clue_search", "players.clue_vocabulary", "players.codemaster",
+            "players.combined_embeddings", "players.distance_cache"} <= set(modules)
+
+
+def test_editing_an_imported_module_changes_the_key(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    key = cache.key(AICodemaster, {}, AIGuesser, {}, 1)
+
+    module_fingerprint = fingerprints.module_fingerprint
+    monkeypatch.setattr(fingerprints, "module_fingerprint",
+                        lambda name: "edited" if name == "players.clue_search" else module_fingerprint(name))
+    assert cache.key(AICodemaster, {}, AIGuesser, {}, 1) != key
+    cache.close()
+
+
+def test_editing_a_data_file_changes_the_engine_fingerprint(tmp_path, monkeypatch):
+    (tmp_path / "players").mkdir()
+    (tmp_path / "game_wordpool.txt").write_text("apple\nbanana\n")
+    (tmp_path / "players" / "cm_wordlist.txt").write_text("fruit\n")
+    monkeypatch.chdir(tmp_path)
+    fingerprint = result_cache.engine_fingerprint()
+
+    (tmp_path / "players" / "cm_wordlist.txt").write_text("fruit\nyellow\n")
+    assert result_cache.engine_fingerprint() != fingerprint
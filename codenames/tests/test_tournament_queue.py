@@ -0,0 +1,116 @@
+import functools
+import json
+import multiprocessing
+import os
+import time
+from types import SimpleNamespace
+
+import tournament
+from tournament_manifest import DONE, TournamentManifest
+from tournament_queue import Coordinator, JobQueue, _worker_command, run_worker
+
+SEEDS = (1, 2, 3, 4)
+# seed failing on its first game
+FLAKY_SEED = 1
+# seed whose first game is reported after its lease ended
+SLOW_SEED = 2
+LEASE_S = 1.0
+SLOW_S = 3.0
+
+
+def stub_record(seed):
+    return {"game_name": "stub", "codemaster": "StubCodemaster", "guesser": "StubGuesser", "seed": seed,
+            "total_turns": seed, "R": 8, "B": 0, "C": 0, "A": 0, "pid": os.getpid()}
+
+
+def first_time(folder, name) -> bool:
+    """True for the first of all the worker processes asking"""
+    try:
+        os.close(os.open(os.path.join(folder, name), os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return False
+    return True
+
+
+def stub_play_game(folder, matchup, seed, **kwargs):
+    with open(os.path.join(folder, "plays.jsonl"), "a") as f:
+        f.write(json.dumps({"seed": seed, "pid": os.getpid()}) + "\n")
+    if seed == FLAKY_SEED and first_time(folder, "flaky"):
+        raise RuntimeError("flaky game")
+    if seed == SLOW_SEED and first_time(folder, "slow"):
+        time.sleep(SLOW_S)
+    return stub_record(seed)
+
+
+def add_games(manifest):
+    return manifest.add_games([tournament.SequentialTournament.game_spec("stub", seed) for seed in SEEDS])
+
+
+def test_workers_retry_failed_and_expired_games_and_results_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(tournament, "MATCHUP_GROUPS", {"stub": [SimpleNamespace(name="stub")]})
+    monkeypatch.setattr(tournament, "play_game", functools.partial(stub_play_game, str(tmp_path)))
+    manifest = TournamentManifest(str(tmp_path / "run"))
+    games = add_games(manifest)
+    queue = JobQueue(manifest, lease_s=LEASE_S)
+    coordinator = Coordinator(queue, port=0, token="secret")
+    port = coordinator.server_address[1]
+
+    # forked, the workers see the stub matchup and play_game
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=("127.0.0.1", port, "secret", f"worker{i}"))
+               for i in range(2)]
+    for worker in workers:
+        worker.start()
+    try:
+        coordinator.serve_until_finished(poll_s=0.1)
+    finally:
+        for worker in workers:
+            worker.join(30)
+            if worker.is_alive():
+                worker.kill()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    assert manifest.counts()[DONE] == len(SEEDS)
+    plays = [json.loads(line) for line in (tmp_path / "plays.jsonl").read_text().splitlines()]
+    # the flaky game failed once and was played again
+    assert [play["seed"] for play in plays].count(FLAKY_SEED) == 2
+    assert manifest.attempts[games[SEEDS.index(FLAKY_SEED)]] == 2
+    # the slow game was handed to the other worker once its lease ended, and its record kept
+    slow = [play["pid"] for play in plays if play["seed"] == SLOW_SEED]
+    assert len(slow) == 2 and slow[0] != slow[1]
+    assert manifest.record(games[SEEDS.index(SLOW_SEED)])["pid"] == slow[1]
+
+    assert manifest.merge_results() == len(SEEDS)
+    merged = (tmp_path / "run" / "bot_results_new_style.txt").read_text().splitlines()
+    assert [json.loads(line)["seed"] for line in merged] == list(SEEDS)
+
+
+def test_games_given_up_are_tried_again_on_resume(tmp_path):
+    manifest = TournamentManifest(str(tmp_path))
+    games = add_games(manifest)
+    for game in games[1:]:
+        manifest.mark_done(game, stub_record(0))
+
+    queue = JobQueue(manifest, max_attempts=2)
+    for _ in range(2):
+        assert queue.lease("worker")["id"] == games[0]
+        queue.fail(games[0], "RuntimeError")
+    assert queue.all_finished.is_set()
+
+    resumed = JobQueue(TournamentManifest(str(tmp_path)), max_attempts=2)
+    assert not resumed.all_finished.is_set()
+    assert resumed.lease("worker")["id"] == games[0]
+
+
+def test_local_workers_get_the_options_of_the_coordinator():
+    args = SimpleNamespace(token="secret", quantize="float16", restrict_vocabulary=True, no_result_cache=False,
+                           result_cache="elsewhere/cache.sqlite")
+    command = _worker_command(args, 1234)
+    assert command[command.index("--port") + 1] == "1234"
+    assert command[command.index("--token") + 1] == "secret"
+    assert command[command.index("--quantize") + 1] == "float16"
+    assert "--restrict_vocabulary" in command
+    assert command[command.index("--result_cache") + 1] == "elsewhere/cache.sqlite"
+
+    command = _worker_command(SimpleNamespace(**dict(vars(args), no_result_cache=True)), 1234)
+    assert "--no_result_cache" in command and "--result_cache" not in command
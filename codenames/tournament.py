@@ -0,0 +1,365 @@
+import argparse
+import itertools
+import math
+import time
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from clue_memo import ClueMemo
+from game import Game
+from instrumentation import add_hook, slow_call_hook
+from profiling import BotProfiler
+from quantization import QUANTIZATION_MODES
+from result_cache import ResultCache, cacheable, emit_cached_result
+from restricted_vectors import game_vocabulary
+from player_config import player_config, resource
+from results_store import create_run_dir
+from tournament_manifest import TournamentManifest, job_id
+
+# seeds used by result_analysis_script.py: 100, 150, 200, ...
+DEFAULT_SEEDS = [100 + 50 * i for i in range(200)]
+
+
+class Matchup:
+    """A codemaster/guesser pairing taking part in a tournament"""
+
+    def __init__(self, name: str, codemaster: player_config, guesser: player_config):
+        self.name = name
+        self.codemaster = codemaster
+        self.guesser = guesser
+        self._loaded = None
+
+    def load(self):
+        """Return (codemaster class, cm_kwargs, guesser class, g_kwargs), loading resources once"""
+        if self._loaded is None:
+            cm_class, cm_kwargs = self.codemaster.load()
+            g_class, g_kwargs = self.guesser.load()
+            self._loaded = (cm_class, cm_kwargs, g_class, g_kwargs)
+        return self._loaded
+
+
+def play_game(matchup: Matchup, seed, results_dir: str = "results", do_log: bool = True,
+              instrument: bool = False, profiler: Optional[BotProfiler] = None,
+              clue_deadline_s: Optional[float] = None, clue_memo: Optional[ClueMemo] = None,
+              result_cache: Optional[ResultCache] = None) -> dict:
+    """Play one headless game and return its results record
+
+    With a result cache, a game played before with the same players, kwargs
+    and seed is not replayed, its stored record is logged and returned.
+    """
+    cm_class, cm_kwargs, g_class, g_kwargs = matchup.load()
+    key = None
+    if result_cache is not None and cacheable(seed, clue_deadline_s, instrument, profiler):
+        key = result_cache.game_key(cm_class, cm_kwargs, g_class, g_kwargs, seed)
+        record = result_cache.get(key)
+        if record is not None:
+            return emit_cached_result(record, matchup.name, do_log, results_dir)
+
+    record = Game(cm_class, g_class, seed=seed, do_print=False, do_log=do_log, game_name=matchup.name,
+                  cm_kwargs=cm_kwargs, g_kwargs=g_kwargs, results_dir=results_dir, instrument=instrument,
+                  profiler=profiler, clue_deadline_s=clue_deadline_s, clue_memo=clue_memo).run()
+    if key is not None:
+        result_cache.put(key, record)
+    return record
+
+
+def score_of(record: dict, metric: str) -> float:
+    """Score of a game, higher is better
+
+    "turns" scores a game by minus its number of turns (a loss counts as 25),
+    "win" scores 1 for a win and 0 for a loss.
+    """
+    if metric == "win":
+        return float(record["R"] >= 8)
+    return -float(record["total_turns"])
+
+
+class SequentialTournament:
+    """Tournament that stops playing a matchup once its ranking is settled
+
+    All active matchups play the same seeds in rounds of batch_size games. After
+    each round every pair of active matchups is tested on its paired per-seed
+    score differences; a pair is settled once the confidence interval of the
+    mean difference excludes zero. The confidence level is Bonferroni corrected
+    for the number of pairs and rounds, so the repeated looks keep the overall
+    error rate below 1 - confidence. A matchup whose pairs are all settled stops
+    playing, and the rest of the budget goes to the close matchups.
+    """
+
+    def __init__(self, matchups: List[Matchup], seeds: Optional[List] = None, batch_size: int = 5,
+                 min_games: int = 10, max_games: int = 30, budget: Optional[int] = None,
+                 confidence: float = 0.95, metric: str = "turns", results_dir: Optional[str] = None,
+                 instrument: bool = False, profiler: Optional[BotProfiler] = None,
+                 clue_deadline_s: Optional[float] = None, clue_memo: Optional[ClueMemo] = None,
+                 result_cache: Optional[ResultCache] = None, manifest: Optional[TournamentManifest] = None):
+        """
+        Args:
+            matchups: The matchups to rank.
+            seeds: Seeds to play in order, defaults to 100, 150, 200, ...
+            batch_size: Games each active matchup plays per round.
+            min_games: Games a matchup plays before any of its pairs can settle.
+            max_games: Games after which a matchup stops regardless.
+            budget: Maximum total number of games, unlimited by default.
+            confidence: Overall confidence of the settled rankings.
+            metric: "turns" or "win", see score_of.
+            results_dir: Results folder, a new run folder is created by default.
+            instrument: Whether to record per-phase timings in the results records.
+            profiler: Profiler of the bot methods of every game.
+            clue_deadline_s: Seconds the codemasters have for each clue, unlimited by default.
+            clue_memo: Memo of the clues of the deterministic codemasters, shared by every game.
+            result_cache: Results of the games played by earlier runs, which are not replayed.
+            manifest: Completion state of the games, usually of the results folder. Games it
+                has finished are taken from it, so an interrupted tournament resumes where it
+                stopped, and the results files are written from it after every round.
+        """
+        assert len(set(m.name for m in matchups)) == len(matchups), "matchup names must be unique"
+        self.matchups = matchups
+        self.seeds = (seeds if seeds is not None else DEFAULT_SEEDS)[:max_games]
+        self.batch_size = batch_size
+        self.min_games = min_games
+        self.max_games = min(max_games, len(self.seeds))
+        self.budget = budget
+        self.metric = metric
+        self.results_dir = results_dir if results_dir is not None else create_run_dir(name="tournament")
+        self.instrument = instrument
+        self.profiler = profiler
+        self.clue_deadline_s = clue_deadline_s
+        self.clue_memo = clue_memo
+        self.result_cache = result_cache
+        self.manifest = manifest
+
+        n_pairs = max(1, len(matchups) * (len(matchups) - 1) // 2)
+        n_rounds = max(1, math.ceil(self.max_games / batch_size))
+        self.z = NormalDist().inv_cdf(1 - (1 - confidence) / (2 * n_pairs * n_rounds))
+
+        self.scores: Dict[str, Dict] = {m.name: {} for m in matchups}
+        self.settled_pairs: Dict[Tuple[str, str], float] = {}
+        self.active = [m.name for m in matchups]
+        self.games_played = 0
+
+    def record(self, name: str, result: dict) -> None:
+        """Record the result of a game played by a matchup"""
+        self.scores[name][result["seed"]] = score_of(result, self.metric)
+        self.games_played += 1
+
+    def pair_difference(self, a: str, b: str) -> Tuple[float, float, int]:
+        """Return the mean paired score difference a - b, its interval half width and the number of pairs"""
+        seeds = [seed for seed in self.scores[a] if seed in self.scores[b]]
+        if len(seeds) < 2:
+            return 0.0, np.inf, len(seeds)
+        diffs = np.array([self.scores[a][seed] - self.scores[b][seed] for seed in seeds])
+        half_width = self.z * diffs.std(ddof=1) / math.sqrt(len(diffs))
+        return float(diffs.mean()), half_width, len(diffs)
+
+    def update_settled(self) -> None:
+        """Settle pairs whose order is known and retire matchups with only settled pairs"""
+        for a, b in itertools.combinations(self.active, 2):
+            if (a, b) in self.settled_pairs:
+                continue
+            mean, half_width, n = self.pair_difference(a, b)
+            if n >= self.min_games and abs(mean) > half_width:
+                self.settled_pairs[(a, b)] = mean
+                self.settled_pairs[(b, a)] = -mean
+
+        still_active = []
+        for name in self.active:
+            others = [m.name for m in self.matchups if m.name != name]
+            done = len(self.scores[name]) >= self.max_games
+            if not done and all((name, other) in self.settled_pairs for other in others):
+                print(f"{name} settled after {len(self.scores[name])} games")
+                done = True
+            if not done:
+                still_active.append(name)
+        self.active = still_active
+
+    def remaining_budget(self) -> float:
+        return np.inf if self.budget is None else self.budget - self.games_played
+
+    def run(self) -> List[dict]:
+        """Play rounds until every matchup is settled, out of seeds or out of budget"""
+        matchups = {m.name: m for m in self.matchups}
+        start_time = time.time()
+        try:
+            while self.active and self.remaining_budget() > 0:
+                n_played = min(len(self.scores[name]) for name in self.active)
+                round_seeds = self.seeds[n_played:n_played + self.batch_size]
+                if self.manifest is not None:
+                    self.manifest.add_games([self.game_spec(name, seed)
+                                             for seed in round_seeds for name in self.active])
+                for seed in round_seeds:
+                    for name in self.active:
+                        if seed in self.scores[name] or self.remaining_budget() <= 0:
+                            continue
+                        self.record(name, self.play(matchups[name], seed))
+                print(f"round done: {self.games_played} games, {len(self.active)} active matchups, "
+                      f"{time.time() - start_time:.1f}s")
+                self.update_settled()
+                if self.manifest is not None:
+                    self.manifest.merge_results()
+        finally:
+            if self.manifest is not None:
+                self.manifest.merge_results()
+        return self.standings()
+
+    @staticmethod
+    def game_spec(name: str, seed) -> dict:
+        return {"matchup": name, "seed": seed}
+
+    def play(self, matchup: Matchup, seed) -> dict:
+        """Play a game, or return its record if the manifest has it from an interrupted session"""
+        if self.manifest is not None:
+            game = job_id(self.game_spec(matchup.name, seed))
+            record = self.manifest.record(game)
+            if record is not None:
+                return record
+        record = play_game(matchup, seed, self.results_dir, do_log=self.manifest is None,
+                           instrument=self.instrument, profiler=self.profiler, clue_deadline_s=self.clue_deadline_s,
+                           clue_memo=self.clue_memo, result_cache=self.result_cache)
+        if self.manifest is not None:
+            self.manifest.mark_done(game, record)
+        return record
+
+    def standings(self) -> List[dict]:
+        """Matchups ranked by mean score, with the comparisons that were settled"""
+        rows = []
+        for m in self.matchups:
+            scores = list(self.scores[m.name].values())
+            rows.append({
+                "name": m.name,
+                "games": len(scores),
+                "mean_score": float(np.mean(scores)) if scores else np.nan,
+                "settled_better_than": sorted(b for (a, b), mean in self.settled_pairs.items()
+                                              if a == m.name and mean > 0),
+                "settled_worse_than": sorted(b for (a, b), mean in self.settled_pairs.items()
+                                             if a == m.name and mean < 0),
+            })
+        return sorted(rows, key=lambda row: -row["mean_score"] if not np.isnan(row["mean_score"]) else np.inf)
+
+
+##### Tournament configuration #####
+
+# None or a mode of quantization.QUANTIZATION_MODES, set by --quantize
+QUANTIZE = None
+# None or the words whose vectors are kept in memory, set by --restrict_vocabulary
+VOCABULARY = None
+
+
+def configure_vectors(quantize: Optional[str] = None, restrict_vocabulary: bool = False) -> None:
+    """Set how the matchups load their vectors, before any of them is loaded"""
+    global QUANTIZE, VOCABULARY
+    QUANTIZE = quantize
+    VOCABULARY = game_vocabulary() if restrict_vocabulary else None
+
+
+def _w2v():
+    return resource(f"w2v-{QUANTIZE}-{VOCABULARY is not None}", Game.load_w2v,
+                    "players/GoogleNews-vectors-negative300.bin", quantize=QUANTIZE, vocabulary=VOCABULARY).get()
+
+
+def _glove_300d():
+    return resource(f"glove300-{QUANTIZE}-{VOCABULARY is not None}", Game.load_glove_vecs,
+                    "players/glove/glove.6B.300d.txt", quantize=QUANTIZE, vocabulary=VOCABULARY).get()
+
+
+def _ai_player(role, module, kwargs):
+    return player_config(role=role, name=module, root=None, module=f"players.{module}",
+                         classname="AICodemaster" if role == "codemaster" else "AIGuesser", kwargs=kwargs)
+
+
+W2VGLOVE_GUESSER = _ai_player("guesser", "guesser_w2vglove",
+                              lambda: {"word_vectors": _w2v(), "glove_vecs": _glove_300d()})
+
+
+def _threshold_matchups(family, kwargs):
+    return [Matchup(f"codemaster_{family}_{threshold}+guesser_w2vglove",
+                    _ai_player("codemaster", f"codemaster_{family}_{threshold}", kwargs),
+                    W2VGLOVE_GUESSER)
+            for threshold in ("03", "05", "07")]
+
+
+# groups of matchups mirroring result_analysis_script.py
+MATCHUP_GROUPS = {
+    "w2v_thresholds": _threshold_matchups("w2v", lambda: {"word_vectors": _w2v()}),
+    "glove300_thresholds": _threshold_matchups("glove", lambda: {"glove_vecs": _glove_300d()}),
+    "w2vglove300_thresholds": _threshold_matchups(
+        "w2vglove", lambda: {"word_vectors": _w2v(), "glove_vecs": _glove_300d()}),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank matchups with as few games as possible.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("groups", nargs="+", choices=sorted(MATCHUP_GROUPS), help="Matchup groups to rank together")
+    parser.add_argument("--batch_size", type=int, default=5, help="Games per matchup per round")
+    parser.add_argument("--min_games", type=int, default=10, help="Games before a comparison can settle")
+    parser.add_argument("--max_games", type=int, default=30, help="Games after which a matchup stops")
+    parser.add_argument("--budget", type=int, default=None, help="Maximum total number of games")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence of the settled rankings")
+    parser.add_argument("--metric", choices=["turns", "win"], default="turns", help="Score used to rank matchups")
+    parser.add_argument("--instrument", action="store_true", help="Record per-phase timings in the results")
+    parser.add_argument("--slow_call_s", type=float, default=None,
+                        help="Report bot calls slower than this many seconds (implies --instrument)")
+    parser.add_argument("--profile", choices=["sample", "deterministic"], default=None,
+                        help="Profile the bot methods, by sampling or deterministically")
+    parser.add_argument("--profile_dir", default="profiles", help="Folder the flame graph profiles are written to")
+    parser.add_argument("--quantize", choices=QUANTIZATION_MODES, default=None,
+                        help="Keep the word vectors quantized to save memory")
+    parser.add_argument("--restrict_vocabulary", action="store_true",
+                        help="Keep only the vectors of the wordpool and clue words in memory")
+    parser.add_argument("--clue_deadline_s", type=float, default=None,
+                        help="Seconds the codemasters have for each clue, bounds the tournament wall clock")
+    parser.add_argument("--clue_memo", default=None,
+                        help="JSON file the clues of the deterministic codemasters are memoized in across runs")
+    parser.add_argument("--clue_memo_size", type=int, default=100000,
+                        help="Clues kept in the memo, the least recently used are dropped")
+    parser.add_argument("--no_clue_memo", action="store_true", help="Ask the codemasters for every clue")
+    parser.add_argument("--result_cache", default="results/result_cache.sqlite",
+                        help="SQLite file of the results of the games already played, which are not replayed")
+    parser.add_argument("--no_result_cache", action="store_true", help="Play every game")
+    parser.add_argument("--resume", default=None, metavar="RUN_DIR",
+                        help="Results folder of an interrupted tournament to resume, with the same arguments")
+    args = parser.parse_args()
+
+    configure_vectors(args.quantize, args.restrict_vocabulary)
+
+    if args.slow_call_s is not None:
+        add_hook(slow_call_hook(args.slow_call_s))
+
+    matchups = [m for group in args.groups for m in MATCHUP_GROUPS[group]]
+    results_dir = args.resume if args.resume is not None else create_run_dir(name="tournament")
+    tournament = SequentialTournament(matchups, batch_size=args.batch_size, min_games=args.min_games,
+                                      max_games=args.max_games, budget=args.budget,
+                                      confidence=args.confidence, metric=args.metric,
+                                      instrument=args.instrument or args.slow_call_s is not None,
+                                      profiler=BotProfiler(args.profile, args.profile_dir) if args.profile else None,
+                                      clue_deadline_s=args.clue_deadline_s,
+                                      clue_memo=None if args.no_clue_memo else ClueMemo(args.clue_memo_size,
+                                                                                        args.clue_memo),
+                                      result_cache=None if args.no_result_cache else ResultCache(args.result_cache),
+                                      results_dir=results_dir, manifest=TournamentManifest(results_dir))
+    print(f"Writing results to {tournament.results_dir}")
+    standings = tournament.run()
+    if tournament.profiler is not None:
+        print("Profiles written to", ", ".join(tournament.profiler.write()))
+    if tournament.result_cache is not None:
+        print("Result cache:", tournament.result_cache.stats())
+    if tournament.clue_memo is not None:
+        print("Clue memo:", tournament.clue_memo.stats())
+        if tournament.clue_memo.path is not None:
+            tournament.clue_memo.save()
+
+    fixed_design = len(matchups) * tournament.max_games
+    print(f"\n{tournament.games_played} games played ({fixed_design} with a fixed design)\n")
+    for row in standings:
+        print(f"{row['name']}: games={row['games']} mean_score={row['mean_score']:.2f}")
+        if row["settled_better_than"]:
+            print(f"    better than {', '.join(row['settled_better_than'])}")
+        if row["settled_worse_than"]:
+            print(f"    worse than {', '.join(row['settled_worse_than'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from results_store import ResultsWriter, append_line
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_id(spec) -> str:
+    """Stable id of a game of a tournament, spec being any JSON value naming its players and seed"""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def write_atomically(path: str, data: str) -> None:
+    """Replace the file at path with data, readers see the old or the new file, never a partial one"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class TournamentManifest:
+    """Completion state of every game of a tournament run, kept in its run folder
+
+    manifest.json lists the games (id and spec) and is replaced atomically when
+    games are added. progress.jsonl gets one line per finished or failed game,
+    appended with a single locked write (see results_store.append_line), so a
+    crash loses at most the games being played and several processes can report
+    to the same run. A partial last line left by a crash is ignored. The last
+    line of a game decides its state, failed games are played again on resume.
+    """
+
+    MANIFEST = "manifest.json"
+    PROGRESS = "progress.jsonl"
+    VERSION = 1
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.manifest_path = os.path.join(run_dir, self.MANIFEST)
+        self.progress_path = os.path.join(run_dir, self.PROGRESS)
+        self.specs: Dict[str, object] = {}
+        self.states: Dict[str, str] = {}
+        self.records: Dict[str, dict] = {}
+        self.attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        os.makedirs(run_dir, exist_ok=True)
+        self.reload()
+
+    def reload(self) -> None:
+        """Read the manifest and the progress of the run folder again"""
+        with self._lock:
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest.get("version") != self.VERSION:
+                    raise ValueError(f"{self.manifest_path} has version {manifest.get('version')}, "
+                                     f"expected {self.VERSION}")
+                self.specs = {entry["id"]: entry["spec"] for entry in manifest["games"]}
+            self.states = {game: PENDING for game in self.specs}
+            self.records = {}
+            self.attempts = {}
+            if os.path.exists(self.progress_path):
+                with open(self.progress_path) as f:
+                    lines = f.readlines()
+                for line in lines:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # partial line of an interrupted write
+                        continue
+                    self._apply(entry)
+                if lines and not lines[-1].endswith("\n"):
+                    # end the partial line so that the next report starts a line of its own
+                    append_line(self.progress_path, "\n")
+
+    def _apply(self, entry: dict) -> None:
+        game = entry["id"]
+        self.states[game] = entry["state"]
+        self.attempts[game] = self.attempts.get(game, 0) + 1
+        if entry["state"] == DONE:
+            self.records[game] = entry["record"]
+        else:
+            self.records.pop(game, None)
+
+    def add_games(self, specs: List) -> List[str]:
+        """Add the games not in the manifest yet, returns the ids of all of specs in order"""
+        ids = [job_id(spec) for spec in specs]
+        with self._lock:
+            new = [(game, spec) for game, spec in zip(ids, specs) if game not in self.specs]
+            if new:
+                for game, spec in new:
+                    self.specs[game] = spec
+                    self.states.setdefault(game, PENDING)
+                games = [{"id": game, "spec": spec} for game, spec in self.specs.items()]
+                write_atomically(self.manifest_path, json.dumps({"version": self.VERSION, "games": games}, indent=1))
+        return ids
+
+    def state(self, game: str) -> str:
+        return self.states.get(game, PENDING)
+
+    def record(self, game: str) -> Optional[dict]:
+        """Results record of a finished game, None otherwise"""
+        return self.records.get(game)
+
+    def pending(self) -> List[Tuple[str, object]]:
+        """(id, spec) of the games not finished yet, failed ones included, in manifest order"""
+        return [(game, spec) for game, spec in self.specs.items() if self.states.get(game) != DONE]
+
+    def mark_done(self, game: str, record: dict) -> None:
+        self._report({"id": game, "state": DONE, "record": record, "time": time.time()})
+
+    def mark_failed(self, game: str, error: str) -> None:
+        self._report({"id": game, "state": FAILED, "error": error, "time": time.time()})
+
+    def _report(self, entry: dict) -> None:
+        append_line(self.progress_path, json.dumps(entry) + "\n")
+        with self._lock:
+            self._apply(entry)
+
+    def game_dir(self, game: str) -> str:
+        """Folder of the files of one game, for games played by another process"""
+        return os.path.join(self.run_dir, "games", game)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        for game in self.specs:
+            counts[self.states.get(game, PENDING)] += 1
+        return counts
+
+    def merge_results(self) -> int:
+        """Write the bot_results*.txt files of the run folder from the finished games
+
+        Games are written in manifest order whichever process or session played
+        them, and the files are replaced atomically, so merging again after a
+        resume gives the same files as an uninterrupted run. Returns the number
+        of games written.
+        """
+        records = [self.records[game] for game in self.specs if game in self.records]
+        write_atomically(os.path.join(self.run_dir, "bot_results.txt"),
+                         "".join(ResultsWriter.old_style_line(record) for record in records))
+        write_atomically(os.path.join(self.run_dir, "bot_results_new_style.txt"),
+                         "".join(json.dumps(record) + "\n" for record in records))
+        return len(records)
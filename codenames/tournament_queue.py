@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from clue_memo import ClueMemo
+from result_cache import ResultCache
+from results_store import create_run_dir
+from tournament_manifest import DONE, TournamentManifest
+import tournament
+
+DEFAULT_PORT = 8765
+
+
+def send(wfile, message: dict) -> None:
+    wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+    wfile.flush()
+
+
+def receive(rfile) -> Optional[dict]:
+    """Next message of a connection, None once it is closed"""
+    line = rfile.readline()
+    return json.loads(line) if line else None
+
+
+class JobQueue:
+    """Games of a manifest handed out to workers
+
+    A game is leased to one worker at a time. The lease ends when the worker
+    reports the game, disconnects, or has not reported it after lease_s, and the
+    game is then handed out again. Failed games are retried until they have
+    failed max_attempts times in this session. The manifest is the only record
+    of what finished, so a coordinator restarted on the same run folder resumes
+    the tournament and tries the games that failed before again.
+    """
+
+    def __init__(self, manifest: TournamentManifest, lease_s: float = 3600, max_attempts: int = 2):
+        self.manifest = manifest
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        # game -> (worker, time the lease ends)
+        self.leases: Dict[str, Tuple[str, float]] = {}
+        # game -> failures in this session, the failures of earlier sessions in the manifest do not count
+        self.failures: Dict[str, int] = {}
+        # connected workers
+        self.workers = set()
+        self.all_finished = threading.Event()
+        self._lock = threading.Lock()
+        self._check_finished()
+
+    def _gave_up(self, game: str) -> bool:
+        return self.failures.get(game, 0) >= self.max_attempts
+
+    def _check_finished(self) -> None:
+        if all(self.manifest.state(game) == DONE or self._gave_up(game) for game in self.manifest.specs):
+            self.all_finished.set()
+
+    def lease(self, worker: str) -> dict:
+        """The next message for a worker asking for a game: a job, wait or done"""
+        with self._lock:
+            if self.all_finished.is_set():
+                return {"type": "done"}
+            now = time.monotonic()
+            for game, spec in self.manifest.pending():
+                leased = self.leases.get(game)
+                if self._gave_up(game) or (leased is not None and leased[1] > now):
+                    continue
+                self.leases[game] = (worker, now + self.lease_s)
+                return {"type": "job", "id": game, "spec": spec}
+            # every game left is being played, one may still be handed back
+            return {"type": "wait", "s": 1.0}
+
+    def complete(self, game: str, record: dict) -> None:
+        with self._lock:
+            self.leases.pop(game, None)
+            # a game whose lease expired can be reported twice, keep the first record
+            if self.manifest.state(game) != DONE:
+                self.manifest.mark_done(game, record)
+            self._check_finished()
+
+    def fail(self, game: str, error: str) -> None:
+        with self._lock:
+            self.leases.pop(game, None)
+            if self.manifest.state(game) != DONE:
+                self.manifest.mark_failed(game, error)
+                self.failures[game] = self.failures.get(game, 0) + 1
+            self._check_finished()
+
+    def connect(self, worker: str) -> None:
+        with self._lock:
+            self.workers.add(worker)
+
+    def release(self, worker: str) -> None:
+        """Hand the games of a disconnected worker out again"""
+        with self._lock:
+            self.workers.discard(worker)
+            for game in [game for game, (owner, _) in self.leases.items() if owner == worker]:
+                del self.leases[game]
+
+
+class _WorkerConnection(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        queue: JobQueue = self.server.queue
+        hello = receive(self.rfile)
+        if hello is None or hello.get("type") != "hello" or hello.get("token") != self.server.token:
+            send(self.wfile, {"type": "error", "error": "unknown worker"})
+            return
+        worker = f"{hello.get('worker')}@{self.client_address[0]}:{self.client_address[1]}"
+        queue.connect(worker)
+        print(f"worker {worker} connected")
+        try:
+            while True:
+                message = receive(self.rfile)
+                if message is None:
+                    break
+                if message["type"] == "result":
+                    queue.complete(message["id"], message["record"])
+                elif message["type"] == "failed":
+                    print(f"{worker} failed {message['id']}: {message['error']}")
+                    queue.fail(message["id"], message["error"])
+                else:
+                    reply = queue.lease(worker)
+                    send(self.wfile, reply)
+                    if reply["type"] == "done":
+                        break
+        except (OSError, ValueError):
+            pass
+        finally:
+            queue.release(worker)
+            print(f"worker {worker} disconnected")
+
+
+class Coordinator(socketserver.ThreadingTCPServer):
+    """TCP server handing the games of a JobQueue to workers, one thread per worker
+
+    The protocol is one JSON object per line. A worker sends hello with the
+    token, then asks for games with get and reports each with result or failed.
+    Only run it on a trusted network, the token only keeps stray workers out.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, queue: JobQueue, host: str = "127.0.0.1", port: int = DEFAULT_PORT, token: str = ""):
+        super().__init__((host, port), _WorkerConnection)
+        self.queue = queue
+        self.token = token
+
+    def serve_until_finished(self, poll_s: float = 0.5, keep_serving: Callable[[], bool] = lambda: True) -> None:
+        """Serve workers until every game is finished or given up, or keep_serving() is False"""
+        thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": poll_s}, daemon=True)
+        thread.start()
+        try:
+            while not self.queue.all_finished.wait(poll_s):
+                if not keep_serving():
+                    print("No worker left, stopping")
+                    break
+        finally:
+            self.shutdown()
+            self.server_close()
+            thread.join()
+
+
+def matchups_by_name() -> Dict[str, "tournament.Matchup"]:
+    return {m.name: m for group in tournament.MATCHUP_GROUPS.values() for m in group}
+
+
+def run_worker(host: str = "127.0.0.1", port: int = DEFAULT_PORT, token: str = "", name: Optional[str] = None,
+               result_cache: Optional[ResultCache] = None, connect_timeout_s: float = 60) -> int:
+    """Play games of a coordinator until it has none left, returns the number of games played
+
+    Each matchup loads its vectors once, on its first game, and keeps them for
+    the next ones.
+    """
+    name = name if name is not None else f"{socket.gethostname()}-{os.getpid()}"
+    deadline = time.monotonic() + connect_timeout_s
+    while True:
+        try:
+            connection = socket.create_connection((host, port))
+            break
+        except OSError:
+            # the coordinator may still be starting
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    matchups = matchups_by_name()
+    clue_memo = ClueMemo()
+    played = 0
+    with connection, connection.makefile("rb") as rfile, connection.makefile("wb") as wfile:
+        send(wfile, {"type": "hello", "worker": name, "token": token})
+        while True:
+            send(wfile, {"type": "get"})
+            message = receive(rfile)
+            if message is None or message["type"] in ("done", "error"):
+                if message is not None and message["type"] == "error":
+                    print(f"coordinator refused worker {name}: {message['error']}")
+                return played
+            if message["type"] == "wait":
+                time.sleep(message["s"])
+                continue
+            spec = message["spec"]
+            try:
+                record = tournament.play_game(matchups[spec["matchup"]], spec["seed"], do_log=False,
+                                              clue_memo=clue_memo, result_cache=result_cache)
+            except Exception as e:
+                send(wfile, {"type": "failed", "id": message["id"], "error": f"{type(e).__name__}: {e}"})
+                continue
+            send(wfile, {"type": "result", "id": message["id"], "record": record})
+            played += 1
+
+
+def _worker_command(args, port: int) -> list:
+    command = [sys.executable, os.path.abspath(__file__), "worker", "--host", "127.0.0.1", "--port", str(port),
+               "--token", args.token]
+    if args.quantize is not None:
+        command += ["--quantize", args.quantize]
+    if args.restrict_vocabulary:
+        command.append("--restrict_vocabulary")
+    if args.no_result_cache:
+        command.append("--no_result_cache")
+    else:
+        command += ["--result_cache", args.result_cache]
+    return command
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--host", default="127.0.0.1",
+                        help="Address the coordinator listens on (0.0.0.0 for remote workers) or workers connect to")
+    common.add_argument("--port", type=int, default=DEFAULT_PORT)
+    common.add_argument("--token", default="", help="Shared secret workers must present to the coordinator")
+    common.add_argument("--quantize", choices=tournament.QUANTIZATION_MODES, default=None,
+                        help="Keep the word vectors of the workers quantized to save memory")
+    common.add_argument("--restrict_vocabulary", action="store_true",
+                        help="Keep only the vectors of the wordpool and clue words of the workers in memory, "
+                             "the rest is memory mapped")
+    common.add_argument("--result_cache", default="results/result_cache.sqlite",
+                        help="SQLite file of the results of the games a worker already played")
+    common.add_argument("--no_result_cache", action="store_true", help="Play every game")
+
+    parser = argparse.ArgumentParser(
+        description="Play the games of tournament.py matchup groups on several machines: "
+                    "a coordinator hands (matchup, seed) games out to workers over TCP")
+    roles = parser.add_subparsers(dest="role", required=True)
+    coordinator_parser = roles.add_parser("coordinator", parents=[common],
+                                          formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    coordinator_parser.add_argument("groups", nargs="+", choices=sorted(tournament.MATCHUP_GROUPS),
+                                    help="Matchup groups whose games are handed out")
+    coordinator_parser.add_argument("--games", type=int, default=30, help="Games (seeds) per matchup")
+    coordinator_parser.add_argument("--resume", default=None, metavar="RUN_DIR",
+                                    help="Results folder of an interrupted coordinator or tournament to resume")
+    coordinator_parser.add_argument("--lease_s", type=float, default=3600,
+                                    help="Seconds after which a game not reported by its worker is handed out again")
+    coordinator_parser.add_argument("--local_workers", type=int, default=0,
+                                    help="Worker processes the coordinator starts on this machine")
+    roles.add_parser("worker", parents=[common], formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    args = parser.parse_args(argv)
+
+    if args.role == "worker":
+        tournament.configure_vectors(args.quantize, args.restrict_vocabulary)
+        played = run_worker(args.host, args.port, args.token,
+                            result_cache=None if args.no_result_cache else ResultCache(args.result_cache))
+        print(f"worker done, {played} games played")
+        return
+
+    manifest = TournamentManifest(args.resume if args.resume is not None else create_run_dir(name="tournament"))
+    matchups = [m for group in args.groups for m in tournament.MATCHUP_GROUPS[group]]
+    manifest.add_games([tournament.SequentialTournament.game_spec(m.name, seed)
+                        for seed in tournament.DEFAULT_SEEDS[:args.games] for m in matchups])
+    queue = JobQueue(manifest, lease_s=args.lease_s)
+    coordinator = Coordinator(queue, args.host, args.port, args.token)
+    port = coordinator.server_address[1]
+    print(f"Coordinating {len(manifest.pending())} of {len(manifest.specs)} games on {args.host}:{port}, "
+          f"writing results to {manifest.run_dir}")
+    workers = [] if queue.all_finished.is_set() else \
+        [subprocess.Popen(_worker_command(args, port)) for _ in range(args.local_workers)]
+
+    def keep_serving():
+        # do not wait forever once every local worker has died and no other worker is connected
+        return not workers or any(worker.poll() is None for worker in workers) or bool(queue.workers)
+
+    try:
+        coordinator.serve_until_finished(keep_serving=keep_serving)
+    finally:
+        print(f"{manifest.merge_results()} games in {manifest.run_dir}, {manifest.counts()}")
+        for worker in workers:
+            worker.wait()
+
+    scores: Dict[str, list] = {}
+    for game, spec in manifest.specs.items():
+        record = manifest.record(game)
+        if record is not None:
+            scores.setdefault(spec["matchup"], []).append(tournament.score_of(record, "turns"))
+    for name, values in sorted(scores.items(), key=lambda item: -sum(item[1]) / len(item[1])):
+        print(f"{name}: games={len(values)} mean_score={sum(values) / len(values):.2f}")
+
+
+if __name__ == "__main__":
+    main()